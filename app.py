@@ -1,10 +1,17 @@
 import streamlit as st
 import os
 import json
-import tempfile
-from extract import extract_termsheet
+from workers import ExtractionPool, DEFAULT_WORKERS
+from service import SERVICE_URL, ServiceClient
+from cache import hash_bytes
+from comparison import build_comparison_frame
+from schema import normalize, normalize_many
+from metrics import get_metrics
+from downloads import DownloadStore, MIME_TYPES, XLSX_ENGINE, bundle_bytes, json_bytes, table_frames, xlsx_bytes
 import pandas as pd
-import base64
+import html
+from collections import OrderedDict
+from datetime import date
 
 # Set page configuration
 st.set_page_config(
@@ -118,6 +125,13 @@ st.markdown("""
         border-top: 3px solid var(--secondary-yellow);
     }
     
+    /* Two property columns inside a card */
+    .property-grid {
+        display: grid;
+        grid-template-columns: 1fr 1fr;
+        gap: 1rem;
+    }
+    
     /* Property styling */
     .property-label {
         font-weight: bold;
@@ -158,39 +172,146 @@ st.markdown("""
         display: none;
     }
     
-    /* Download button */
-    .download-button {
-        display: inline-flex;
-        align-items: center;
-        justify-content: center;
+    /* Download buttons */
+    .stDownloadButton>button {
         background-color: var(--secondary-yellow);
         color: var(--black);
         font-weight: bold;
-        padding: 0.5rem 1rem;
+        border: none;
         border-radius: 0.25rem;
-        text-decoration: none;
-        margin-top: 1rem;
-        cursor: pointer;
-        transition: background-color 0.3s;
     }
     
-    .download-button:hover {
+    .stDownloadButton>button:hover {
         background-color: var(--primary-yellow);
-    }
-    
-    .download-icon {
-        margin-right: 0.5rem;
+        color: var(--black);
     }
 </style>
 """, unsafe_allow_html=True)
 
-# Create a download link
-def get_download_link(data, filename, text):
-    """Generates a link to download the given data as a file with the given filename"""
-    json_str = json.dumps(data, indent=4)
-    b64 = base64.b64encode(json_str.encode()).decode()
-    href = f'<a class="download-button" href="data:file/json;base64,{b64}" download="{filename}">📥 <span class="download-icon"></span>{text}</a>'
-    return href
+def get_upload_hashes(uploaded_files):
+    """Hash each uploaded file once per upload instead of on every rerun"""
+    known = st.session_state.get("upload_hashes", {})
+    hashes = {}
+    for uploaded_file in uploaded_files:
+        upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+        hashes[upload_key] = known.get(upload_key) or hash_bytes(uploaded_file.getvalue())
+    # Only remember the files that are still uploaded
+    st.session_state["upload_hashes"] = hashes
+    return list(hashes.values())
+
+# Documents waited on at once per server process when extraction runs in the service
+SERVICE_WAITERS = int(os.getenv("TERMSHEET_SERVICE_WAITERS", 32))
+
+# One background extraction pool per server process, shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_extraction_pool():
+    if SERVICE_URL:
+        # Extraction runs in the shared service; the pool's threads only wait for results
+        return ExtractionPool(max_workers=SERVICE_WAITERS, extract=ServiceClient(SERVICE_URL).extract_bytes)
+    return ExtractionPool(max_workers=DEFAULT_WORKERS)
+
+# Seconds between job status refreshes while extractions are running
+JOB_REFRESH_SECONDS = float(os.getenv("TERMSHEET_JOB_REFRESH", 2))
+
+# Maximum number of extraction results kept per browser session
+MAX_SESSION_RESULTS = int(os.getenv("TERMSHEET_SESSION_RESULTS", 50))
+
+def get_session_results():
+    """Per-session LRU of (raw, normalized) extraction results keyed by upload hash"""
+    if "results" not in st.session_state:
+        st.session_state["results"] = OrderedDict()
+    return st.session_state["results"]
+
+def remember_result(upload_hash, result, record=None):
+    """Store a raw result with its normalized form, validating it here if needed"""
+    results = get_session_results()
+    results[upload_hash] = (result, record if record is not None else normalize(result))
+    results.move_to_end(upload_hash)
+    # Sections built for an earlier result of this upload or for evicted results are stale
+    rendered = st.session_state.setdefault("rendered", {})
+    rendered.pop(upload_hash, None)
+    get_download_store().discard(upload_hash)
+    while len(results) > MAX_SESSION_RESULTS:
+        evicted, _ = results.popitem(last=False)
+        rendered.pop(evicted, None)
+        get_download_store().discard(evicted)
+
+def recall_result(upload_hash):
+    results = get_session_results()
+    if upload_hash not in results:
+        return None
+    results.move_to_end(upload_hash)
+    return results[upload_hash]
+
+def get_session_jobs():
+    """Background extraction jobs submitted from this session, keyed by upload hash"""
+    if "jobs" not in st.session_state:
+        st.session_state["jobs"] = {}
+    return st.session_state["jobs"]
+
+def collect_finished_jobs():
+    """Move completed background extractions into the session results"""
+    jobs = get_session_jobs()
+    finished = [(upload_hash, job) for upload_hash, job in jobs.items() if job.status == "completed"]
+    if not finished:
+        return
+    # Validate everything that finished since the last rerun in one call
+    results = [job.future.result() for _, job in finished]
+    for (upload_hash, job), result, record in zip(finished, results, normalize_many(results)):
+        get_metrics().observe("document_seconds", job.elapsed, path="app")
+        remember_result(upload_hash, result, record)
+        del jobs[upload_hash]
+        st.success(f"✅ Extraction complete: {job.name}")
+    get_metrics().write_prometheus()
+
+def render_job_status():
+    for job in get_session_jobs().values():
+        if job.status == "failed":
+            st.error(f"Error during extraction of {job.name}: {job.error}")
+        else:
+            st.info(f"🔍 {job.name}: {job.status} ({job.elapsed:.0f}s)")
+
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=JOB_REFRESH_SECONDS)
+    def job_status_panel():
+        # Only this fragment reruns while jobs are pending; the whole page
+        # reruns once something finishes so its result gets rendered
+        if any(job.status == "completed" for job in get_session_jobs().values()):
+            st.rerun()
+        render_job_status()
+else:
+    def job_status_panel():
+        render_job_status()
+        if any(job.status in ("queued", "running") for job in get_session_jobs().values()):
+            st.button("Refresh status", key="refresh_jobs")
+
+# Newer Streamlit versions build download data only when the button is clicked
+try:
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    DEFERRED_DOWNLOADS = hasattr(MediaFileManager, "add_deferred")
+except ImportError:
+    DEFERRED_DOWNLOADS = False
+
+def get_download_store():
+    """Per-session serialized downloads, so each result is serialized at most once per format"""
+    if "downloads" not in st.session_state:
+        st.session_state["downloads"] = DownloadStore()
+    return st.session_state["downloads"]
+
+def download_button(label, key, fmt, build, file_name):
+    """Native download button for the bytes ``build()`` returns, cached under (key, fmt)
+
+    With deferred downloads nothing is serialized until the button is
+    clicked, and clicking it does not rerun the script.
+    """
+    store = get_download_store()
+
+    def data():
+        return store.get(key, fmt, build)
+
+    options = {"on_click": "ignore"} if DEFERRED_DOWNLOADS else {}
+    st.download_button(label, data if DEFERRED_DOWNLOADS else data(), file_name=file_name,
+                       mime=MIME_TYPES[fmt], key=f"download_{fmt}_{key}", **options)
 
 # Header
 st.markdown('<div class="main-header"><h1>2Cents Capital Termsheet Parser</h1></div>', unsafe_allow_html=True)
@@ -198,260 +319,294 @@ st.markdown("Easily extract structured data from complex financial product term
 
 # Upload section
 st.markdown('<div class="upload-area">', unsafe_allow_html=True)
-uploaded_file = st.file_uploader("Upload Termsheet", type=["pdf"], label_visibility="collapsed")
-if uploaded_file is not None:
-    st.markdown(f"📄 **File uploaded:** {uploaded_file.name}")
+uploaded_files = st.file_uploader("Upload Termsheets", type=["pdf"], accept_multiple_files=True,
+                                  label_visibility="collapsed")
+if uploaded_files:
+    st.markdown(f"📄 **Files uploaded:** {', '.join(f.name for f in uploaded_files)}")
 st.markdown('</div>', unsafe_allow_html=True)
 
 def render_property(label, value, is_important=False):
     """Helper function to render a property with consistent styling"""
+    value = html.escape(str(value))
     if is_important:
         return f'<div><span class="property-label">{label}:</span> <span class="property-value" style="font-size: 1.1rem; font-weight: bold;">{value}</span></div>'
     return f'<div><span class="property-label">{label}:</span> <span class="property-value">{value}</span></div>'
 
-if uploaded_file is not None:
-    # Save the uploaded file to a temporary location
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
+def display(value, percent=False, currency=None):
+    """Format a normalized value for display; missing values show as N/A"""
+    if value is None or value == [] or value == "":
+        return 'N/A'
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ", ".join(value)
+    if isinstance(value, float):
+        text = f"{value:,.0f}" if value.is_integer() and not percent else f"{value:,.2f}"
+        if percent:
+            return f"{text}%"
+        return f"{currency} {text}" if currency else text
+    return value
+
+def render_card(title, left, right=None):
+    """One data card as a single HTML string, with properties in one or two columns"""
+    body = "".join(render_property(*prop) for prop in left)
+    if right:
+        body = f'<div class="property-grid"><div>{body}</div><div>{"".join(render_property(*prop) for prop in right)}</div></div>'
+    return f'<div class="data-card"><h3>{title}</h3>{body}</div>'
+
+# Rows per page of coupon/redemption schedules and lines per page of raw JSON
+PAGE_ROWS = int(os.getenv("TERMSHEET_PAGE_ROWS", 50))
+JSON_PAGE_LINES = int(os.getenv("TERMSHEET_JSON_PAGE_LINES", 300))
+
+# Each builder turns a result into the blocks of one section: ("html", markup),
+# ("table", title, DataFrame) or ("json", lines). Blocks are built once per
+# result and section, so reruns only re-send what is on screen.
+def build_general(result, record):
+    blocks = []
+    if record.productGeneral:
+        pg = record.productGeneral
+        blocks.append(("html", render_card("Product General Information", [
+            ("Product Name", display(pg.productName), True),
+            ("Product Type", display(pg.productType)),
+            ("Currency", display(pg.currency)),
+            ("Issue Size", display(pg.issueSize, currency=pg.currency)),
+        ], [
+            ("Denomination", display(pg.denomination, currency=pg.currency)),
+            ("Minimum Investment", display(pg.minimumInvestment, currency=pg.currency)),
+            ("ISIN", display(pg.ISIN)),
+            ("Valor", display(pg.valor)),
+        ])))
+    if record.issuerInformation:
+        ii = record.issuerInformation
+        right = [
+            ("Supervisory Authority", display(ii.supervisoryAuthority)),
+            ("Calculation Agent", display(ii.calculationAgent)),
+        ]
+        if ii.fiscalTransferPayingAgents:
+            right.append(("Fiscal/Transfer/Paying Agents", display(ii.fiscalTransferPayingAgents)))
+        blocks.append(("html", render_card("Issuer Information", [
+            ("Issuer Name", display(ii.issuerName), True),
+            ("Issuer Address", display(ii.issuerAddress)),
+            ("Issuer Rating", display(ii.issuerRating)),
+        ], right)))
+    if record.productDescription:
+        pd_data = record.productDescription
+        props = [
+            ("Description", display(pd_data.description)),
+            ("Market Expectation", display(pd_data.marketExpectation)),
+        ]
+        if pd_data.referenceCodes:
+            props.append(("Reference Code", display(pd_data.referenceCodes.code)))
+        blocks.append(("html", render_card("Product Description", props)))
+    return blocks
+
+def build_dates(result, record):
+    blocks = []
+    if record.dates:
+        dates = record.dates
+        blocks.append(("html", render_card("Key Dates", [
+            ("Initial Fixing Date", display(dates.initialFixingDate), True),
+            ("Issue Date", display(dates.issueDate), True),
+        ], [
+            ("Final Fixing Date", display(dates.finalFixingDate), True),
+            ("Redemption Date", display(dates.redemptionDate), True),
+        ])))
+    if record.underlyings:
+        # Typed columns, so levels sort numerically
+        blocks.append(("table", "Underlyings", pd.DataFrame([{
+            "Name": underlying.name,
+            "Exchange": underlying.relatedExchange,
+            "Currency": underlying.referenceCurrency,
+            "Bloomberg Ticker": underlying.bloombergTicker,
+            "Initial Fixing Level": underlying.initialFixingLevel,
+            "Strike Level (%)": underlying.strikeLevel,
+        } for underlying in record.underlyings])))
+    return blocks
+
+def build_coupon(result, record):
+    blocks = []
+    if record.coupon:
+        coupon = record.coupon
+        blocks.append(("html", render_card("Coupon Information", [
+            ("Coupon Amount Formula", display(coupon.couponAmountFormula)),
+            ("Coupon Rate", display(coupon.couponRate, percent=True)),
+        ])))
+        if coupon.couponPaymentDates:
+            blocks.append(("table", "Coupon Payment Dates", pd.DataFrame([{
+                "Payment #": payment.paymentNumber,
+                "Coupon Rate (%)": payment.couponRate,
+                "Payment Date": payment.paymentDate,
+            } for payment in coupon.couponPaymentDates])))
+    if record.earlyRedemption:
+        er = record.earlyRedemption
+        blocks.append(("html", render_card("Early Redemption", [
+            ("Automatic Early Redemption Event", display(er.automaticEarlyRedemptionEvent)),
+        ])))
+        if er.redemptionEvents:
+            blocks.append(("table", "Redemption Events", pd.DataFrame([{
+                "Observation #": event.observationNumber,
+                "Autocall Level (%)": event.autocallLevel,
+                "Redemption Amount": event.earlyRedemptionAmount,
+                "Observation Date": event.observationDate,
+                "Redemption Date": event.redemptionDate,
+            } for event in er.redemptionEvents])))
+    if record.redemption:
+        redemption = record.redemption
+        blocks.append(("html", render_card("Final Redemption", [
+            ("Redemption Formula", display(redemption.redemptionFormula)),
+            ("Final Fixing Level", display(redemption.finalFixingLevel)),
+            ("Performance Calculation", display(redemption.performanceCalculation)),
+            ("Worst Performance", display(redemption.worstPerformance)),
+        ])))
+    return blocks
+
+def build_risk(result, record):
+    blocks = []
+    if record.riskFactors:
+        rf = record.riskFactors
+        blocks.append(("html", render_card("Risk Factors", [
+            ("Risk of Loss", display(rf.riskOfLoss)),
+            ("Additional Risk Factors", display(rf.additionalRiskFactors)),
+            ("Issuer Credit Risk", display(rf.issuerCreditRisk)),
+            ("Market Risks", display(rf.marketRisks)),
+        ])))
+    if record.productDocumentation:
+        pd_doc = record.productDocumentation
+        blocks.append(("html", render_card("Product Documentation", [
+            ("Unique Identifier", display(pd_doc.uniqueIdentifier)),
+            ("Notices", display(pd_doc.notices)),
+            ("Listing Exchange", display(pd_doc.listingExchange)),
+        ], [
+            ("Business Day Convention", display(pd_doc.businessDayConvention)),
+            ("Secondary Market", display(pd_doc.secondaryMarket)),
+            ("Settlement Type", display(pd_doc.settlementType)),
+        ])))
+    return blocks
+
+def build_raw(result, record):
+    return [("json", json.dumps(result, indent=2, default=str).splitlines())]
+
+SECTIONS = {
+    "General Info": build_general,
+    "Underlyings & Dates": build_dates,
+    "Coupon & Redemption": build_coupon,
+    "Risk Factors": build_risk,
+    "Raw JSON": build_raw,
+}
+
+def get_section(upload_hash, section, result, record):
+    """Blocks of one section, built on first view and kept with the session's result"""
+    rendered = st.session_state.setdefault("rendered", {}).setdefault(upload_hash, {})
+    if section not in rendered:
+        with get_metrics().span("app_build_section", section=section):
+            rendered[section] = SECTIONS[section](result, record)
+    return rendered[section]
+
+def page_slice(total, per_page, key, label="Page"):
+    """Show a page picker when ``total`` items need more than one page and return the slice"""
+    pages = max(1, -(-total // per_page))
+    if pages == 1:
+        return slice(0, total)
+    page = st.number_input(f"{label} (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (int(page) - 1) * per_page
+    return slice(start, min(start + per_page, total))
+
+def render_blocks(blocks, key):
+    for i, block in enumerate(blocks):
+        if block[0] == "html":
+            st.markdown(block[1], unsafe_allow_html=True)
+        elif block[0] == "table":
+            _, title, df = block
+            st.markdown(f'<div class="data-card"><h3>{title}</h3></div>', unsafe_allow_html=True)
+            rows = page_slice(len(df), PAGE_ROWS, f"{key}_page_{i}", f"{title} page")
+            st.dataframe(df.iloc[rows], use_container_width=True)
+        else:
+            lines = block[1]
+            window = page_slice(len(lines), JSON_PAGE_LINES, f"{key}_page_{i}", "JSON page")
+            st.code("\n".join(lines[window]), language="json")
+
+def render_result(upload_hash, result, record, uploaded_name):
+    """Render an extraction result as download buttons and its active section
+
+    Only the selected section is built and sent to the browser, and long
+    schedules and the raw JSON are paged, so a rerun costs the same however
+    large the result is.
+    """
+    # Download file names are based on the uploaded file
+    stem = os.path.splitext(uploaded_name)[0]
+
+    columns = st.columns(4)
+    with columns[0]:
+        download_button("📥 Download JSON", upload_hash, "json", lambda: json_bytes(result),
+                        f"{stem}_extracted.json")
+    with columns[1]:
+        download_button("📥 JSON + CSV tables (ZIP)", upload_hash, "zip",
+                        lambda: bundle_bytes([(uploaded_name, result)]), f"{stem}_extracted.zip")
+    if XLSX_ENGINE is not None:
+        with columns[2]:
+            download_button("📥 Tables (XLSX)", upload_hash, "xlsx",
+                            lambda: xlsx_bytes(table_frames([(stem, record)])), f"{stem}_tables.xlsx")
+
+    section = st.radio("Section", list(SECTIONS), horizontal=True, key=f"section_{upload_hash}",
+                       label_visibility="collapsed")
+    render_blocks(get_section(upload_hash, section, result, record), f"{upload_hash}_{section}")
+
+    # Footer
+    st.markdown('<div class="footer">2Cents Capital Termsheet Parser | Powered by Llama Extract</div>', unsafe_allow_html=True)
+
+
+collect_finished_jobs()
+
+if uploaded_files:
+    upload_hashes = get_upload_hashes(uploaded_files)
     
     # Process button
     if st.button("Extract Data", key="extract_button"):
-        with st.spinner("🔍 Extracting data from the termsheet..."):
-            try:
-                # Extract data
-                result = extract_termsheet(tmp_path)
-                
-                # Remove the temporary file
-                os.unlink(tmp_path)
-                
-                # Display success message
-                st.success("✅ Extraction complete!")
-                
-                # Generate filename for download (based on uploaded file)
-                filename = f"{os.path.splitext(uploaded_file.name)[0]}_extracted.json"
-                
-                # Display download button
-                download_col1, download_col2 = st.columns([1, 3])
-                with download_col1:
-                    st.markdown(get_download_link(result, filename, "Download JSON"), unsafe_allow_html=True)
-                
-                # Display results in tabs
-                tab1, tab2, tab3, tab4, tab5 = st.tabs(["General Info", "Underlyings & Dates", "Coupon & Redemption", "Risk Factors", "Raw JSON"])
-                
-                with tab1:
-                    # Product General Information
-                    if result.get("productGeneral"):
-                        pg = result["productGeneral"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Product General Information</h3>', unsafe_allow_html=True)
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(render_property("Product Name", pg.get('productName', 'N/A'), True), unsafe_allow_html=True)
-                            st.markdown(render_property("Product Type", pg.get('productType', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Currency", pg.get('currency', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Issue Size", pg.get('issueSize', 'N/A')), unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(render_property("Denomination", pg.get('denomination', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Minimum Investment", pg.get('minimumInvestment', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("ISIN", pg.get('ISIN', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Valor", pg.get('valor', 'N/A')), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Issuer Information
-                    if result.get("issuerInformation"):
-                        ii = result["issuerInformation"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Issuer Information</h3>', unsafe_allow_html=True)
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(render_property("Issuer Name", ii.get('issuerName', 'N/A'), True), unsafe_allow_html=True)
-                            st.markdown(render_property("Issuer Address", ii.get('issuerAddress', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Issuer Rating", ii.get('issuerRating', 'N/A')), unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(render_property("Supervisory Authority", ii.get('supervisoryAuthority', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Calculation Agent", ii.get('calculationAgent', 'N/A')), unsafe_allow_html=True)
-                            agents = ii.get('fiscalTransferPayingAgents', [])
-                            if agents and isinstance(agents, list):
-                                agents_str = ", ".join(filter(None, agents))
-                                st.markdown(render_property("Fiscal/Transfer/Paying Agents", agents_str), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Product Description
-                    if result.get("productDescription"):
-                        pd_data = result["productDescription"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Product Description</h3>', unsafe_allow_html=True)
-                        st.markdown(render_property("Description", pd_data.get('description', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Market Expectation", pd_data.get('marketExpectation', 'N/A')), unsafe_allow_html=True)
-                        if pd_data.get('referenceCodes') and isinstance(pd_data['referenceCodes'], dict):
-                            st.markdown(render_property("Reference Code", pd_data['referenceCodes'].get('code', 'N/A')), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                
-                with tab2:
-                    # Key Dates
-                    if result.get("dates"):
-                        dates = result["dates"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Key Dates</h3>', unsafe_allow_html=True)
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(render_property("Initial Fixing Date", dates.get('initialFixingDate', 'N/A'), True), unsafe_allow_html=True)
-                            st.markdown(render_property("Issue Date", dates.get('issueDate', 'N/A'), True), unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(render_property("Final Fixing Date", dates.get('finalFixingDate', 'N/A'), True), unsafe_allow_html=True)
-                            st.markdown(render_property("Redemption Date", dates.get('redemptionDate', 'N/A'), True), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Underlyings
-                    if result.get("underlyings") and isinstance(result["underlyings"], list):
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Underlyings</h3>', unsafe_allow_html=True)
-                        
-                        # Create a DataFrame for better display
-                        underlyings_data = []
-                        for underlying in result["underlyings"]:
-                            if underlying:
-                                underlyings_data.append({
-                                    "Name": underlying.get('name', 'N/A'),
-                                    "Exchange": underlying.get('relatedExchange', 'N/A'),
-                                    "Currency": underlying.get('referenceCurrency', 'N/A'),
-                                    "Bloomberg Ticker": underlying.get('bloombergTicker', 'N/A'),
-                                    "Initial Fixing Level": underlying.get('initialFixingLevel', 'N/A'),
-                                    "Strike Level": underlying.get('strikeLevel', 'N/A')
-                                })
-                        
-                        if underlyings_data:
-                            df = pd.DataFrame(underlyings_data)
-                            st.markdown('<div class="table-container">', unsafe_allow_html=True)
-                            st.dataframe(df, use_container_width=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
-                
-                with tab3:
-                    # Coupon Information
-                    if result.get("coupon"):
-                        coupon = result["coupon"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Coupon Information</h3>', unsafe_allow_html=True)
-                        st.markdown(render_property("Coupon Amount Formula", coupon.get('couponAmountFormula', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Coupon Rate", coupon.get('couponRate', 'N/A')), unsafe_allow_html=True)
-                        
-                        # Coupon Payment Dates
-                        if coupon.get("couponPaymentDates") and isinstance(coupon["couponPaymentDates"], list):
-                            st.markdown("<h4>Coupon Payment Dates</h4>", unsafe_allow_html=True)
-                            
-                            coupon_data = []
-                            for payment in coupon["couponPaymentDates"]:
-                                if payment:
-                                    coupon_data.append({
-                                        "Payment #": payment.get("paymentNumber", ""),
-                                        "Coupon Rate": payment.get("couponRate", "N/A"),
-                                        "Payment Date": payment.get("paymentDate", "N/A")
-                                    })
-                            
-                            if coupon_data:
-                                df = pd.DataFrame(coupon_data)
-                                st.markdown('<div class="table-container">', unsafe_allow_html=True)
-                                st.dataframe(df, use_container_width=True)
-                                st.markdown('</div>', unsafe_allow_html=True)
-                                
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Early Redemption
-                    if result.get("earlyRedemption"):
-                        er = result["earlyRedemption"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Early Redemption</h3>', unsafe_allow_html=True)
-                        st.markdown(render_property("Automatic Early Redemption Event", er.get('automaticEarlyRedemptionEvent', 'N/A')), unsafe_allow_html=True)
-                        
-                        # Redemption Events
-                        if er.get("redemptionEvents") and isinstance(er["redemptionEvents"], list):
-                            st.markdown("<h4>Redemption Events</h4>", unsafe_allow_html=True)
-                            
-                            redemption_data = []
-                            for event in er["redemptionEvents"]:
-                                if event:
-                                    redemption_data.append({
-                                        "Observation #": event.get("observationNumber", ""),
-                                        "Autocall Level": event.get("autocallLevel", "N/A"),
-                                        "Redemption Amount": event.get("earlyRedemptionAmount", "N/A"),
-                                        "Observation Date": event.get("observationDate", "N/A"),
-                                        "Redemption Date": event.get("redemptionDate", "N/A")
-                                    })
-                            
-                            if redemption_data:
-                                df = pd.DataFrame(redemption_data)
-                                st.markdown('<div class="table-container">', unsafe_allow_html=True)
-                                st.dataframe(df, use_container_width=True)
-                                st.markdown('</div>', unsafe_allow_html=True)
-                                
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Final Redemption
-                    if result.get("redemption"):
-                        redemption = result["redemption"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Final Redemption</h3>', unsafe_allow_html=True)
-                        st.markdown(render_property("Redemption Formula", redemption.get('redemptionFormula', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Final Fixing Level", redemption.get('finalFixingLevel', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Performance Calculation", redemption.get('performanceCalculation', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Worst Performance", redemption.get('worstPerformance', 'N/A')), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                
-                with tab4:
-                    # Risk Factors
-                    if result.get("riskFactors"):
-                        rf = result["riskFactors"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Risk Factors</h3>', unsafe_allow_html=True)
-                        st.markdown(render_property("Risk of Loss", rf.get('riskOfLoss', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Additional Risk Factors", rf.get('additionalRiskFactors', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Issuer Credit Risk", rf.get('issuerCreditRisk', 'N/A')), unsafe_allow_html=True)
-                        st.markdown(render_property("Market Risks", rf.get('marketRisks', 'N/A')), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Product Documentation
-                    if result.get("productDocumentation") and isinstance(result["productDocumentation"], dict):
-                        pd_doc = result["productDocumentation"]
-                        
-                        st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                        st.markdown('<h3>Product Documentation</h3>', unsafe_allow_html=True)
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(render_property("Unique Identifier", pd_doc.get('uniqueIdentifier', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Notices", pd_doc.get('notices', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Listing Exchange", pd_doc.get('listingExchange', 'N/A')), unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(render_property("Business Day Convention", pd_doc.get('businessDayConvention', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Secondary Market", pd_doc.get('secondaryMarket', 'N/A')), unsafe_allow_html=True)
-                            st.markdown(render_property("Settlement Type", pd_doc.get('settlementType', 'N/A')), unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
-                
-                with tab5:
-                    # Raw JSON
-                    st.markdown('<div class="data-card">', unsafe_allow_html=True)
-                    st.markdown('<h3>Raw JSON Data</h3>', unsafe_allow_html=True)
-                    st.json(result)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                # Footer
-                st.markdown('<div class="footer">2Cents Capital Termsheet Parser | Powered by Llama Extract</div>', unsafe_allow_html=True)
-                    
-            except Exception as e:
-                st.error(f"Error during extraction: {e}")
-                # Remove the temporary file in case of error
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+        jobs = get_session_jobs()
+        with get_metrics().span("app_submit", attrs={"files": len(uploaded_files)}):
+            for uploaded_file, upload_hash in zip(uploaded_files, upload_hashes):
+                job = jobs.get(upload_hash)
+                if recall_result(upload_hash) is None and (job is None or job.status == "failed"):
+                    # Hand the upload buffer to the background pool; the script thread
+                    # returns immediately and the status panel tracks the job. The agent
+                    # is looked up (and cached by the registry) only if the remote engine runs.
+                    jobs[upload_hash] = get_extraction_pool().submit(
+                        upload_hash, uploaded_file.getvalue(), uploaded_file.name)
+
+if get_session_jobs():
+    job_status_panel()
+
+if uploaded_files:
+    # Render from the session's stored results so later reruns don't re-extract
+    extracted = [(uploaded_file.name, upload_hash, recall_result(upload_hash))
+                 for uploaded_file, upload_hash in zip(uploaded_files, upload_hashes)]
+    extracted = [(name, upload_hash, stored) for name, upload_hash, stored in extracted if stored is not None]
+    
+    if len(uploaded_files) > 1 and extracted:
+        st.markdown('<div class="data-card">', unsafe_allow_html=True)
+        st.markdown(f'<h3>Comparison ({len(extracted)}/{len(uploaded_files)} extracted)</h3>', unsafe_allow_html=True)
+        comparison = build_comparison_frame([(name, record) for name, _, (_, record) in extracted])
+        st.dataframe(comparison, use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # One archive for every extracted upload, cached until the set of results changes
+        bundle_key = hash_bytes("".join(upload_hash for _, upload_hash, _ in extracted).encode())
+        bundle_col, comparison_col = st.columns(2)
+        with bundle_col:
+            download_button(f"📦 Download all {len(extracted)} (ZIP)", bundle_key, "zip",
+                            lambda: bundle_bytes([(name, result) for name, _, (result, _) in extracted],
+                                                 xlsx=True), "termsheets_extracted.zip")
+        with comparison_col:
+            download_button("📥 Comparison (CSV)", bundle_key, "csv",
+                            lambda: comparison.to_csv(index=False).encode(), "termsheets_comparison.csv")
+        
+        names = [name for name, _, _ in extracted]
+        selected = st.selectbox("Show details for", names, key="detail_file")
+        name, upload_hash, stored = extracted[names.index(selected)]
+        render_result(upload_hash, *stored, name)
+    elif extracted:
+        name, upload_hash, stored = extracted[0]
+        render_result(upload_hash, *stored, name)
                     
 else:
     # Display empty state
@@ -2,85 +2,554 @@ import asyncio
 import os
 import json
 import argparse
-from llama_extract import LlamaExtract
+import contextlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from extract import LazyAgent, cache_agent_key, engine_policy
+from engines import ENGINE_MODES
+from cache import get_cache, hash_bytes
+from scheduler import JobScheduler, SubmissionPipeline
+from manifest import JobManifest, reconcile, QUEUED, COMPLETED, FAILED, DUPLICATE
+from dedup import DedupPlan, SignatureIndex
+from preprocess import DEFAULT_WORKERS, analyze_pdf, create_executor, hash_pdf, process_map, scan_pdfs
+from export import ParquetExporter
+from index import TermsheetIndex, INDEX_NAME
+from schema import normalize
+from completeness import repair_result
+from metrics import get_metrics, timed
+from streaming import STREAMED, NDJSONWriter, read_result, result_record
+from service import SERVICE_URL, ServiceClient
 
 # Load environment variables
 load_dotenv()
 
-# Initialize client
-extractor = LlamaExtract()
+AGENT_ID = "50297c9a-d871-4218-90b7-79548adbd6ce"
 
-async def batch_process_termsheets(directory, output_dir=None):
-    """Process all PDFs in a directory and save results"""
+def save_result(data, pdf_file, output_dir):
+    """Write one extraction result next to the others as <name>.json"""
+    original_filename = os.path.basename(pdf_file)
+    base_filename = os.path.splitext(original_filename)[0]
+    output_path = os.path.join(output_dir, f"{base_filename}.json")
+    metrics = get_metrics()
+    with metrics.span("write_result", attrs={"file": original_filename}):
+        with open(output_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+    if metrics.enabled:
+        metrics.inc("bytes_written_total", os.path.getsize(output_path))
+    
+    print(f"Saved results for {original_filename} to {output_path}")
+    return output_path
+
+@timed("batch")
+async def batch_process_termsheets(directory, output_dir=None, use_cache=True, agent=None,
+                                   poll_concurrency=8, max_in_flight=50, chunk_size=10, max_retries=3,
+                                   resume=False, files=None, parquet_dir=None, partition_by="currency",
+                                   index_path=None, dedup="exact", prefilter=False, engine="remote",
+                                   workers=None, queue_size=None, ndjson=None, repair=False, executor=None):
+    """Process all PDFs in a directory (or just ``files``) and save results
+
+    ``dedup`` controls duplicate detection before submission: "off", "exact"
+    (identical bytes share one job), "link" (near-duplicates reuse the matching
+    result) or "skip" (near-duplicates are not extracted at all). With
+    ``prefilter`` only the pages likely to hold schema fields are uploaded.
+    ``engine`` selects remote, local, local-first or remote-first extraction.
+
+    Files are streamed through a pool of ``workers`` processes that hash and
+    parse them, with at most ``queue_size`` files per stage in progress, and
+    each file is submitted as soon as it is ready while earlier jobs are polled.
+    An ``executor`` from ``create_executor`` may be passed in to reuse one
+    pool across calls; it is left running.
+
+    ``ndjson`` may be an NDJSONWriter; results are then appended to its stream
+    in completion order instead of being written as one JSON file per PDF.
+
+    With ``repair``, sections of a remote result that fail the completeness
+    checks are re-extracted from just their pages and merged in before the
+    result is cached and published.
+    """
     if output_dir is None:
         output_dir = os.path.join(directory, 'extracted_data')
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Use existing agent for Structured Product Termsheet
-    agent = extractor.get_agent(id="50297c9a-d871-4218-90b7-79548adbd6ce")
+    # Use existing agent for Structured Product Termsheet, looked up on first use so an
+    # unreachable API only fails the remote calls and the local fallback still runs
+    if agent is None and engine != "local":
+        agent = LazyAgent(agent_id=AGENT_ID)
+    policy = engine_policy(engine, agent)
+    metrics = get_metrics()
+    workers = workers or DEFAULT_WORKERS
+    queue_size = queue_size or 2 * workers
     
-    # Get all PDF files in the directory
-    pdf_files = [os.path.join(directory, f) for f in os.listdir(directory) 
-                if f.lower().endswith('.pdf')]
+    # Stream PDF files from the directory instead of listing it up front
+    pdf_source = files if files is not None else scan_pdfs(directory)
     
-    if not pdf_files:
-        print(f"No PDF files found in {directory}")
-        return
-    
-    print(f"Found {len(pdf_files)} PDF files to process")
-    
-    # Queue all files for extraction
-    jobs = await agent.queue_extraction(pdf_files)
-    
-    # Track job status
-    completed = 0
-    print(f"Queued {len(jobs)} extraction jobs")
-    
-    while completed < len(jobs):
-        completed = 0
-        for job in jobs:
-            job_status = agent.get_extraction_job(job.id).status
-            if job_status == 'completed':
-                completed += 1
-            elif job_status == 'failed':
-                print(f"Job {job.id} failed")
-                completed += 1
-        
-        if completed < len(jobs):
-            print(f"Progress: {completed}/{len(jobs)} completed")
-            await asyncio.sleep(3)
+    content_hashes = {}
+    manifest = JobManifest(output_dir)
+    entries = manifest.load() if resume else {}
+    
+    # Optionally append every result to a partitioned Parquet dataset as well
+    exporter = ParquetExporter(parquet_dir, partition_by=partition_by) if parquet_dir else None
+    
+    # Keep the lookup index next to the results up to date as they are written
+    index = TermsheetIndex(index_path or os.path.join(output_dir, INDEX_NAME))
+    
+    # Same key as extract_termsheet, so the app, the CLI and batch runs share results
+    cache_agent = cache_agent_key(prefilter, repair)
+    reductions = {}
+    queued_at = {}
+    
+    def publish(data, pdf_file, job_id=None, source="remote"):
+        if ndjson is not None:
+            output_path = ndjson.write(result_record(data, pdf_file, content_hashes[pdf_file], source, job_id,
+                                                     queued_at.get(pdf_file)))
+        else:
+            output_path = save_result(data, pdf_file, output_dir)
+        # Validate once; the index and the Parquet export share the normalized form
+        record = normalize(data)
+        index.add(record, content_hashes[pdf_file], source=pdf_file, output_path=output_path)
+        if exporter is not None:
+            exporter.add(record, content_hashes[pdf_file], source=pdf_file)
+        reduction = reductions.get(pdf_file)
+        details = reduction.to_dict() if reduction else {}
+        manifest.record(pdf_file, content_hashes[pdf_file], COMPLETED, job_id=job_id, output=output_path, **details)
+        return output_path
     
-    print("All jobs completed!")
+    # Submit each distinct document once; duplicates reuse its result. Files
+    # are planned as they stream in, so a duplicate may only show up after its
+    # original has finished; ``finished`` remembers those outcomes.
+    cache = get_cache()
+    near = dedup in ("link", "skip")
+    signatures = SignatureIndex(output_dir) if near else None
+    plan = DedupPlan(signatures, near) if dedup != "off" else None
+    finished = {}
+    plan_lock = threading.Lock()
     
-    # Get and save results
-    for i, job in enumerate(jobs):
+    def publish_duplicate(duplicate, data, output_path):
+        if data is None and output_path is None:
+            manifest.record(duplicate, content_hashes[duplicate], FAILED)
+        elif data is not None and (duplicate in plan.exact or dedup == "link"):
+            publish(data, duplicate, source="duplicate")
+        else:
+            manifest.record(duplicate, content_hashes[duplicate], DUPLICATE, output=output_path)
+    
+    def finish(pdf_file, data, output_path=None):
+        if plan is None:
+            return
+        with plan_lock:
+            finished[pdf_file] = (data, output_path)
+            duplicates = plan.duplicates_of(pdf_file)
+        for duplicate in duplicates:
+            publish_duplicate(duplicate, data, output_path)
+    
+    def publish_with_duplicates(data, pdf_file, job_id=None, source="remote"):
+        output_path = publish(data, pdf_file, job_id, source)
+        if plan is not None and pdf_file in plan.signatures and output_path not in (None, STREAMED):
+            signatures.add(content_hashes[pdf_file], plan.signatures[pdf_file], output_path, persist=True)
+        finish(pdf_file, data, output_path)
+    
+    def finished_outcome(canonical):
+        # Called under plan_lock together with the registration: either the
+        # original has finished and the caller publishes the duplicate now, or
+        # ``finish`` will see the duplicate in the plan - never both.
+        return finished.get(canonical) if canonical is not None else None
+    
+    stats = {"files": 0, "cached": 0, "resumed": 0, "local": 0}
+    in_flight_tasks = []
+    repairs = []
+    repaired = {}
+    
+    def repair_sections(data, pdf_file):
+        # A full re-run would have cost the document's whole queue-to-result time
+        baseline = time.time() - queued_at[pdf_file] if pdf_file in queued_at else None
+        data, report = repair_result(data, pdf_file, policy.remote.extract, baseline_seconds=baseline)
+        if report.sections:
+            repairs.append(report)
+            print(f"Re-extracted {', '.join(report.sections)} of {os.path.basename(pdf_file)} "
+                  f"from pages {report.ranges}; improved {', '.join(report.improved) or 'none'}")
+        return data
+    
+    def on_queued(job_id, pdf_file):
+        queued_at.setdefault(pdf_file, time.time())
+        reduction = reductions.get(pdf_file)
+        details = reduction.to_dict() if reduction else {}
+        manifest.record(pdf_file, content_hashes[pdf_file], QUEUED, job_id=job_id, **details)
+    
+    def upload_path(pdf_file):
+        reduction = reductions.get(pdf_file)
+        return reduction.output if reduction else pdf_file
+    
+    def discard_reduction(pdf_file):
+        reduction = reductions.get(pdf_file)
+        if reduction and os.path.exists(reduction.output):
+            os.unlink(reduction.output)
+    
+    def on_complete(job_id, pdf_file, result):
+        if pdf_file in queued_at:
+            metrics.observe("document_seconds", time.time() - queued_at[pdf_file], path="batch")
+        if result:
+            # The scheduler retries this handler when it fails, so keep the
+            # repaired result (and cache it) before anything else can fail,
+            # rather than paying for the re-extractions again
+            data = repaired.get(pdf_file)
+            if data is None:
+                data = repair_sections(result.data, pdf_file) if repair else result.data
+                repaired[pdf_file] = data
+                cache.put(content_hashes[pdf_file], cache_agent, data)
+            # Save results as JSON
+            publish_with_duplicates(data, pdf_file, job_id)
+            discard_reduction(pdf_file)
+            queued_at.pop(pdf_file, None)
+            repaired.pop(pdf_file, None)
+        else:
+            print(f"No results for job {job_id}")
+            on_failure(job_id, pdf_file)
+    
+    def on_failure(job_id, pdf_file):
+        discard_reduction(pdf_file)
+        # In remote-first mode, fall back to the local engine when the agent fails
         try:
-            result = agent.get_extraction_run_for_job(job.id)
-            if result:
-                # Get original filename without extension
-                original_filename = os.path.basename(pdf_files[i])
-                base_filename = os.path.splitext(original_filename)[0]
-                
-                # Save results as JSON
-                output_path = os.path.join(output_dir, f"{base_filename}.json")
-                with open(output_path, 'w') as f:
-                    json.dump(result.data, f, indent=2, default=str)
-                
-                print(f"Saved results for {original_filename} to {output_path}")
-            else:
-                print(f"No results for job {job.id}")
+            fallback = policy.fallback(pdf_file)
         except Exception as e:
-            print(f"Error retrieving results for job {job.id}: {e}")
+            print(f"Local fallback failed for {pdf_file}: {e}")
+            fallback = None
+        if fallback is not None:
+            print(f"Used the local engine for {pdf_file}")
+            publish_with_duplicates(fallback, pdf_file, job_id, source="local")
+            return
+        manifest.record(pdf_file, content_hashes[pdf_file], FAILED, job_id=job_id)
+        finish(pdf_file, None)
+        queued_at.pop(pdf_file, None)
+    
+    scheduler = JobScheduler(agent, max_concurrency=poll_concurrency)
+    pipeline = SubmissionPipeline(agent, scheduler, chunk_size=chunk_size,
+                                  max_in_flight=max_in_flight, max_retries=max_retries)
+    
+    async def hashed_files(executor):
+        """Stage 1: hash files in the pool, then resolve resume, cache and exact duplicates"""
+        async for pdf_file, content_hash in process_map(executor, hash_pdf, pdf_source, queue_size):
+            stats["files"] += 1
+            metrics.inc("files_total")
+            if content_hash is None:
+                continue
+            content_hashes[pdf_file] = content_hash
+            
+            # On resume, skip finished files and re-attach to jobs that are still running
+            if resume:
+                done, in_flight, _ = reconcile(entries, [pdf_file], content_hashes)
+                if done:
+                    stats["resumed"] += 1
+                    continue
+                if in_flight and engine != "local":
+                    # Without the agent, pending jobs are extracted again locally. Job IDs
+                    # the API no longer knows are submitted again instead of polled forever.
+                    job_id = in_flight[0][0]
+                    if await scheduler.lookup(job_id):
+                        stats["resumed"] += 1
+                        in_flight_tasks.append(asyncio.create_task(
+                            scheduler.run(in_flight, on_complete, on_failure)))
+                        continue
+                    print(f"Submitting {pdf_file} again")
+                    manifest.record(pdf_file, content_hash, FAILED, job_id=job_id)
+            
+            # Serve files we have already extracted from the cache
+            cached = cache.get(content_hash, cache_agent) if use_cache else None
+            if use_cache:
+                metrics.inc("cache_lookups_total", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                stats["cached"] += 1
+                publish(cached, pdf_file, source="cache")
+                continue
+            
+            if plan is not None:
+                with plan_lock:
+                    canonical = plan.add_exact(pdf_file, content_hash)
+                    outcome = finished_outcome(canonical)
+                if canonical is not None:
+                    if outcome is not None:
+                        publish_duplicate(pdf_file, *outcome)
+                    continue
+            yield pdf_file
+    
+    async def ready_files(executor):
+        """Stage 2: parse new documents in the pool for near duplicates, local results and page reduction"""
+        local = policy.mode if policy.mode in ("local", "local-first") and policy.local.available() else None
+        if not (near or local or prefilter):
+            async for pdf_file in hashed_files(executor):
+                with plan_lock:
+                    if plan is not None:
+                        plan.add_near(pdf_file, None)
+                yield pdf_file
+            return
+        
+        reduced_dir = os.path.join(output_dir, '.reduced')
+        if prefilter:
+            os.makedirs(reduced_dir, exist_ok=True)
+        
+        async def analyses():
+            async for pdf_file in hashed_files(executor):
+                reduce_to = os.path.join(reduced_dir, f"{content_hashes[pdf_file]}.pdf") if prefilter else None
+                yield pdf_file, reduce_to
+        
+        async for analysis in process_map(executor, analyze_pdf, analyses(), queue_size, near, local):
+            pdf_file = analysis.pdf_file
+            if analysis.error:
+                print(f"Could not parse {pdf_file} locally: {analysis.error}")
+            if analysis.reduction is not None:
+                reductions[pdf_file] = analysis.reduction
+            
+            if plan is not None:
+                with plan_lock:
+                    submit = plan.add_near(pdf_file, analysis.signature)
+                    previous = plan.previous.get(pdf_file)
+                    outcome = finished_outcome(plan.near.get(pdf_file))
+                if not submit:
+                    discard_reduction(pdf_file)
+                    if previous is None:
+                        if outcome is not None:
+                            publish_duplicate(pdf_file, *outcome)
+                        continue
+                    data = read_result(previous, plan.previous_keys[pdf_file]) if dedup == "link" else None
+                    if data is not None:
+                        output_path = publish(data, pdf_file, source="duplicate")
+                    else:
+                        output_path = previous
+                        manifest.record(pdf_file, content_hashes[pdf_file], DUPLICATE, output=previous)
+                    # Exact copies of this file follow it
+                    finish(pdf_file, data, output_path)
+                    continue
+            
+            # Documents the local engine handles completely never reach the remote agent
+            if local == "local" or (local and analysis.local_complete):
+                if analysis.local_result is not None:
+                    stats["local"] += 1
+                    metrics.inc("local_extractions_total")
+                    publish_with_duplicates(analysis.local_result, pdf_file, source="local")
+                else:
+                    manifest.record(pdf_file, content_hashes[pdf_file], FAILED)
+                    finish(pdf_file, None)
+                continue
+            if policy.mode == "local":
+                manifest.record(pdf_file, content_hashes[pdf_file], FAILED)
+                finish(pdf_file, None)
+                continue
+            
+            reduction = reductions.get(pdf_file)
+            if reduction is not None:
+                print(f"Pre-filter kept pages {reduction.ranges} of {reduction.page_count} "
+                      f"in {os.path.basename(pdf_file)}")
+            yield pdf_file
+    
+    # Hashing and parsing run in worker processes while earlier files are
+    # already being submitted and polled on the event loop
+    pool = contextlib.nullcontext(executor) if executor is not None else create_executor(workers)
+    with pool as executor:
+        await pipeline.run(ready_files(executor), on_complete, on_failure, on_queued=on_queued,
+                           upload_path=upload_path)
+        if in_flight_tasks:
+            await asyncio.gather(*in_flight_tasks)
+    completed, failed = scheduler.completed, scheduler.failed
+    
+    if not stats["files"]:
+        print(f"No PDF files found in {directory}")
+    else:
+        print(f"Found {stats['files']} PDF files")
+    if resume:
+        print(f"Resume: {stats['resumed']} already completed or in flight")
+    if use_cache:
+        print(f"Cache: {stats['cached']} hits")
+    if plan is not None:
+        metrics.inc("duplicates_total", plan.avoided)
+    if plan is not None and plan.avoided:
+        print(f"Dedup: {len(plan.exact)} exact and {len(plan.near) + len(plan.previous)} near duplicates, "
+              f"{plan.avoided} remote calls avoided")
+    if policy.mode in ("local", "local-first"):
+        print(f"Local engine: {stats['local']} extracted locally")
+    
+    if repairs:
+        sections = sum(len(report.sections) for report in repairs)
+        improved = sum(len(report.improved) for report in repairs)
+        saved = sum(report.seconds_saved or 0 for report in repairs)
+        print(f"Repair: re-extracted {sections} sections of {len(repairs)} documents, {improved} improved, "
+              f"{saved:.1f}s saved against full re-runs")
+    
+    if reductions:
+        before = sum(r.bytes_before for r in reductions.values())
+        after = sum(r.bytes_after for r in reductions.values())
+        print(f"Pre-filter: uploaded {after} of {before} bytes ({100 * (1 - after / before):.0f}% saved)")
+    
+    if exporter is not None:
+        exporter.flush()
+        print(f"Appended {exporter.rows_written} rows to Parquet dataset {parquet_dir}, "
+              f"skipped {exporter.skipped} documents already there")
+    if ndjson is not None:
+        print(f"Streamed {ndjson.lines_written} results as NDJSON")
+    index.close()
+    metrics.write_prometheus()
+    
+    if not scheduler.total:
+        print("Nothing left to extract")
+    else:
+        print(f"All jobs completed! {completed} succeeded, {failed} failed, "
+              f"{scheduler.poll_calls} status checks, {pipeline.retries} retries")
     
     return output_dir
 
+@timed("batch")
+def service_process_termsheets(directory, output_dir=None, service_url=None, max_in_flight=50, files=None,
+                               parquet_dir=None, partition_by="currency", index_path=None, ndjson=None):
+    """Hand every PDF to an extraction service and save results as they finish
+
+    The service's workers extract, cache and coalesce identical documents, so
+    this process only uploads files and waits on at most ``max_in_flight``
+    jobs at once. Results are written, indexed and exported as in
+    ``batch_process_termsheets``.
+    """
+    if output_dir is None:
+        output_dir = os.path.join(directory, 'extracted_data')
+    os.makedirs(output_dir, exist_ok=True)
+    client = ServiceClient(service_url)
+    manifest = JobManifest(output_dir)
+    exporter = ParquetExporter(parquet_dir, partition_by=partition_by) if parquet_dir else None
+    index = TermsheetIndex(index_path or os.path.join(output_dir, INDEX_NAME))
+    metrics = get_metrics()
+    
+    def publish(pdf_file, content_hash, job, data):
+        if ndjson is not None:
+            output_path = ndjson.write(result_record(data, pdf_file, content_hash, "service", job["job_id"],
+                                                     job["submitted_at"]))
+        else:
+            output_path = save_result(data, pdf_file, output_dir)
+        record = normalize(data)
+        index.add(record, content_hash, source=pdf_file, output_path=output_path)
+        if exporter is not None:
+            exporter.add(record, content_hash, source=pdf_file)
+        manifest.record(pdf_file, content_hash, COMPLETED, job_id=job["job_id"], output=output_path)
+        metrics.observe("document_seconds", time.time() - job["submitted_at"], path="service")
+    
+    def run(pdf_file):
+        with open(pdf_file, 'rb') as f:
+            data = f.read()
+        content_hash = hash_bytes(data)
+        job = None
+        try:
+            job = client.submit(data, os.path.basename(pdf_file))
+            manifest.record(pdf_file, content_hash, QUEUED, job_id=job["job_id"])
+            publish(pdf_file, content_hash, job, client.wait(job["job_id"]))
+        except Exception:
+            manifest.record(pdf_file, content_hash, FAILED, job_id=job and job["job_id"])
+            raise
+        return job
+    
+    pdf_files = files if files is not None else scan_pdfs(directory)
+    completed = failed = coalesced = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="service") as pool:
+        futures = {pool.submit(run, pdf_file): pdf_file for pdf_file in pdf_files}
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            try:
+                job = future.result()
+            except Exception as e:
+                print(f"Extraction of {pdf_file} failed: {e}")
+                failed += 1
+                continue
+            completed += 1
+            coalesced += job.get("coalesced", False)
+            print(f"Progress: {completed + failed}/{len(futures)} completed")
+    
+    print(f"All jobs completed! {completed} succeeded, {failed} failed, "
+          f"{coalesced} joined jobs already running on {client.url}")
+    if exporter is not None:
+        exporter.flush()
+        print(f"Appended {exporter.rows_written} rows to Parquet dataset {parquet_dir}, "
+              f"skipped {exporter.skipped} documents already there")
+    index.close()
+    metrics.write_prometheus()
+    return completed, failed
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Batch process termsheets")
     parser.add_argument("directory", help="Directory containing PDF termsheets")
     parser.add_argument("--output", help="Output directory for extracted data")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached results and re-extract every file")
+    parser.add_argument("--poll-concurrency", type=int, default=8, help="Maximum concurrent job status requests")
+    parser.add_argument("--max-in-flight", type=int, default=50, help="Maximum extraction jobs queued at once")
+    parser.add_argument("--chunk-size", type=int, default=10, help="Number of files submitted per queue request")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries for throttled submissions and failed jobs")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from the manifest in the output directory")
+    parser.add_argument("--parquet", help="Also append results to a partitioned Parquet dataset in this directory")
+    parser.add_argument("--partition-by", choices=["currency", "issue_year"], default="currency",
+                        help="Partition key for the Parquet dataset")
+    parser.add_argument("--index", help=f"Path of the SQLite lookup index (default: <output>/{INDEX_NAME})")
+    parser.add_argument("--dedup", choices=["off", "exact", "link", "skip"], default="exact",
+                        help="Duplicate handling: exact content matches only, or also link/skip near-duplicates")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Upload only the pages likely to hold termsheet fields (requires pypdf)")
+    parser.add_argument("--repair", action="store_true",
+                        help="Re-extract incomplete sections of each result from just their pages")
+    parser.add_argument("--engine", choices=ENGINE_MODES, default="remote",
+                        help="Extraction engine: remote agent, local rules, or one with the other as fallback")
+    parser.add_argument("--service", nargs="?", const=SERVICE_URL or "http://127.0.0.1:8000",
+                        help="Send files to a running extraction service (service.py) at this URL instead "
+                             "(default: TERMSHEET_SERVICE_URL)")
+    parser.add_argument("--workers", type=int, help="Processes for hashing and parsing PDFs (default: all cores)")
+    parser.add_argument("--queue-size", type=int, help="Files in progress per pre-processing stage (default: 2 per worker)")
+    parser.add_argument("--ndjson", help="Append results as NDJSON lines to this file or directory of segments "
+                                         "('-' for stdout) instead of writing one JSON file per PDF")
+    parser.add_argument("--segment-lines", type=int, help="Start a new NDJSON segment after this many results")
+    parser.add_argument("--segment-mb", type=float, help="Start a new NDJSON segment after this many megabytes")
+    parser.add_argument("--metrics", help="Collect metrics and write them in Prometheus text format to this file")
+    parser.add_argument("--metrics-log", help="Write timing spans as JSON lines to this file ('-' for stderr)")
+    parser.add_argument("--watch", action="store_true", help="Keep running and process PDFs as they arrive")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds between folder scans in --watch mode")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Seconds a file must stay unchanged before it is processed in --watch mode")
     args = parser.parse_args()
+    if args.service:
+        # The service's own settings decide how documents are extracted and cached
+        ignored = [flag for flag, used in (("--resume", args.resume), ("--watch", args.watch),
+                                           ("--no-cache", args.no_cache), ("--dedup", args.dedup != "exact"),
+                                           ("--prefilter", args.prefilter), ("--repair", args.repair),
+                                           ("--engine", args.engine != "remote")) if used]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be combined with --service; "
+                         "set extraction options on service.py instead")
+    
+    if args.metrics or args.metrics_log:
+        get_metrics().configure(log_path=args.metrics_log, prometheus_path=args.metrics)
+    
+    # With results on stdout, progress messages go to stderr so the stream stays clean;
+    # worker processes are not covered by the redirect and print to stderr themselves
+    ndjson = None
+    if args.ndjson:
+        ndjson = NDJSONWriter(args.ndjson, segment_lines=args.segment_lines,
+                              segment_bytes=int(args.segment_mb * 1024 * 1024) if args.segment_mb else None)
+    progress = contextlib.redirect_stdout(sys.stderr) if args.ndjson == "-" else contextlib.nullcontext()
     
-    asyncio.run(batch_process_termsheets(args.directory, args.output)) 
\ No newline at end of file
+    batch_kwargs = dict(use_cache=not args.no_cache, poll_concurrency=args.poll_concurrency,
+                        max_in_flight=args.max_in_flight, chunk_size=args.chunk_size,
+                        max_retries=args.max_retries, parquet_dir=args.parquet, partition_by=args.partition_by,
+                        index_path=args.index, dedup=args.dedup, prefilter=args.prefilter,
+                        engine=args.engine, workers=args.workers, queue_size=args.queue_size, ndjson=ndjson,
+                        repair=args.repair)
+    with progress:
+        if args.service:
+            service_process_termsheets(args.directory, args.output, service_url=args.service,
+                                       max_in_flight=args.max_in_flight, parquet_dir=args.parquet,
+                                       partition_by=args.partition_by, index_path=args.index, ndjson=ndjson)
+        elif args.watch:
+            from watch import watch_directory
+            try:
+                asyncio.run(watch_directory(args.directory, args.output, settle=args.settle,
+                                            poll_interval=args.poll_interval, **batch_kwargs))
+            except KeyboardInterrupt:
+                print("Stopped watching")
+        else:
+            asyncio.run(batch_process_termsheets(args.directory, args.output, resume=args.resume, **batch_kwargs))
+    if ndjson is not None:
+        ndjson.close() 
\ No newline at end of file
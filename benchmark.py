@@ -0,0 +1,282 @@
+"""Benchmarks for the extraction pipeline against the offline fake agent
+
+Each scenario runs in its own process so peak RSS is measured per scenario:
+
+    python benchmark.py --docs 200 --latency 0.2 --json results.json
+    python benchmark.py --scenario batch --compare results.json
+"""
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SCENARIOS = ("extract", "batch", "local", "app", "lifecycle")
+
+
+def latency_stats(samples):
+    """p50/p95/p99/max of latencies in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2), "max_ms": round(float(values.max()), 2)}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children"""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def make_agent(args):
+    from fake_agent import FakeAgent
+    return FakeAgent(latency=args.latency, call_latency=args.call_latency, failure_rate=args.failure_rate,
+                     seed=args.seed, result_size=args.result_size)
+
+
+def report(docs, elapsed, latencies, agent=None, **extra):
+    result = {"docs": docs, "elapsed_s": round(elapsed, 3),
+              "docs_per_sec": round(docs / elapsed, 2) if elapsed else None}
+    result.update(latency_stats(latencies))
+    if agent is not None:
+        result.update(agent.stats())
+    result.update(extra)
+    return result
+
+
+def bench_extract(args, pdf_files, workdir):
+    """extract_termsheet one document at a time, as the CLI and app do"""
+    from extract import extract_termsheet
+    agent = make_agent(args)
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for pdf_file in pdf_files:
+        t0 = time.perf_counter()
+        try:
+            extract_termsheet(pdf_file, use_cache=False, agent=agent)
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - t0)
+    return report(len(pdf_files), time.perf_counter() - started, latencies, agent, failures=failures)
+
+
+def bench_batch(args, pdf_files, workdir, engine="remote"):
+    """batch_process_termsheets over the whole corpus; latency is queue to result per job"""
+    from batch_process import batch_process_termsheets
+    agent = make_agent(args)
+    output_dir = os.path.join(workdir, f"out_{engine}")
+    started = time.perf_counter()
+    asyncio.run(batch_process_termsheets(os.path.dirname(pdf_files[0]), output_dir, use_cache=False,
+                                         agent=agent, max_in_flight=args.max_in_flight,
+                                         chunk_size=args.chunk_size, engine=engine, workers=args.workers,
+                                         dedup="off"))
+    elapsed = time.perf_counter() - started
+    written = sum(entry.stat().st_size for entry in os.scandir(output_dir) if entry.name.endswith('.json'))
+    return report(len(pdf_files), elapsed, agent.latencies, agent, bytes_written=written)
+
+
+def bench_local(args, pdf_files, workdir):
+    """The batch with the local rule engine only, so no remote latency is involved"""
+    return bench_batch(args, pdf_files, workdir, engine="local")
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.file_id = name
+
+
+def bench_app(args, pdf_files, workdir):
+    """Rerun latency of app.py once every uploaded document has been extracted"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    import extract
+
+    agent = make_agent(args)
+    agent.latency = 0
+    extract.get_agent = lambda *a, **k: agent
+    uploads = []
+    for pdf_file in pdf_files[:args.app_docs]:
+        with open(pdf_file, 'rb') as f:
+            uploads.append(_Upload(f.read(), os.path.basename(pdf_file)))
+    st.file_uploader = lambda *a, **k: uploads if k.get("accept_multiple_files") else uploads[0]
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"),
+                            default_timeout=60)
+    app.run()
+    app.button(key="extract_button").click().run()
+    deadline = time.monotonic() + 60
+    while len(app.session_state["results"]) < len(uploads) and time.monotonic() < deadline:
+        time.sleep(0.1)
+        app.run()
+
+    latencies = []
+    for _ in range(args.reruns):
+        t0 = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - t0)
+    result = {"uploads": len(uploads), "reruns": args.reruns, "exceptions": len(app.exception)}
+    result.update(latency_stats(latencies))
+    return result
+
+
+def bench_lifecycle(args, pdf_files, workdir):
+    """Load a synthetic book into lifecycle arrays and evaluate it against fixings"""
+    from lifecycle import Book
+    from synthetic import UNDERLYINGS, synthetic_book
+
+    tables = synthetic_book(args.book_size, seed=args.seed, coupons=args.coupons)
+    fixings = {ticker: level for _, ticker, _, level in UNDERLYINGS}
+    started = time.perf_counter()
+    book = Book(*tables)
+    loaded = time.perf_counter()
+    latencies = []
+    for _ in range(args.reruns):
+        t0 = time.perf_counter()
+        book.evaluate("2024-06-01", fixings)
+        latencies.append(time.perf_counter() - t0)
+    result = {"docs": len(book), "events": len(book.event_date), "load_s": round(loaded - started, 3),
+              "docs_per_sec": round(len(book) / np.median(latencies), 2)}
+    result.update(latency_stats(latencies))
+    return result
+
+
+def run_scenario(name, args):
+    from synthetic import generate_corpus
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the benchmark away from the user's cache and spool
+        os.environ["TERMSHEET_CACHE_DIR"] = os.path.join(workdir, "cache")
+        os.environ["TERMSHEET_SPOOL_DIR"] = os.path.join(workdir, "spool")
+        # The lifecycle scenario builds its book in memory and needs no PDFs
+        pdf_files = [] if name == "lifecycle" else generate_corpus(os.path.join(workdir, "pdfs"), args.docs,
+                                                                   seed=args.seed, coupons=args.coupons)
+        result = globals()[f"bench_{name}"](args, pdf_files, workdir)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(name, argv):
+    """Run one scenario in a fresh interpreter and return its result"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        path = f.name
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--scenario", name,
+                                    "--json", path, "--in-process"], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr[-2000:], file=sys.stderr)
+            return {"error": f"exited with status {completed.returncode}"}
+        with open(path, 'r') as f:
+            return json.load(f)["scenarios"][name]
+    finally:
+        os.unlink(path)
+
+
+def compare(results, baseline):
+    """Print the change of each scenario's throughput and tail latency against a baseline run"""
+    for name, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "error" in result or "error" in before:
+            continue
+        for metric in ("docs_per_sec", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if before.get(metric) and result.get(metric) is not None:
+                change = 100 * (result[metric] - before[metric]) / before[metric]
+                print(f"{name:8} {metric:13} {before[metric]:>10} -> {result[metric]:>10} ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline with a fake agent")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run; may be repeated (default: all)")
+    parser.add_argument("--docs", type=int, default=100, help="Synthetic termsheets per scenario")
+    parser.add_argument("--coupons", type=int, default=12, help="Coupon payments per synthetic termsheet")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds until each fake job completes")
+    parser.add_argument("--call-latency", type=float, default=0.01, help="Blocking delay per fake SDK call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a fake job fails")
+    parser.add_argument("--result-size", type=int, default=12, help="Schedule rows in each fake result")
+    parser.add_argument("--max-in-flight", type=int, default=50, help="Maximum extraction jobs queued at once")
+    parser.add_argument("--chunk-size", type=int, default=10, help="Number of files submitted per queue request")
+    parser.add_argument("--workers", type=int, help="Pre-processing processes for the batch scenarios")
+    parser.add_argument("--app-docs", type=int, default=3, help="Documents uploaded in the app scenario")
+    parser.add_argument("--reruns", type=int, default=20, help="Timed reruns in the app and lifecycle scenarios")
+    parser.add_argument("--book-size", type=int, default=100000, help="Products in the lifecycle scenario's book")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the corpus and fake agent")
+    parser.add_argument("--json", help="Write machine-readable results to this file ('-' for stdout)")
+    parser.add_argument("--compare", help="Print changes against an earlier --json result")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    if args.in_process:
+        results = {name: run_scenario(name, args) for name in scenarios}
+    else:
+        # Forward everything except the selection and output options to each child
+        argv = []
+        skip = False
+        for arg in sys.argv[1:]:
+            if skip:
+                skip = False
+                continue
+            if arg in ("--scenario", "--json", "--compare"):
+                skip = True
+                continue
+            if arg.split("=", 1)[0] in ("--scenario", "--json", "--compare"):
+                continue
+            argv.append(arg)
+        results = {}
+        for name in scenarios:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_isolated(name, argv)
+
+    output = {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("scenario", "json", "compare", "in_process")},
+        "scenarios": results,
+    }
+
+    if args.json == "-":
+        print(json.dumps(output, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+
+    if not args.in_process and args.json != "-":
+        for name, result in results.items():
+            if "error" in result:
+                print(f"{name:8} {result['error']}")
+                continue
+            print(f"{name:8} {result.get('docs_per_sec', '-'):>9} docs/s  p50 {result.get('p50_ms', '-')} ms  "
+                  f"p95 {result.get('p95_ms', '-')} ms  p99 {result.get('p99_ms', '-')} ms  "
+                  f"polls {result.get('poll_calls', '-')}  peak RSS {result['peak_rss_mb']} MB")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(output, json.load(f))
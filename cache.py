@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Bump this whenever the agent schema changes so stale results are not served
+SCHEMA_VERSION = "1"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "termsheet-parser")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+# Seconds between full scans for expired entries; size limits are checked on every put
+EVICT_INTERVAL = 300
+# Temporary files older than this were left behind by a writer that crashed
+TMP_MAX_AGE = 3600
+
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of a bytes object"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _unlink(path):
+    """Remove a file that another thread or process may already have removed"""
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class ExtractionCache:
+    """Persistent cache of extraction results keyed by PDF content and agent
+
+    The total size is kept in memory and updated on every put, so the cache
+    directory is only scanned when the size limit is exceeded or once every
+    ``evict_interval`` seconds to drop expired entries. Other processes may
+    share the directory; entries they remove are simply skipped.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE, bypass=False,
+                 evict_interval=EVICT_INTERVAL):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bypass = bypass
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, content_hash, agent):
+        """Combine the document hash with the agent and schema version"""
+        return hash_bytes(f"{content_hash}:{agent}:{SCHEMA_VERSION}".encode())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, content_hash, agent):
+        """Return the cached result or None on a miss"""
+        if self.bypass:
+            return None
+
+        path = self._path(self.key_for(content_hash, agent))
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                self._expire(path)
+                return None
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch the entry so size-based eviction drops the least recently used first
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def _expire(self, path):
+        """Count a miss and remove an expired entry, unless a put has just refreshed it"""
+        with self._lock:
+            self.misses += 1
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return
+            if time.time() - stat.st_mtime > self.max_age and _unlink(path):
+                self.evictions += 1
+                if self._size is not None:
+                    self._size -= stat.st_size
+
+    def put(self, content_hash, agent, data):
+        """Store a result, then trim the cache back under its limits"""
+        if self.bypass:
+            return
+
+        path = self._path(self.key_for(content_hash, agent))
+        # Concurrent writers of the same key each use their own temporary file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self._size is not None:
+                self._size += size - replaced
+            due = (self._size is None or self._size > self.max_bytes
+                   or time.time() - self._last_evict > self.evict_interval)
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries and abandoned temporary files, then the oldest entries until under max_bytes"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.tmp'):
+                    try:
+                        if now - entry.stat().st_mtime > TMP_MAX_AGE:
+                            _unlink(entry.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.max_age:
+                    if _unlink(entry.path):
+                        self.evictions += 1
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, path = entries.pop(0)
+                if _unlink(path):
+                    self.evictions += 1
+                total -= size
+            self._size = total
+            self._last_evict = now
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.json'):
+                    _unlink(entry.path)
+            self._size = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Return the process-wide cache, configured from environment variables"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache(
+            cache_dir=os.getenv("TERMSHEET_CACHE_DIR"),
+            max_bytes=int(float(os.getenv("TERMSHEET_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+            max_age=float(os.getenv("TERMSHEET_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE / (24 * 3600))) * 24 * 3600,
+            bypass=os.getenv("TERMSHEET_CACHE_BYPASS", "").lower() in ("1", "true", "yes"),
+        )
+    return _default_cache
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from schema import normalize
+
+
+def comparison_row(name, result):
+    """Flatten the headline fields of one result (raw or normalized) into a single row"""
+    result = normalize(result)
+    pg = result.productGeneral
+    dates = result.dates
+    coupon = result.coupon
+
+    return {
+        "File": name,
+        "Product Name": pg.productName,
+        "Product Type": pg.productType,
+        "ISIN": pg.ISIN,
+        "Currency": pg.currency,
+        "Issue Size": pg.issueSize,
+        "Denomination": pg.denomination,
+        "Initial Fixing Date": dates.initialFixingDate,
+        "Issue Date": dates.issueDate,
+        "Final Fixing Date": dates.finalFixingDate,
+        "Redemption Date": dates.redemptionDate,
+        "Underlyings": ", ".join(filter(None, (u.name for u in result.underlyings))),
+        "Bloomberg Tickers": ", ".join(filter(None, (u.bloombergTicker for u in result.underlyings))),
+        "Coupon Rate (%)": coupon.couponRate,
+        "Coupon Payments": len(coupon.couponPaymentDates) if coupon.couponPaymentDates else None,
+    }
+
+
+def build_comparison_frame(results):
+    """Build one DataFrame with a row per product from ``(name, result)`` pairs"""
+    return pd.DataFrame([comparison_row(name, result) for name, result in results])
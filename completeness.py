@@ -0,0 +1,265 @@
+import os
+import tempfile
+import time
+
+from metrics import get_metrics
+from prefilter import PdfReader, page_ranges, write_pages
+from schema import normalize
+
+# Sections scoring below this are re-extracted (1.0: any failed check)
+MIN_SECTION_SCORE = float(os.getenv("TERMSHEET_MIN_SECTION_SCORE", 1.0))
+# Targeted re-extractions per document before a deficient section is left as it is
+REPAIR_ATTEMPTS = int(os.getenv("TERMSHEET_REPAIR_ATTEMPTS", 1))
+# Best-matching pages sent per deficient section, on top of the first page
+SECTION_PAGES = int(os.getenv("TERMSHEET_SECTION_PAGES", 3))
+
+# Phrases that locate each section's fields in the page text
+SECTION_KEYWORDS = {
+    "productGeneral": ("isin", "valor", "product type", "currency", "denomination", "issue size", "issue price"),
+    "dates": ("initial fixing date", "final fixing date", "issue date", "redemption date", "fixing date",
+              "payment date", "maturity"),
+    "underlyings": ("underlying", "bloomberg", "ticker", "fixing level", "initial level", "strike", "exchange"),
+    "coupon": ("coupon", "coupon rate", "payment date", "p.a.", "interest"),
+    "earlyRedemption": ("early redemption", "autocall", "observation date", "trigger", "autocall level"),
+}
+
+# Product types that come with a coupon or an early redemption schedule
+COUPON_PRODUCTS = ("coupon", "reverse convertible", "autocall", "express", "income")
+CALLABLE_PRODUCTS = ("autocall", "express", "callable")
+
+
+def _fraction(checks):
+    return sum(1 for check in checks if check) / len(checks)
+
+
+def _product_type(record):
+    return (record.productGeneral.productType or "").lower()
+
+
+def score_product_general(record):
+    general = record.productGeneral
+    return _fraction([general.productName, general.productType, general.currency, general.ISIN or general.valor])
+
+
+def score_dates(record):
+    dates = record.dates
+    values = [dates.initialFixingDate, dates.issueDate, dates.finalFixingDate, dates.redemptionDate]
+    ordered = all(values) and (dates.initialFixingDate <= dates.finalFixingDate <= dates.redemptionDate
+                               and dates.issueDate <= dates.redemptionDate)
+    return _fraction(values + [ordered])
+
+
+def score_underlyings(record):
+    if not record.underlyings:
+        return 0.0
+    return sum(_fraction([u.name or u.bloombergTicker, u.initialFixingLevel is not None])
+               for u in record.underlyings) / len(record.underlyings)
+
+
+def score_coupon(record):
+    """None when the product pays no coupon and none was extracted"""
+    coupon = record.coupon
+    if not coupon and not any(word in _product_type(record) for word in COUPON_PRODUCTS):
+        return None
+    payments = coupon.couponPaymentDates
+    return _fraction([coupon.couponRate is not None or any(p.couponRate is not None for p in payments),
+                      payments, payments and all(p.paymentDate for p in payments)])
+
+
+def score_early_redemption(record):
+    """None when the product cannot be called early and no schedule was extracted"""
+    early = record.earlyRedemption
+    if not early and not any(word in _product_type(record) for word in CALLABLE_PRODUCTS):
+        return None
+    events = early.redemptionEvents
+    return _fraction([events, events and all(e.observationDate for e in events),
+                      events and all(e.autocallLevel is not None for e in events)])
+
+
+SECTION_CHECKS = {
+    "productGeneral": score_product_general,
+    "dates": score_dates,
+    "underlyings": score_underlyings,
+    "coupon": score_coupon,
+    "earlyRedemption": score_early_redemption,
+}
+
+
+def score_result(result):
+    """Score each checked section of a result from 0 (missing) to 1 (complete)
+
+    Sections that do not apply to the product, such as a coupon schedule
+    for a tracker, are left out.
+    """
+    record = normalize(result)
+    scores = {}
+    for section, check in SECTION_CHECKS.items():
+        score = check(record)
+        if score is not None:
+            scores[section] = round(score, 3)
+    return scores
+
+
+def deficient_sections(scores, threshold=MIN_SECTION_SCORE):
+    return [section for section, score in scores.items() if score < threshold]
+
+
+def section_pages(texts, sections, per_section=SECTION_PAGES):
+    """0-based pages most likely to hold ``sections``; the first page is always kept"""
+    lowered = [text.lower() for text in texts]
+    pages = {0}
+    for section in sections:
+        keywords = SECTION_KEYWORDS[section]
+        scores = [sum(text.count(word) for word in keywords) for text in lowered]
+        matching = sorted((i for i, score in enumerate(scores) if score), key=lambda i: -scores[i])
+        pages.update(matching[:per_section])
+    return sorted(pages)
+
+
+class Repair:
+    """Audit record of the targeted re-extraction of one document"""
+
+    def __init__(self, source, scores, sections):
+        self.source = source
+        self.before = scores
+        self.after = dict(scores)
+        self.sections = sections
+        self.retries = {}
+        self.pages = None
+        self.page_count = None
+        self.seconds = 0.0
+        self.seconds_saved = None
+
+    @property
+    def improved(self):
+        return [section for section in self.sections if self.after[section] > self.before[section]]
+
+    @property
+    def ranges(self):
+        return page_ranges(self.pages) if self.pages is not None else "all"
+
+    def to_dict(self):
+        return {"sections": self.sections, "retries": self.retries, "improved": self.improved,
+                "before": {s: self.before[s] for s in self.sections},
+                "after": {s: self.after[s] for s in self.sections},
+                "pages": self.ranges, "page_count": self.page_count,
+                "seconds": round(self.seconds, 3), "seconds_saved": self.seconds_saved}
+
+
+def _page_texts(pdf_path):
+    if PdfReader is None:
+        return None, None
+    try:
+        reader = PdfReader(pdf_path)
+        return reader, [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        print(f"Could not read pages of {pdf_path}: {e}")
+        return None, None
+
+
+def repair_result(result, pdf_path, extract, threshold=MIN_SECTION_SCORE, attempts=REPAIR_ATTEMPTS,
+                  baseline_seconds=None):
+    """Re-extract only the deficient sections of ``result`` and merge them back
+
+    ``extract(path)`` runs the agent on a PDF and returns a raw result. It is
+    called with a copy of ``pdf_path`` holding just the pages that match the
+    deficient sections' keywords, and only those sections are taken from the
+    answer, each one only if it scores higher than before. Sections that are
+    still deficient are retried up to ``attempts`` times. Returns the merged
+    result and a Repair; with ``baseline_seconds``, the duration of a full
+    extraction, the Repair also reports the time saved against full re-runs.
+    """
+    scores = score_result(result)
+    report = Repair(pdf_path, scores, deficient_sections(scores, threshold))
+    if not report.sections:
+        return result, report
+
+    metrics = get_metrics()
+    reader, texts = _page_texts(pdf_path)
+    merged = dict(result or {})
+    pending = report.sections
+    failed = []
+    for _ in range(attempts):
+        for section in pending:
+            report.retries[section] = report.retries.get(section, 0) + 1
+            metrics.inc("section_retries_total", section=section)
+
+        upload_path = pdf_path
+        if texts:
+            report.page_count = len(texts)
+            pages = section_pages(texts, pending)
+            if len(pages) < len(texts):
+                fd, upload_path = tempfile.mkstemp(suffix='.pdf', prefix='termsheet-sections-')
+                os.close(fd)
+                try:
+                    write_pages(reader, pages, upload_path)
+                    report.pages = pages
+                    metrics.inc("reextract_pages_saved_total", len(texts) - len(pages))
+                except Exception as e:
+                    # Send the whole document rather than give up on the repair
+                    print(f"Could not write pages {page_ranges(pages)} of {pdf_path}: {e}")
+                    os.unlink(upload_path)
+                    upload_path = pdf_path
+                    report.pages = None
+
+        started = time.perf_counter()
+        try:
+            with metrics.span("section_reextract", attrs={"file": pdf_path, "sections": pending,
+                                                          "pages": report.ranges}):
+                answer = extract(upload_path)
+        except Exception as e:
+            print(f"Section re-extraction failed for {pdf_path}: {e}")
+            failed = pending
+            break
+        finally:
+            report.seconds += time.perf_counter() - started
+            if upload_path != pdf_path:
+                os.unlink(upload_path)
+
+        answer_scores = score_result(answer)
+        for section in pending:
+            if answer_scores.get(section, 0.0) > report.after[section]:
+                merged[section] = answer.get(section)
+                report.after[section] = answer_scores[section]
+        pending = [section for section in pending if report.after[section] < threshold]
+        if not pending:
+            break
+
+    improved = report.improved
+    for section in report.sections:
+        outcome = "improved" if section in improved else "failed" if section in failed else "unchanged"
+        metrics.inc("section_repairs_total", section=section, outcome=outcome)
+    if baseline_seconds is not None:
+        # Every attempt stands in for one full re-run of the document
+        full_runs = max(report.retries.values()) * baseline_seconds
+        report.seconds_saved = round(max(0.0, full_runs - report.seconds), 3)
+        metrics.inc("reextract_seconds_saved_total", report.seconds_saved)
+    return merged, report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from cache import get_cache, hash_file
+    from extract import PREFILTER, cache_agent_key, engine_policy, extract_termsheet
+
+    parser = argparse.ArgumentParser(description="Score a termsheet's extraction and re-extract deficient sections")
+    parser.add_argument("pdf", help="Termsheet PDF; its cached result is used when there is one")
+    parser.add_argument("--repair", action="store_true",
+                        help="Re-extract deficient sections and cache the merged result for repairing runs")
+    parser.add_argument("--threshold", type=float, default=MIN_SECTION_SCORE,
+                        help="Sections scoring below this are deficient")
+    parser.add_argument("--attempts", type=int, default=REPAIR_ATTEMPTS, help="Targeted re-extractions per document")
+    args = parser.parse_args()
+
+    result = extract_termsheet(args.pdf, repair=False)
+    scores = score_result(result)
+    for section, score in scores.items():
+        flag = "  deficient" if score < args.threshold else ""
+        print(f"{section:16} {score:.2f}{flag}")
+    if args.repair:
+        merged, report = repair_result(result, args.pdf, engine_policy("remote").remote.extract,
+                                       threshold=args.threshold, attempts=args.attempts)
+        print(json.dumps(report.to_dict(), indent=2))
+        if report.improved:
+            get_cache().put(hash_file(args.pdf), cache_agent_key(PREFILTER, repair=True), merged)
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+SIGNATURES_NAME = "signatures.jsonl"
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hash overlapping word n-grams of normalised text to 32-bit integers"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature of a shingle set, computed for all permutations at once"""
+    if not shingle_set:
+        return None
+    values = np.fromiter(shingle_set, dtype=np.uint64)
+    # Values and coefficients are below 2^32, so the products stay inside uint64
+    hashed = (np.outer(_PERM_A, values) + _PERM_B[:, None]) % MERSENNE_PRIME
+    return hashed.min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(np.asarray(sig_a) == np.asarray(sig_b)))
+
+
+class SignatureIndex:
+    """Locality-sensitive hashing over MinHash signatures
+
+    Signatures are split into bands; documents sharing any band bucket are
+    candidates and are then compared on the full signature. Entries can be
+    persisted to ``signatures.jsonl`` so later runs find near-duplicates of
+    documents that were already extracted.
+    """
+
+    def __init__(self, output_dir=None, threshold=0.9):
+        self.threshold = threshold
+        self.path = os.path.join(output_dir, SIGNATURES_NAME) if output_dir else None
+        self._buckets = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._insert(entry["hash"], entry["signature"], entry.get("output"))
+
+    def _bands(self, signature):
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            yield band, tuple(signature[band * rows:(band + 1) * rows])
+
+    def _insert(self, key, signature, output=None):
+        self._entries[key] = (signature, output)
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+
+    def add(self, key, signature, output=None, persist=False):
+        with self._lock:
+            self._insert(key, signature, output)
+            if persist and self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps({"hash": key, "signature": signature, "output": output}) + "\n")
+
+    def best_match(self, signature):
+        """Return (key, output, similarity) of the closest entry above threshold, or None"""
+        with self._lock:
+            candidates = set()
+            for band in self._bands(signature):
+                candidates |= self._buckets.get(band, set())
+            best = None
+            for key in candidates:
+                other, output = self._entries[key]
+                score = similarity(signature, other)
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (key, output, score)
+            return best
+
+
+class DedupPlan:
+    """Result of planning a batch: which files to submit and which reuse another result
+
+    Files can be added one at a time as they are hashed and analysed, so a
+    streaming batch can plan while earlier files are already being extracted.
+    """
+
+    def __init__(self, index=None, near=True):
+        self.submit = []
+        self.exact = {}
+        self.near = {}
+        self.previous = {}
+        self.previous_keys = {}
+        self.signatures = {}
+        self.index = index
+        self.use_near = near
+        self._batch_index = SignatureIndex(threshold=index.threshold if index else 0.9)
+        self._first_by_hash = {}
+
+    @property
+    def avoided(self):
+        return len(self.exact) + len(self.near) + len(self.previous)
+
+    def duplicates_of(self, canonical):
+        return [f for f, c in list(self.exact.items()) + list(self.near.items()) if c == canonical]
+
+    def add_exact(self, pdf_file, content_hash):
+        """Return the earlier file with the same content hash, or None if this one is the first"""
+        canonical = self._first_by_hash.get(content_hash)
+        if canonical is not None:
+            self.exact[pdf_file] = canonical
+            return canonical
+        self._first_by_hash[content_hash] = pdf_file
+        return None
+
+    def add_near(self, pdf_file, signature):
+        """Match a first-of-its-hash file on its signature; return True if it must be submitted"""
+        if self.use_near and signature is not None:
+            self.signatures[pdf_file] = signature
+            previous = self.index.best_match(signature) if self.index else None
+            if previous and previous[1] and os.path.exists(previous[1]):
+                self.previous[pdf_file] = previous[1]
+                self.previous_keys[pdf_file] = previous[0]
+                return False
+            match = self._batch_index.best_match(signature)
+            if match:
+                self.near[pdf_file] = match[0]
+                return False
+            self._batch_index.add(pdf_file, signature)
+        self.submit.append(pdf_file)
+        return True
@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+import pandas as pd
+
+from export import SCHEMAS, flatten_result
+from schema import normalize_many
+
+# An Excel writer is optional; without one only JSON, CSV and ZIP downloads are offered
+try:
+    import xlsxwriter  # noqa: F401
+    XLSX_ENGINE = "xlsxwriter"
+except ImportError:
+    try:
+        import openpyxl  # noqa: F401
+        XLSX_ENGINE = "openpyxl"
+    except ImportError:
+        XLSX_ENGINE = None
+
+MIME_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+}
+
+# Upper bound on the serialized downloads kept per session
+MAX_DOWNLOAD_MB = float(os.getenv("TERMSHEET_DOWNLOAD_CACHE_MB", 64))
+
+
+def json_bytes(result, compact=True):
+    """Serialize a raw result, compact unless ``compact`` is False"""
+    if compact:
+        return json.dumps(result, separators=(',', ':'), ensure_ascii=False, default=str).encode()
+    return json.dumps(result, indent=2, ensure_ascii=False, default=str).encode()
+
+
+def table_frames(documents):
+    """One DataFrame per export table from ``(document_id, result)`` pairs, validated in bulk"""
+    documents = list(documents)
+    records = normalize_many([result for _, result in documents])
+    rows = {name: [] for name in SCHEMAS}
+    for (document_id, _), record in zip(documents, records):
+        for name, table_rows in flatten_result(record, document_id).items():
+            rows[name].extend(table_rows)
+    return {name: pd.DataFrame(table_rows, columns=[column for column, _ in SCHEMAS[name]])
+            for name, table_rows in rows.items()}
+
+
+def csv_bytes(frame):
+    return frame.to_csv(index=False).encode()
+
+
+def xlsx_bytes(frames):
+    """All tables as one workbook, a sheet per table"""
+    if XLSX_ENGINE is None:
+        raise ImportError("XLSX downloads require xlsxwriter or openpyxl: pip install openpyxl")
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine=XLSX_ENGINE) as writer:
+        for name, frame in frames.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+def bundle_bytes(documents, xlsx=False):
+    """ZIP of each result as JSON plus the combined tables as CSV (and XLSX)
+
+    ``documents`` is a list of ``(name, result)`` pairs. Files are compressed into
+    the archive one at a time, so only the finished archive is held.
+    """
+    stems = []
+    for name, _ in documents:
+        # Uploads with the same file name still get a JSON file and document ID each
+        stem = base = os.path.splitext(name)[0]
+        n = 1
+        while stem in stems:
+            n += 1
+            stem = f"{base}_{n}"
+        stems.append(stem)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for stem, (_, result) in zip(stems, documents):
+            archive.writestr(f"json/{stem}.json", json_bytes(result))
+        frames = table_frames((stem, result) for stem, (_, result) in zip(stems, documents))
+        for table, frame in frames.items():
+            archive.writestr(f"tables/{table}.csv", csv_bytes(frame))
+        if xlsx and XLSX_ENGINE is not None:
+            archive.writestr("tables.xlsx", xlsx_bytes(frames))
+    return buffer.getvalue()
+
+
+class DownloadStore:
+    """Serialized downloads, built once per (key, format) and reused until evicted
+
+    Entries are kept in LRU order up to ``max_bytes`` in total. ``get`` may
+    be called from the web server thread that serves a deferred download,
+    so the store is locked.
+    """
+
+    def __init__(self, max_bytes=MAX_DOWNLOAD_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, fmt, build):
+        """Return the bytes for ``(key, fmt)``, calling ``build()`` only the first time"""
+        with self._lock:
+            data = self._entries.get((key, fmt))
+            if data is not None:
+                self._entries.move_to_end((key, fmt))
+                return data
+        data = build()
+        with self._lock:
+            if (key, fmt) not in self._entries:
+                self._entries[(key, fmt)] = data
+                self.size += len(data)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return data
+
+    def discard(self, key):
+        """Forget every format of ``key``, e.g. when its result is replaced"""
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == key]:
+                self.size -= len(self._entries.pop(entry))
@@ -0,0 +1,266 @@
+import abc
+import re
+
+from schema import parse_date
+
+# pypdf is optional; without it the local engine is unavailable
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+ENGINE_MODES = ("remote", "local", "local-first", "remote-first")
+
+DATE_TEXT = (r"(\d{4}-\d{2}-\d{2}|\d{1,2}[./]\d{1,2}[./]\d{2,4}|"
+             r"\d{1,2} (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{4}|"
+             r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}, \d{4})")
+PERCENT_TEXT = r"(-?\d+(?:[.,]\d+)?\s?%(?:\s?p\.a\.)?)"
+LEVEL_TEXT = r"(\d[\d',]*(?:\.\d+)?)"
+
+CURRENCIES = ("CHF", "EUR", "USD", "GBP", "JPY", "HKD", "SGD", "AUD", "CAD", "SEK", "NOK", "DKK", "CNY")
+PRODUCT_TYPES = (
+    "Barrier Reverse Convertible", "Reverse Convertible", "Express Certificate", "Autocallable",
+    "Capital Protected Note", "Capital Protection", "Tracker Certificate", "Bonus Certificate",
+    "Discount Certificate", "Participation Note", "Credit Linked Note",
+)
+TICKER_PATTERN = re.compile(
+    r"\b([A-Z0-9]{1,6}(?:/[A-Z])? (?:SE|SW|VX|US|UN|UW|UQ|GY|GR|FP|LN|NA|IM|SM|BB|JP|JT|HK|AU|CN)(?: Equity)?)\b")
+
+DATE_LABELS = {
+    "initialFixingDate": r"initial fixing date|trade date|pricing date",
+    "issueDate": r"issue date|payment date \(issue\)|settlement date",
+    "finalFixingDate": r"final fixing date|valuation date|final valuation date",
+    "redemptionDate": r"redemption date|maturity date",
+}
+
+
+class ExtractionEngine(abc.ABC):
+    """Common interface for turning a termsheet PDF into the result schema"""
+
+    name = None
+
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def extract(self, file_path):
+        """Return a result dict with the same sections the UI renders"""
+
+
+class LlamaExtractEngine(ExtractionEngine):
+    """The remote LlamaExtract agent; ``agent_factory`` returns the agent handle"""
+
+    name = "remote"
+
+    def __init__(self, agent_factory):
+        self.agent_factory = agent_factory
+
+    def extract(self, file_path):
+        return self.agent_factory().extract(file_path).data
+
+
+def isin_check_digit(body):
+    """Luhn check digit for the first 11 characters of an ISIN"""
+    digits = "".join(str(int(c, 36)) for c in body)
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        n = int(d)
+        if i % 2 == 0:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return (10 - total % 10) % 10
+
+
+def isin_is_valid(isin):
+    """Check an ISIN's Luhn check digit"""
+    return isin_check_digit(isin[:-1]) == int(isin[-1])
+
+
+def _iso(text):
+    parsed = parse_date(text)
+    return parsed.isoformat() if parsed else text
+
+
+def _search(pattern, text, flags=re.IGNORECASE):
+    match = re.search(pattern, text, flags)
+    return match.group(1).strip() if match else None
+
+
+class LocalRuleEngine(ExtractionEngine):
+    """Rule-based offline engine over the PDF text layer
+
+    Labelled fields, identifiers, Bloomberg tickers and schedule rows are
+    pulled out with regular expressions. It covers common vanilla products in
+    milliseconds; ``is_complete`` tells the policy when to fall back to the
+    remote engine.
+    """
+
+    name = "local"
+
+    def available(self):
+        return PdfReader is not None
+
+    def read_text(self, file_path):
+        reader = PdfReader(file_path)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+    def extract(self, file_path):
+        if not self.available():
+            raise RuntimeError("The local engine requires pypdf: pip install pypdf")
+        return self.parse(self.read_text(file_path))
+
+    def parse(self, text):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        return {
+            "productGeneral": self._product_general(text, lines),
+            "issuerInformation": {
+                "issuerName": _search(r"\bissuer\s*[:\-]?\s*([^\n]+)", text),
+                "issuerRating": _search(r"rating\s*[:\-]?\s*([A-D][a-z]{0,2}[1-3]?[+\-]?)(?![A-Za-z])", text),
+                "calculationAgent": _search(r"calculation agent\s*[:\-]?\s*([^\n]+)", text),
+            },
+            "dates": {key: self._labelled_date(labels, text) for key, labels in DATE_LABELS.items()},
+            "underlyings": self._underlyings(lines),
+            "coupon": {
+                "couponRate": _search(r"coupon(?: rate)?\s*[:\-]?\s*" + PERCENT_TEXT, text),
+                "couponPaymentDates": self._coupon_schedule(lines),
+            },
+            "earlyRedemption": {
+                "automaticEarlyRedemptionEvent": _search(r"(?:automatic early redemption|autocall) event\s*[:\-]?\s*([^\n]+)", text),
+                "redemptionEvents": self._redemption_events(lines),
+            },
+            "redemption": {
+                "worstPerformance": _search(r"worst(?:[- ]of)? performance\s*[:\-]?\s*([^\n]+)", text),
+            },
+            "riskFactors": {
+                "riskOfLoss": _search(r"([^.\n]*\blos(?:e|s|ing)\b[^.\n]*capital[^.\n]*\.|[^.\n]*capital[^.\n]*\blos(?:e|s|ing)\b[^.\n]*\.)", text),
+                "issuerCreditRisk": _search(r"([^.\n]*issuer[^.\n]*credit[^.\n]*\.)", text),
+            },
+        }
+
+    def _product_general(self, text, lines):
+        isin = next((m for m in re.findall(r"\b([A-Z]{2}[A-Z0-9]{9}\d)\b", text) if isin_is_valid(m)), None)
+        currency = _search(r"(?i:currency)\s*[:\-]?\s*([A-Z]{3})\b", text, 0)
+        if currency is None:
+            counts = {code: text.count(code) for code in CURRENCIES}
+            best = max(counts, key=counts.get)
+            currency = best if counts[best] else None
+        product_type = next((t for t in PRODUCT_TYPES if t.lower() in text.lower()), None)
+        return {
+            "productName": lines[0] if lines else None,
+            "productType": product_type,
+            "currency": currency,
+            "issueSize": _search(r"issue size\s*[:\-]?\s*([^\n]+)", text),
+            "denomination": _search(r"denomination\s*[:\-]?\s*([A-Z]{3}\s?[\d',.]+)", text),
+            "minimumInvestment": _search(r"minimum investment\s*[:\-]?\s*([^\n]+)", text),
+            "ISIN": isin,
+            "valor": _search(r"valor(?:\s*(?:no\.?|number))?\s*[:\-]?\s*(\d{5,9})", text),
+        }
+
+    def _labelled_date(self, labels, text):
+        value = _search(rf"(?:{labels})\s*[:\-]?\s*{DATE_TEXT}", text)
+        return _iso(value) if value else None
+
+    def _underlyings(self, lines):
+        underlyings = []
+        seen = set()
+        for line in lines:
+            match = TICKER_PATTERN.search(line)
+            if not match or match.group(1) in seen:
+                continue
+            seen.add(match.group(1))
+            name = line[:match.start()].strip(" :|-")
+            name = re.sub(r"(?i)\b(underlying|bloomberg|ticker)\b", "", name).strip(" :|-") or None
+            rest = line[match.end():]
+            strike = re.search(PERCENT_TEXT, rest)
+            level = re.search(rf"(?<![\d.]){LEVEL_TEXT}(?!\s?%)", rest)
+            currency = next((c for c in CURRENCIES if re.search(rf"\b{c}\b", line)), None)
+            underlyings.append({
+                "name": name,
+                "bloombergTicker": match.group(1),
+                "referenceCurrency": currency,
+                "initialFixingLevel": level.group(1) if level else None,
+                "strikeLevel": strike.group(1) if strike else None,
+            })
+        return underlyings
+
+    def _coupon_schedule(self, lines):
+        rows = []
+        pattern = re.compile(rf"^(\d{{1,3}})\s+{DATE_TEXT}\s+{PERCENT_TEXT}$")
+        for line in lines:
+            match = pattern.match(line)
+            if match:
+                rows.append({"paymentNumber": int(match.group(1)), "paymentDate": _iso(match.group(2)),
+                             "couponRate": match.group(3)})
+        return rows
+
+    def _redemption_events(self, lines):
+        rows = []
+        pattern = re.compile(rf"^(\d{{1,3}})\s+{DATE_TEXT}\s+{DATE_TEXT}\s+{PERCENT_TEXT}(?:\s+(.+))?$")
+        for line in lines:
+            match = pattern.match(line)
+            if match:
+                rows.append({"observationNumber": int(match.group(1)), "observationDate": _iso(match.group(2)),
+                             "redemptionDate": _iso(match.group(3)), "autocallLevel": match.group(4),
+                             "earlyRedemptionAmount": match.group(5)})
+        return rows
+
+    def is_complete(self, result):
+        """True when the core fields a vanilla product needs were all found"""
+        pg = result.get("productGeneral", {})
+        dates = result.get("dates", {})
+        return bool(pg.get("ISIN") and pg.get("currency") and result.get("underlyings")
+                    and dates.get("initialFixingDate") and dates.get("finalFixingDate"))
+
+
+class EnginePolicy:
+    """Decides which engine runs for a document
+
+    ``remote`` and ``local`` use one engine only. ``local-first`` tries the
+    local engine and only goes remote when its result is incomplete;
+    ``remote-first`` goes remote and falls back to the local engine when the
+    remote call fails, e.g. during an outage.
+    """
+
+    def __init__(self, mode, remote, local=None):
+        if mode not in ENGINE_MODES:
+            raise ValueError(f"Engine mode must be one of {ENGINE_MODES}")
+        self.mode = mode
+        self.remote = remote
+        self.local = local or LocalRuleEngine()
+
+    def try_local(self, file_path):
+        """Run the local engine if the mode allows it; return the result if it is usable"""
+        if self.mode not in ("local", "local-first") or not self.local.available():
+            return None
+        try:
+            result = self.local.extract(file_path)
+        except Exception as e:
+            print(f"Local extraction failed for {file_path}: {e}")
+            return None
+        if self.mode == "local" or self.local.is_complete(result):
+            return result
+        return None
+
+    def fallback(self, file_path):
+        """Local result after a remote failure, or None if the mode does not allow it"""
+        if self.mode != "remote-first" or not self.local.available():
+            return None
+        return self.local.extract(file_path)
+
+    def extract(self, file_path):
+        """Return (result, engine_name) for one document"""
+        result = self.try_local(file_path)
+        if result is not None:
+            return result, self.local.name
+        if self.mode == "local":
+            raise RuntimeError(f"Local extraction failed for {file_path}")
+        try:
+            return self.remote.extract(file_path), self.remote.name
+        except Exception as e:
+            result = self.fallback(file_path)
+            if result is None:
+                raise
+            print(f"Remote extraction failed ({e}), used the local engine")
+            return result, self.local.name
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+import uuid
+
+from schema import normalize, normalize_many
+
+# pyarrow is optional; it is only needed for the Parquet export
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+PARTITION_KEYS = ("currency", "issue_year")
+
+# Column types per table; the partition keys are added to every table
+SCHEMAS = {
+    "products": [
+        ("document_id", "string"), ("source", "string"), ("isin", "string"), ("valor", "string"),
+        ("product_name", "string"), ("product_type", "string"), ("issue_size", "float64"),
+        ("denomination", "float64"), ("minimum_investment", "float64"), ("issuer_name", "string"),
+        ("issuer_rating", "string"), ("initial_fixing_date", "date32"), ("issue_date", "date32"),
+        ("final_fixing_date", "date32"), ("redemption_date", "date32"), ("coupon_rate", "float64"),
+        ("autocall_event", "string"), ("worst_performance", "string"),
+    ],
+    "underlyings": [
+        ("document_id", "string"), ("position", "int32"), ("name", "string"),
+        ("bloomberg_ticker", "string"), ("exchange", "string"), ("reference_currency", "string"),
+        ("initial_fixing_level", "float64"), ("strike_level", "float64"),
+    ],
+    "coupon_payments": [
+        ("document_id", "string"), ("payment_number", "int32"), ("coupon_rate", "float64"),
+        ("payment_date", "date32"),
+    ],
+    "redemption_events": [
+        ("document_id", "string"), ("observation_number", "int32"), ("autocall_level", "float64"),
+        ("early_redemption_amount", "float64"), ("observation_date", "date32"),
+        ("redemption_date", "date32"),
+    ],
+}
+
+
+def flatten_result(result, document_id, source=None):
+    """Split one extraction result (raw or normalized) into rows for each table"""
+    result = normalize(result)
+    pg = result.productGeneral
+    dates = result.dates
+    early = result.earlyRedemption
+
+    keys = {
+        "currency": pg.currency or "unknown",
+        "issue_year": dates.issueDate.year if dates.issueDate else 0,
+    }
+
+    products = [dict(keys, **{
+        "document_id": document_id,
+        "source": source,
+        "isin": pg.ISIN,
+        "valor": pg.valor,
+        "product_name": pg.productName,
+        "product_type": pg.productType,
+        "issue_size": pg.issueSize,
+        "denomination": pg.denomination,
+        "minimum_investment": pg.minimumInvestment,
+        "issuer_name": result.issuerInformation.issuerName,
+        "issuer_rating": result.issuerInformation.issuerRating,
+        "initial_fixing_date": dates.initialFixingDate,
+        "issue_date": dates.issueDate,
+        "final_fixing_date": dates.finalFixingDate,
+        "redemption_date": dates.redemptionDate,
+        "coupon_rate": result.coupon.couponRate,
+        "autocall_event": early.automaticEarlyRedemptionEvent,
+        "worst_performance": result.redemption.worstPerformance,
+    })]
+
+    underlyings = [dict(keys, **{
+        "document_id": document_id,
+        "position": i,
+        "name": u.name,
+        "bloomberg_ticker": u.bloombergTicker,
+        "exchange": u.relatedExchange,
+        "reference_currency": u.referenceCurrency,
+        "initial_fixing_level": u.initialFixingLevel,
+        "strike_level": u.strikeLevel,
+    }) for i, u in enumerate(result.underlyings)]
+
+    coupon_payments = [dict(keys, **{
+        "document_id": document_id,
+        "payment_number": p.paymentNumber,
+        "coupon_rate": p.couponRate,
+        "payment_date": p.paymentDate,
+    }) for p in result.coupon.couponPaymentDates]
+
+    redemption_events = [dict(keys, **{
+        "document_id": document_id,
+        "observation_number": e.observationNumber,
+        "autocall_level": e.autocallLevel,
+        "early_redemption_amount": e.earlyRedemptionAmount,
+        "observation_date": e.observationDate,
+        "redemption_date": e.redemptionDate,
+    }) for e in early.redemptionEvents]
+
+    return {
+        "products": products,
+        "underlyings": underlyings,
+        "coupon_payments": coupon_payments,
+        "redemption_events": redemption_events,
+    }
+
+
+def arrow_schema(table_name):
+    fields = [(name, getattr(pa, type_name)()) for name, type_name in SCHEMAS[table_name]]
+    fields += [("currency", pa.string()), ("issue_year", pa.int32())]
+    return pa.schema(fields)
+
+
+class ParquetExporter:
+    """Buffers results and appends them to a partitioned Parquet dataset
+
+    Each table lives in ``base_dir/<table>/`` and is hive-partitioned by
+    ``partition_by`` (currency or issue_year). Every flush validates the
+    buffered results in one bulk call and writes new files next to the
+    existing ones, so batches are appended without rewriting old data.
+    Documents the dataset already holds are skipped, so re-running a batch
+    over the same files (e.g. served from the cache) adds no duplicate rows.
+    """
+
+    def __init__(self, base_dir, partition_by="currency", flush_rows=1000):
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+        if partition_by not in PARTITION_KEYS:
+            raise ValueError(f"partition_by must be one of {PARTITION_KEYS}")
+        self.base_dir = base_dir
+        self.partition_by = partition_by
+        self.flush_rows = flush_rows
+        self.rows_written = 0
+        self.skipped = 0
+        self._pending = []
+        self._known = self._existing_document_ids()
+        self._lock = threading.Lock()
+
+    def _existing_document_ids(self):
+        # Every exported document has exactly one products row
+        path = os.path.join(self.base_dir, "products")
+        if not os.path.isdir(path):
+            return set()
+        table = ds.dataset(path, format="parquet", partitioning="hive").to_table(columns=["document_id"])
+        return set(table.column("document_id").to_pylist())
+
+    def add(self, result, document_id, source=None):
+        with self._lock:
+            if document_id in self._known:
+                self.skipped += 1
+                return
+            self._known.add(document_id)
+            self._pending.append((result, document_id, source))
+            if len(self._pending) >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        buffers = {name: [] for name in SCHEMAS}
+        results = normalize_many([result for result, _, _ in self._pending])
+        for result, (_, document_id, source) in zip(results, self._pending):
+            for name, rows in flatten_result(result, document_id, source).items():
+                buffers[name].extend(rows)
+        self._pending = []
+        # Time first, so file names sort in the order the batches were written
+        batch_id = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+        for name, rows in buffers.items():
+            if not rows:
+                continue
+            table = pa.Table.from_pylist(rows, schema=arrow_schema(name))
+            ds.write_dataset(
+                table,
+                os.path.join(self.base_dir, name),
+                format="parquet",
+                partitioning=[self.partition_by],
+                partitioning_flavor="hive",
+                basename_template=f"part-{batch_id}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            self.rows_written += len(rows)
+
+
+def open_table(base_dir, table_name):
+    """Open one exported table as a pyarrow dataset for columnar scans
+
+    Example: products on Nestlé struck under 60% of the initial level::
+
+        underlyings = open_table(base, "underlyings").to_table(
+            filter=(ds.field("name").isin(["Nestle SA"])) & (ds.field("strike_level") < 60))
+    """
+    if ds is None:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+    return ds.dataset(os.path.join(base_dir, table_name), format="parquet", partitioning="hive")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from manifest import result_documents
+
+    parser = argparse.ArgumentParser(description="Export extracted JSON results to Parquet tables")
+    parser.add_argument("input_dir", help="Directory of extracted JSON files")
+    parser.add_argument("output_dir", help="Directory for the Parquet dataset")
+    parser.add_argument("--partition-by", choices=PARTITION_KEYS, default="currency")
+    args = parser.parse_args()
+
+    exporter = ParquetExporter(args.output_dir, partition_by=args.partition_by)
+    count = 0
+    # Same document IDs (PDF content hashes) as batch runs use
+    for json_path, document_id, source in result_documents(args.input_dir):
+        with open(json_path, 'r') as f:
+            exporter.add(json.load(f), document_id, source=source or json_path)
+        count += 1
+    exporter.flush()
+    print(f"Exported {count - exporter.skipped} results ({exporter.rows_written} rows) to {args.output_dir}, "
+          f"{exporter.skipped} already there")
@@ -1,47 +1,250 @@
-from llama_extract import LlamaExtract
-from pydantic import BaseModel, Field
+import io
 import os
 import json
+import tempfile
+import threading
+import time
+from cache import get_cache, hash_bytes, hash_file
+from uploads import get_spool
+from prefilter import reduce_pdf
+from completeness import repair_result
+from engines import EnginePolicy, LlamaExtractEngine
+from metrics import get_metrics, timed
+
+# The SDK is only needed for remote extraction; the local engine works without it
+try:
+    from llama_extract import LlamaExtract
+except ImportError:
+    LlamaExtract = None
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialize client
-api_key = os.getenv("LLAMA_CLOUD_API_KEY")
-try:
-    extractor = LlamaExtract(api_key=api_key)
-except Exception as e:
-    print(f"Error initializing LlamaExtract: {e}")
-    extractor = LlamaExtract()
+AGENT_NAME = "sp termsheet"
+AGENT_TTL = float(os.getenv("TERMSHEET_AGENT_TTL", 3600))
+PREFILTER = os.getenv("TERMSHEET_PREFILTER", "").lower() in ("1", "true", "yes")
+ENGINE = os.getenv("TERMSHEET_ENGINE", "remote")
+REPAIR = os.getenv("TERMSHEET_REPAIR", "").lower() in ("1", "true", "yes")
+
+class AgentRegistry:
+    """Process-wide, thread-safe holder for the LlamaExtract client and agent handles
+
+    The client is created on first use and agents are looked up once, then
+    reused until they are older than ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=AGENT_TTL):
+        self.ttl = ttl
+        self._client = None
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def client(self):
+        if LlamaExtract is None:
+            raise ImportError("Remote extraction requires llama-extract: pip install llama-extract")
+        with self._lock:
+            if self._client is None:
+                # Initialize client
+                api_key = os.getenv("LLAMA_CLOUD_API_KEY")
+                try:
+                    self._client = LlamaExtract(api_key=api_key)
+                except Exception as e:
+                    print(f"Error initializing LlamaExtract: {e}")
+                    self._client = LlamaExtract()
+            return self._client
+
+    def get_agent(self, name=None, agent_id=None):
+        """Return a cached agent handle, looking it up again once the TTL has passed"""
+        key = ("id", agent_id) if agent_id else ("name", name or AGENT_NAME)
+        client = self.client()
+        with self._lock:
+            cached = self._agents.get(key)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                return cached[0]
+            if agent_id:
+                agent = client.get_agent(id=agent_id)
+            else:
+                agent = client.get_agent(name=key[1])
+            self._agents[key] = (agent, time.monotonic())
+            return agent
+
+    def invalidate(self):
+        """Forget cached agents so the next lookup goes back to the API"""
+        with self._lock:
+            self._agents.clear()
+
+registry = AgentRegistry()
+
+def get_extractor():
+    return registry.client()
+
+def get_agent(name=None, agent_id=None):
+    return registry.get_agent(name=name, agent_id=agent_id)
+
+class LazyAgent:
+    """Agent handle that is only looked up when one of its methods is first used
+
+    Runs that may never reach the API (local-first, or remote-first during an
+    outage) can start without it, and a failed lookup surfaces as a failed
+    call the engine policy can fall back from.
+    """
+
+    def __init__(self, name=None, agent_id=None):
+        self._name = name
+        self._agent_id = agent_id
+
+    def __getattr__(self, attr):
+        return getattr(get_agent(name=self._name, agent_id=self._agent_id), attr)
+
+def cache_agent_key(prefilter, repair=False):
+    """Cache namespace for results, shared by every entry point
+    
+    Results of reduced or section-repaired documents may differ, so they are
+    cached separately.
+    """
+    key = f"{AGENT_NAME}:prefilter" if prefilter else AGENT_NAME
+    return f"{key}:repaired" if repair else key
+
+def engine_policy(engine=None, agent=None):
+    """Build the engine policy for a mode (remote, local, local-first, remote-first)"""
+    return EnginePolicy(engine or ENGINE, LlamaExtractEngine(lambda: agent or get_agent(name=AGENT_NAME)))
+
+def remote_extract(policy, source, size, label):
+    """One call to the remote agent with a path or file object, counted and timed"""
+    metrics = get_metrics()
+    metrics.inc("remote_calls_total", call="extract")
+    metrics.inc("bytes_uploaded_total", size)
+    with metrics.span("remote_extract", attrs={"file": label}):
+        return policy.remote.extract(source)
+
+@timed("extract")
+def extract_termsheet(file_path, use_cache=True, agent=None, content_hash=None, prefilter=None, engine=None,
+                      repair=None):
+    if prefilter is None:
+        prefilter = PREFILTER
+    if repair is None:
+        repair = REPAIR
+    policy = engine_policy(engine, agent)
+    metrics = get_metrics()
+    
+    # Serve repeated uploads of the same PDF from the local cache
+    cache = get_cache()
+    if content_hash is None:
+        content_hash = hash_file(file_path)
+    if use_cache:
+        cached = cache.get(content_hash, cache_agent_key(prefilter, repair))
+        metrics.inc("cache_lookups_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+    # Vanilla products may be handled by the local engine without a remote call
+    result = policy.try_local(file_path)
+    if result is not None:
+        metrics.inc("local_extractions_total")
+        return result
+    if policy.mode == "local":
+        raise RuntimeError(f"Local extraction failed for {file_path}")
+
+    # Optionally upload a reduced copy with only the relevant pages
+    reduction = None
+    if prefilter:
+        fd, reduced_path = tempfile.mkstemp(suffix='.pdf', prefix='termsheet-reduced-')
+        os.close(fd)
+        reduction = reduce_pdf(file_path, reduced_path)
+        if reduction is None:
+            # reduce_pdf removes a partly written copy itself
+            if os.path.exists(reduced_path):
+                os.unlink(reduced_path)
+        else:
+            print(f"Pre-filter kept pages {reduction.ranges} of {reduction.page_count} "
+                  f"({reduction.bytes_after} of {reduction.bytes_before} bytes)")
 
-def extract_termsheet(file_path):
     # Use existing agent "sp termsheet"
     try:
-        agent = extractor.get_agent(name="sp termsheet")
-        
         # Extract data from document
-        result = agent.extract(file_path)
-        return result.data
+        upload_path = reduction.output if reduction else file_path
+        started = time.perf_counter()
+        data = remote_extract(policy, upload_path, os.path.getsize(upload_path) if metrics.enabled else 0,
+                              file_path)
+        # Re-extract only the sections that came back incomplete, from their own pages
+        if repair:
+            data, report = repair_result(data, file_path, policy.remote.extract,
+                                         baseline_seconds=time.perf_counter() - started)
+            if report.sections:
+                print(f"Re-extracted {', '.join(report.sections)} from pages {report.ranges}; "
+                      f"improved {', '.join(report.improved) or 'none'}")
+        cache.put(content_hash, cache_agent_key(prefilter, repair), data)
+        return data
     except Exception as e:
         print(f"Extraction error: {e}")
+        fallback = policy.fallback(file_path)
+        if fallback is not None:
+            print("Used the local engine instead")
+            return fallback
         raise e
+    finally:
+        if reduction is not None:
+            os.unlink(reduction.output)
+
+def extract_termsheet_bytes(data, use_cache=True, agent=None, content_hash=None, prefilter=None, engine=None,
+                            repair=None):
+    """Extract an in-memory PDF, only touching disk when a path is needed
+
+    The remote agent reads file objects, so in the plain remote mode the
+    bytes are uploaded straight from memory. The local engine, page
+    reduction and section repair parse the PDF from a path, so only they
+    spool it to a temporary file.
+    """
+    if prefilter is None:
+        prefilter = PREFILTER
+    if repair is None:
+        repair = REPAIR
+    if content_hash is None:
+        content_hash = hash_bytes(data)
+    if use_cache:
+        cached = get_cache().get(content_hash, cache_agent_key(prefilter, repair))
+        get_metrics().inc("cache_lookups_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+    policy = engine_policy(engine, agent)
+    if policy.mode == "remote" and not prefilter and not repair:
+        upload = io.BytesIO(data)
+        upload.name = f"{content_hash}.pdf"
+        result = remote_extract(policy, upload, len(data), upload.name)
+        get_cache().put(content_hash, cache_agent_key(prefilter, repair), result)
+        return result
+
+    with get_spool().spooled(content_hash, data) as file_path:
+        return extract_termsheet(file_path, use_cache=False, agent=agent, content_hash=content_hash,
+                                 prefilter=prefilter, engine=engine, repair=repair)
 
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1:
-        file_path = sys.argv[1]
+    engine = None
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--engine="):
+            engine = arg.split("=", 1)[1]
+        elif arg not in ("--no-cache", "--prefilter", "--repair"):
+            args.append(arg)
+    
+    if args:
+        file_path = args[0]
         try:
-            result = extract_termsheet(file_path)
+            result = extract_termsheet(file_path, use_cache="--no-cache" not in sys.argv,
+                                       prefilter=True if "--prefilter" in sys.argv else None, engine=engine,
+                                       repair=True if "--repair" in sys.argv else None)
             print(json.dumps(result, indent=2))
         except Exception as e:
             print(f"Error: {e}")
     else:
         try:
-            agents = extractor.list_agents()
+            agents = get_extractor().list_agents()
             print("Available agents:", agents)
         except Exception as e:
             print(f"Error listing agents: {e}")
         print("Please provide a file path as a command line argument.")
-        print("Example: python extract.py termsheet.pdf") 
\ No newline at end of file
+        print("Example: python extract.py termsheet.pdf [--no-cache] [--prefilter] [--repair] [--engine=local-first]") 
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""Offline stand-in for a LlamaExtract agent, used to measure the batch pipeline"""
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+
+
+class FakeThrottleError(Exception):
+    """Raised by queue_extraction when too many jobs are pending, like a 429"""
+
+
+class FakeJob:
+    def __init__(self, job_id, file_path, status='pending'):
+        self.id = job_id
+        self.file_path = file_path
+        self.status = status
+
+
+class FakeRun:
+    def __init__(self, data):
+        self.data = data
+
+
+def sample_result(file_path, rows=0):
+    """Build a result in the same shape as the 'sp termsheet' schema
+
+    ``rows`` adds that many coupon payments and early redemption observations,
+    so benchmarks can measure how result size affects writing and rendering.
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    payments = [{"paymentNumber": i + 1, "paymentDate": f"{2024 + i // 12}-{i % 12 + 1:02d}-15",
+                 "couponRate": "0.67%"} for i in range(rows)]
+    events = [{"observationNumber": i + 1, "observationDate": f"{2024 + i // 12}-{i % 12 + 1:02d}-15",
+               "redemptionDate": f"{2024 + i // 12}-{i % 12 + 1:02d}-22", "autocallLevel": "100%",
+               "earlyRedemptionAmount": "CHF 1,000"} for i in range(rows)]
+    return {
+        "productGeneral": {"productName": name, "productType": "Autocallable", "currency": "CHF",
+                           "ISIN": "CH0000000000", "valor": "0000000"},
+        "dates": {"initialFixingDate": "2024-01-15", "issueDate": "2024-01-22",
+                  "finalFixingDate": "2025-01-15", "redemptionDate": "2025-01-22"},
+        "underlyings": [{"name": "Nestle SA", "bloombergTicker": "NESN SE", "referenceCurrency": "CHF",
+                         "initialFixingLevel": "100.00", "strikeLevel": "60%"}],
+        "coupon": {"couponRate": "8.00% p.a.", "couponPaymentDates": payments},
+        "earlyRedemption": {"automaticEarlyRedemptionEvent": "All underlyings at or above 100%",
+                            "redemptionEvents": events},
+    }
+
+
+class FakeAgent:
+    """Mimics queue_extraction / get_extraction_job / get_extraction_run_for_job / extract
+
+    Each job completes ``latency`` seconds after it was queued. ``call_latency`` is
+    a blocking delay added to every SDK call, like a real network round-trip.
+    A job fails with probability ``failure_rate``, and queueing more than
+    ``max_pending`` unfinished jobs raises FakeThrottleError. ``result_size``
+    sets the number of schedule rows in each sample result. Call counters and
+    per-job latencies let callers measure how much polling and retrying a
+    scheduler does and how long documents take end to end.
+    """
+
+    def __init__(self, latency=0.5, call_latency=0.0, result_factory=None, failure_rate=0.0,
+                 max_pending=None, seed=None, result_size=0):
+        self.latency = latency
+        self.call_latency = call_latency
+        self.result_factory = result_factory or (lambda file_path: sample_result(file_path, result_size))
+        self.failure_rate = failure_rate
+        self.max_pending = max_pending
+        self.random = random.Random(seed)
+        self.throttled = 0
+        self.queue_calls = 0
+        self.poll_calls = 0
+        self.fetch_calls = 0
+        self.extract_calls = 0
+        self.latencies = []
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        if self.call_latency:
+            time.sleep(self.call_latency)
+
+    async def queue_extraction(self, files):
+        if isinstance(files, (str, os.PathLike)):
+            files = [files]
+        self.queue_calls += 1
+        await asyncio.sleep(self.call_latency)
+        jobs = []
+        with self._lock:
+            if self.max_pending is not None:
+                pending = sum(1 for job, _ in self._jobs.values() if job.status == 'pending')
+                if pending + len(files) > self.max_pending:
+                    self.throttled += 1
+                    raise FakeThrottleError(f"Too many pending jobs ({pending})")
+            for file_path in files:
+                job = FakeJob(f"fake-{next(self._ids)}", str(file_path))
+                self._jobs[job.id] = (job, time.monotonic())
+                jobs.append(job)
+        return jobs
+
+    def get_extraction_job(self, job_id):
+        with self._lock:
+            self.poll_calls += 1
+            job, queued_at = self._jobs[job_id]
+        self._round_trip()
+        if job.status == 'pending' and time.monotonic() - queued_at >= self.latency:
+            job.status = 'failed' if self.random.random() < self.failure_rate else 'completed'
+        return job
+
+    def get_extraction_run_for_job(self, job_id):
+        with self._lock:
+            self.fetch_calls += 1
+            job, queued_at = self._jobs[job_id]
+        self._round_trip()
+        run = FakeRun(self.result_factory(job.file_path))
+        with self._lock:
+            self.latencies.append(time.monotonic() - queued_at)
+        return run
+
+    def extract(self, file_path):
+        with self._lock:
+            self.extract_calls += 1
+        time.sleep(self.latency)
+        with self._lock:
+            failed = self.random.random() < self.failure_rate
+        if failed:
+            raise RuntimeError(f"Fake extraction failed for {file_path}")
+        # Like the SDK, accept a path or a named file object
+        return FakeRun(self.result_factory(str(getattr(file_path, 'name', file_path))))
+
+    def stats(self):
+        return {"queue_calls": self.queue_calls, "poll_calls": self.poll_calls,
+                "fetch_calls": self.fetch_calls, "extract_calls": self.extract_calls,
+                "throttled": self.throttled}
+
+
+if __name__ == "__main__":
+    import argparse
+    from batch_process import batch_process_termsheets
+
+    parser = argparse.ArgumentParser(description="Run the batch pipeline against a fake agent")
+    parser.add_argument("directory", help="Directory containing PDF termsheets")
+    parser.add_argument("--output", help="Output directory for extracted data")
+    parser.add_argument("--latency", type=float, default=2.0, help="Seconds until each fake job completes")
+    parser.add_argument("--call-latency", type=float, default=0.05, help="Blocking delay per SDK call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a fake job fails")
+    parser.add_argument("--result-size", type=int, default=0, help="Schedule rows in each fake result")
+    parser.add_argument("--max-pending", type=int, help="Throttle queue requests above this many pending jobs")
+    parser.add_argument("--max-in-flight", type=int, default=50, help="Maximum extraction jobs queued at once")
+    parser.add_argument("--chunk-size", type=int, default=10, help="Number of files submitted per queue request")
+    parser.add_argument("--resume", action="store_true", help="Continue from the manifest in the output directory")
+    parser.add_argument("--parquet", help="Also append results to a Parquet dataset in this directory")
+    parser.add_argument("--workers", type=int, help="Processes for hashing and parsing PDFs")
+    args = parser.parse_args()
+
+    agent = FakeAgent(latency=args.latency, call_latency=args.call_latency,
+                      failure_rate=args.failure_rate, max_pending=args.max_pending,
+                      result_size=args.result_size)
+    started = time.monotonic()
+    asyncio.run(batch_process_termsheets(args.directory, args.output, use_cache=False, agent=agent,
+                                         max_in_flight=args.max_in_flight, chunk_size=args.chunk_size,
+                                         resume=args.resume, parquet_dir=args.parquet, workers=args.workers))
+    elapsed = time.monotonic() - started
+    print(f"Elapsed: {elapsed:.2f}s", agent.stats())
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+
+from schema import normalize, normalize_many
+
+INDEX_NAME = "index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    source TEXT,
+    output_path TEXT,
+    isin TEXT,
+    valor TEXT,
+    issuer_name TEXT,
+    product_name TEXT,
+    currency TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS underlyings (
+    document_id TEXT NOT NULL,
+    ticker TEXT,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    document_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    event_date TEXT NOT NULL,
+    number INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_documents_isin ON documents (isin);
+CREATE INDEX IF NOT EXISTS idx_documents_valor ON documents (valor);
+CREATE INDEX IF NOT EXISTS idx_documents_issuer ON documents (issuer_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_underlyings_ticker ON underlyings (ticker COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_underlyings_document ON underlyings (document_id);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events (event_date, kind);
+CREATE INDEX IF NOT EXISTS idx_events_document ON events (document_id);
+"""
+
+
+def result_events(result):
+    """Yield (kind, iso_date, number) for every dated event in a result"""
+    result = normalize(result)
+    dates = result.dates
+    for kind, value in (("initial_fixing", dates.initialFixingDate), ("issue", dates.issueDate),
+                        ("final_fixing", dates.finalFixingDate), ("redemption", dates.redemptionDate)):
+        if value:
+            yield kind, value.isoformat(), None
+    for event in result.earlyRedemption.redemptionEvents:
+        if event.observationDate:
+            yield "observation", event.observationDate.isoformat(), event.observationNumber
+    for payment in result.coupon.couponPaymentDates:
+        if payment.paymentDate:
+            yield "coupon", payment.paymentDate.isoformat(), payment.paymentNumber
+
+
+class TermsheetIndex:
+    """Embedded SQLite index of extraction outputs
+
+    Supports point lookups by ISIN, valor, issuer and Bloomberg ticker and range
+    queries over event dates, all served from B-tree indexes instead of scanning
+    the output directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add(self, result, document_id, source=None, output_path=None):
+        """Insert or replace one document (raw or normalized) and its underlyings and events"""
+        with self._lock, self._conn:
+            self._insert(normalize(result), document_id, source, output_path)
+
+    def add_many(self, items):
+        """Index ``(result, document_id, source, output_path)`` tuples, validated in bulk, in one transaction"""
+        items = list(items)
+        results = normalize_many([item[0] for item in items])
+        with self._lock, self._conn:
+            for result, (_, document_id, source, output_path) in zip(results, items):
+                self._insert(result, document_id, source, output_path)
+
+    def _insert(self, result, document_id, source, output_path):
+        pg = result.productGeneral
+        self._conn.execute("DELETE FROM underlyings WHERE document_id = ?", (document_id,))
+        self._conn.execute("DELETE FROM events WHERE document_id = ?", (document_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (document_id, source, output_path, pg.ISIN, pg.valor, result.issuerInformation.issuerName,
+             pg.productName, pg.currency, time.time()))
+        self._conn.executemany(
+            "INSERT INTO underlyings VALUES (?, ?, ?)",
+            [(document_id, u.bloombergTicker, u.name) for u in result.underlyings])
+        self._conn.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, ?)",
+            [(document_id, kind, event_date, number) for kind, event_date, number in result_events(result)])
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def by_isin(self, isin):
+        return self._query("SELECT * FROM documents WHERE isin = ?", (isin,))
+
+    def by_valor(self, valor):
+        return self._query("SELECT * FROM documents WHERE valor = ?", (valor,))
+
+    def by_issuer(self, issuer_name):
+        return self._query("SELECT * FROM documents WHERE issuer_name = ? COLLATE NOCASE", (issuer_name,))
+
+    def by_ticker(self, ticker):
+        return self._query(
+            "SELECT d.* FROM underlyings u JOIN documents d USING (document_id) "
+            "WHERE u.ticker = ? COLLATE NOCASE", (ticker,))
+
+    def events_between(self, start, end, kind=None):
+        """Return events with start <= date <= end (ISO dates), earliest first"""
+        sql = ("SELECT e.event_date, e.kind, e.number, d.* FROM events e JOIN documents d USING (document_id) "
+               "WHERE e.event_date BETWEEN ? AND ?")
+        params = [str(start), str(end)]
+        if kind:
+            sql += " AND e.kind = ?"
+            params.append(kind)
+        return self._query(sql + " ORDER BY e.event_date", params)
+
+    def close(self):
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from manifest import result_documents
+
+    parser = argparse.ArgumentParser(description="Query or rebuild the termsheet index")
+    parser.add_argument("index", help=f"Path to the index database (usually extracted_data/{INDEX_NAME})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("isin", "valor", "issuer", "ticker"):
+        lookup = sub.add_parser(name, help=f"Look products up by {name}")
+        lookup.add_argument("value")
+    events = sub.add_parser("events", help="List events between two ISO dates")
+    events.add_argument("start")
+    events.add_argument("end")
+    events.add_argument("--kind", help="observation, coupon, final_fixing, redemption, issue, initial_fixing")
+    build = sub.add_parser("build", help="Index every JSON result in a directory")
+    build.add_argument("directory")
+    args = parser.parse_args()
+
+    index = TermsheetIndex(args.index)
+    if args.command == "build":
+        count = 0
+        items = []
+        # Same document IDs (PDF content hashes) as batch runs use
+        for json_path, document_id, source in result_documents(args.directory):
+            with open(json_path, 'r') as f:
+                items.append((json.load(f), document_id, source, json_path))
+            count += 1
+            if len(items) >= 1000:
+                index.add_many(items)
+                items = []
+        index.add_many(items)
+        print(f"Indexed {count} results into {args.index}")
+    else:
+        if args.command == "events":
+            rows = index.events_between(args.start, args.end, args.kind)
+        else:
+            rows = getattr(index, f"by_{args.command}")(args.value)
+        for row in rows:
+            print(json.dumps(row, default=str))
+    index.close()
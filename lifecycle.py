@@ -0,0 +1,304 @@
+"""Lifecycle calendar and payoff checks over a whole book of extracted termsheets
+
+    python lifecycle.py extracted_data/parquet --as-of 2024-06-01 --fixings fixings.csv
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from export import flatten_result, open_table
+from schema import normalize_many
+
+KINDS = ("coupon", "observation", "final_fixing", "redemption")
+COUPON, OBSERVATION, FINAL_FIXING, REDEMPTION = range(len(KINDS))
+
+TABLE_COLUMNS = {
+    "products": ["document_id", "currency", "denomination", "final_fixing_date", "redemption_date"],
+    "underlyings": ["document_id", "position", "bloomberg_ticker", "initial_fixing_level", "strike_level"],
+    "coupon_payments": ["document_id", "payment_number", "coupon_rate", "payment_date"],
+    "redemption_events": ["document_id", "observation_number", "autocall_level", "early_redemption_amount",
+                          "observation_date"],
+}
+
+
+def _days(values):
+    """Dates (or None) as datetime64[D], with NaT for missing ones"""
+    values = pd.Series(values)
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(values, errors="coerce")
+    return values.to_numpy().astype("datetime64[D]")
+
+
+def _floats(values):
+    values = pd.Series(values)
+    if values.dtype.kind not in "fiu":
+        values = pd.to_numeric(values, errors="coerce")
+    return values.to_numpy(dtype=float)
+
+
+def _take(values, index, missing):
+    """``values[index]`` with ``missing`` wherever the index is -1"""
+    found = index >= 0
+    taken = np.full(len(index), missing, dtype=values.dtype)
+    taken[found] = values[index[found]]
+    return taken
+
+
+def _segment_starts(keys):
+    """Indices where a sorted key array changes value"""
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+class Book:
+    """A book of products held as flat NumPy arrays
+
+    Takes the four tables ``export.flatten_result`` produces, as DataFrames.
+    Events (coupon payments, autocall observations, final fixing and
+    redemption) and underlyings are stored sorted by product, so per-product
+    answers come from segment reductions instead of Python loops.
+    """
+
+    def __init__(self, products, underlyings, coupon_payments, redemption_events):
+        self.ids = products["document_id"].to_numpy(dtype=object)
+        self.currency = products["currency"].to_numpy(dtype=object)
+        self.denomination = _floats(products["denomination"])
+        positions = pd.Index(self.ids)
+
+        # All dated events as parallel arrays: product, date, kind, number, level, amount
+        final = _days(products["final_fixing_date"])
+        redemption = _days(products["redemption_date"])
+        product = np.arange(len(self.ids))
+        parts = [
+            (positions.get_indexer(coupon_payments["document_id"]), _days(coupon_payments["payment_date"]),
+             COUPON, _floats(coupon_payments["payment_number"]), np.nan, _floats(coupon_payments["coupon_rate"])),
+            (positions.get_indexer(redemption_events["document_id"]), _days(redemption_events["observation_date"]),
+             OBSERVATION, _floats(redemption_events["observation_number"]),
+             _floats(redemption_events["autocall_level"]), _floats(redemption_events["early_redemption_amount"])),
+            (product, final, FINAL_FIXING, np.nan, np.nan, np.nan),
+            (product, redemption, REDEMPTION, np.nan, np.nan, np.nan),
+        ]
+        columns = [[], [], [], [], [], []]
+        for owner, dates, kind, number, level, amount in parts:
+            size = len(owner)
+            for column, value, dtype in zip(columns, (owner, dates, kind, number, level, amount),
+                                            (np.intp, "datetime64[D]", np.int8, float, float, float)):
+                column.append(np.broadcast_to(np.asarray(value, dtype=dtype), size))
+        owner, dates, kind, number, level, amount = (np.concatenate(column) for column in columns)
+        keep = (owner >= 0) & ~np.isnat(dates)
+        order = np.lexsort((dates[keep], owner[keep]))
+        self.event_product = owner[keep][order]
+        self.event_date = dates[keep][order]
+        self.event_kind = kind[keep][order]
+        self.event_number = number[keep][order]
+        self.event_level = level[keep][order]
+        self.event_amount = amount[keep][order]
+
+        owner = positions.get_indexer(underlyings["document_id"])
+        keep = owner >= 0
+        order = np.lexsort((_floats(underlyings["position"])[keep], owner[keep]))
+        self.underlying_product = owner[keep][order]
+        self.underlying_ticker = (underlyings["bloomberg_ticker"].fillna("").astype(str).str.upper()
+                                  .to_numpy(dtype=object)[keep][order])
+        self.underlying_initial = _floats(underlyings["initial_fixing_level"])[keep][order]
+        self.underlying_strike = _floats(underlyings["strike_level"])[keep][order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_results(cls, results, document_ids=None):
+        """Build a book from raw or normalized results, validated in bulk"""
+        results = normalize_many(results)
+        if document_ids is None:
+            document_ids = [str(i) for i in range(len(results))]
+        tables = {name: [] for name in TABLE_COLUMNS}
+        for result, document_id in zip(results, document_ids):
+            for name, rows in flatten_result(result, document_id).items():
+                tables[name].extend(rows)
+        return cls(*(pd.DataFrame(tables[name], columns=columns) for name, columns in TABLE_COLUMNS.items()))
+
+    @classmethod
+    def from_parquet(cls, base_dir):
+        """Build a book straight from an ``export.py`` Parquet dataset
+
+        A document exported more than once keeps only the rows of its latest
+        export, so products stay unique by document_id.
+        """
+        tables = {}
+        for name, columns in TABLE_COLUMNS.items():
+            # Tables without any rows are never written by the exporter
+            if os.path.isdir(os.path.join(base_dir, name)):
+                table = open_table(base_dir, name).to_table(columns=columns + ["__filename"]).to_pandas()
+            else:
+                table = pd.DataFrame(columns=columns + ["__filename"])
+            # Rows written by one flush share the batch ID in their file names, which sort by time
+            table["batch"] = table.pop("__filename").astype(str).str.extract(r"part-(.+)-\d+\.parquet$")[0]
+            tables[name] = table
+        latest = (tables["products"].sort_values("batch", kind="stable")
+                  .drop_duplicates("document_id", keep="last")[["document_id", "batch"]])
+        return cls(*(table.merge(latest, on=["document_id", "batch"])[TABLE_COLUMNS[name]]
+                     for name, table in tables.items()))
+
+    def _next(self, as_of, kinds=None):
+        """Index of each product's first event on or after ``as_of`` (-1 if none)"""
+        mask = self.event_date >= np.datetime64(as_of, "D")
+        if kinds is not None:
+            mask &= np.isin(self.event_kind, [KINDS.index(kind) for kind in kinds])
+        selected = np.flatnonzero(mask)
+        # Events are sorted by product then date, so the first selected one per product is the next
+        first = selected[_segment_starts(self.event_product[selected])]
+        nearest = np.full(len(self.ids), -1, dtype=np.intp)
+        nearest[self.event_product[first]] = first
+        return nearest
+
+    def _events_frame(self, index, **extra):
+        return pd.DataFrame(dict({
+            "document_id": self.ids[self.event_product[index]],
+            "kind": np.asarray(KINDS, dtype=object)[self.event_kind[index]],
+            "date": self.event_date[index],
+            "number": self.event_number[index],
+        }, **extra))
+
+    def next_events(self, as_of, kinds=None):
+        """Each product's next event on or after ``as_of``, optionally only of the given kinds"""
+        nearest = self._next(as_of, kinds)
+        return self._events_frame(nearest[nearest >= 0])
+
+    def calendar(self, start, end, kinds=None):
+        """Every event with start <= date <= end across the book, earliest first"""
+        mask = (self.event_date >= np.datetime64(start, "D")) & (self.event_date <= np.datetime64(end, "D"))
+        if kinds is not None:
+            mask &= np.isin(self.event_kind, [KINDS.index(kind) for kind in kinds])
+        index = np.flatnonzero(mask)
+        index = index[np.argsort(self.event_date[index], kind="stable")]
+        return self._events_frame(index, level=self.event_level[index], amount=self.event_amount[index])
+
+    def worst_of(self, fixings):
+        """Worst performance per product for ``fixings`` (ticker -> level), in percent of initial
+
+        Returns (performance, worst ticker, below strike, worst level in
+        percent of strike). Products with no underlyings or a missing fixing
+        get NaN, since their worst-of is unknown. A product is below strike
+        when any underlying trades below its strike level; the schema has no
+        separate barrier level, so knock-in barriers are not checked.
+        """
+        fixings = pd.Series(fixings, dtype=float)
+        fixings.index = fixings.index.astype(str).str.upper()
+        found = fixings.index.get_indexer(self.underlying_ticker)
+        # The trailing NaN is picked for tickers without a fixing (-1), even when there are no fixings
+        levels = np.append(fixings.to_numpy(), np.nan)[found]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            performance = 100 * levels / self.underlying_initial
+            of_strike = 100 * performance / self.underlying_strike
+
+        size = len(self.ids)
+        worst = np.full(size, np.nan)
+        worst_ticker = np.full(size, None, dtype=object)
+        below_strike = np.zeros(size, dtype=bool)
+        worst_of_strike = np.full(size, np.nan)
+        starts = _segment_starts(self.underlying_product)
+        if len(starts):
+            owners = self.underlying_product[starts]
+            # minimum.reduceat propagates NaN, so a missing fixing makes the product unknown
+            worst[owners] = np.minimum.reduceat(performance, starts)
+            below_strike[owners] = np.logical_or.reduceat(performance < self.underlying_strike, starts)
+            worst_of_strike[owners] = np.minimum.reduceat(of_strike, starts)
+            # Sorting by performance within each product puts its worst underlying first
+            order = np.lexsort((performance, self.underlying_product))
+            worst_ticker[owners] = self.underlying_ticker[order][starts]
+            worst_ticker[np.isnan(worst)] = None
+        return worst, worst_ticker, below_strike, worst_of_strike
+
+    def evaluate(self, as_of, fixings):
+        """One row per product with its next events, autocall check and expected redemption
+
+        The next autocall observation triggers when the worst performance is at
+        or above its autocall level. Otherwise the product is expected to
+        redeem at the denomination or, when an underlying is below its strike,
+        at the denomination times the worst level relative to its strike (the
+        cash value of delivering denomination / strike shares).
+        """
+        worst, worst_ticker, below_strike, worst_of_strike = self.worst_of(fixings)
+        next_event = self._next(as_of)
+        observation = self._next(as_of, ("observation",))
+        coupon = self._next(as_of, ("coupon",))
+
+        autocall_level = _take(self.event_level, observation, np.nan)
+        triggered = (observation >= 0) & (worst >= autocall_level)
+        maturity = np.where(below_strike, self.denomination * np.fmin(worst_of_strike, 100) / 100,
+                            self.denomination)
+        amount = np.where(triggered, _take(self.event_amount, observation, np.nan), maturity)
+        amount = np.where(triggered & np.isnan(amount), self.denomination, amount)
+
+        return pd.DataFrame({
+            "document_id": self.ids,
+            "currency": self.currency,
+            "next_event": _take(self.event_date, next_event, np.datetime64("NaT")),
+            # -1 (no next event) picks the trailing None
+            "next_event_kind": np.asarray(KINDS + (None,), dtype=object)[_take(self.event_kind, next_event, -1)],
+            "next_observation": _take(self.event_date, observation, np.datetime64("NaT")),
+            "autocall_level": autocall_level,
+            "worst_performance": worst,
+            "worst_underlying": worst_ticker,
+            "autocall_triggered": triggered,
+            "below_strike": below_strike,
+            "next_coupon": _take(self.event_date, coupon, np.datetime64("NaT")),
+            "next_coupon_rate": _take(self.event_amount, coupon, np.nan),
+            "expected_redemption": amount,
+        })
+
+
+def load_book(path):
+    """Load a book from a Parquet dataset or a directory of extracted JSON results
+
+    JSON results get the same document IDs as the Parquet export and the index.
+    """
+    if os.path.isdir(os.path.join(path, "products")):
+        return Book.from_parquet(path)
+    import json
+    from manifest import result_documents
+
+    results = []
+    document_ids = []
+    for json_path, document_id, _ in result_documents(path):
+        with open(json_path, 'r') as f:
+            results.append(json.load(f))
+        document_ids.append(document_id)
+    return Book.from_results(results, document_ids)
+
+
+def load_fixings(path):
+    """Read ``ticker,level`` rows from a CSV file"""
+    frame = pd.read_csv(path, header=None, names=["ticker", "level"], comment="#")
+    frame = frame[pd.to_numeric(frame["level"], errors="coerce").notna()]
+    return dict(zip(frame["ticker"], frame["level"].astype(float)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import datetime
+    import time
+
+    parser = argparse.ArgumentParser(description="Event calendar and autocall checks for a book of termsheets")
+    parser.add_argument("path", help="Parquet dataset from export.py, or a directory of JSON results")
+    parser.add_argument("--as-of", default=datetime.date.today().isoformat(), help="Valuation date (ISO)")
+    parser.add_argument("--fixings", help="CSV of ticker,level rows for the worst-of and autocall checks")
+    parser.add_argument("--until", help="List every event from --as-of up to this ISO date instead")
+    parser.add_argument("--output", help="Write the table to this CSV file instead of printing it")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    book = load_book(args.path)
+    loaded = time.perf_counter()
+    if args.until:
+        table = book.calendar(args.as_of, args.until)
+    else:
+        table = book.evaluate(args.as_of, load_fixings(args.fixings) if args.fixings else {})
+    print(f"{len(book)} products loaded in {loaded - started:.2f}s, evaluated in {time.perf_counter() - loaded:.3f}s")
+    if args.output:
+        table.to_csv(args.output, index=False)
+    else:
+        print(table.to_string(index=False, max_rows=50))
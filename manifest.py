@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+from cache import hash_file
+from streaming import STREAMED
+
+MANIFEST_NAME = "manifest.jsonl"
+
+QUEUED = "queued"
+COMPLETED = "completed"
+FAILED = "failed"
+DUPLICATE = "duplicate"
+
+
+class JobManifest:
+    """Append-only JSON Lines record of every file's job in a batch output directory
+
+    Each line holds path, content hash, job ID, status and output path. Later
+    lines supersede earlier ones for the same path, so the file can be replayed
+    after a crash to find out what is finished and what is still in flight.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+
+    def record(self, path, content_hash, status, job_id=None, output=None, **details):
+        """Append one entry and flush it to disk before returning"""
+        entry = {
+            "path": os.path.abspath(path),
+            "hash": content_hash,
+            "job_id": job_id,
+            "status": status,
+            "output": output,
+            "time": time.time(),
+        }
+        entry.update(details)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """Return the latest entry per absolute path, ignoring a torn last line"""
+        return self.read()[0]
+
+    def read(self, offset=0):
+        """Return ``(entries, offset)`` for the lines after byte ``offset``
+
+        Pass the returned offset to the next call to read only the entries
+        appended since. A last line that is still being written is left for
+        that next call.
+        """
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries, offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["path"]] = entry
+        return entries, offset
+
+
+def reconcile(entries, pdf_files, content_hashes):
+    """Split files into (done, in_flight, todo) against the manifest entries
+
+    ``done`` files have a completed entry with the same hash and an output that
+    still exists (or was streamed to stdout), or were skipped as duplicates. ``in_flight`` maps pending job
+    IDs to their files, and everything else is new, changed or failed and must
+    be submitted again.
+    """
+    done, in_flight, todo = [], [], []
+    for pdf_file in pdf_files:
+        entry = entries.get(os.path.abspath(pdf_file))
+        if entry is None or entry["hash"] != content_hashes[pdf_file]:
+            todo.append(pdf_file)
+        elif entry["status"] == COMPLETED and (entry.get("output") == STREAMED or
+                                               entry.get("output") and os.path.exists(entry["output"])):
+            done.append(pdf_file)
+        elif entry["status"] == DUPLICATE:
+            done.append(pdf_file)
+        elif entry["status"] == QUEUED and entry.get("job_id"):
+            in_flight.append((entry["job_id"], pdf_file))
+        else:
+            todo.append(pdf_file)
+    return done, in_flight, todo
+
+
+def result_documents(output_dir):
+    """Yield ``(json_path, document_id, source_pdf)`` for each JSON result in a batch output directory
+
+    Batch runs identify a document by the content hash of its PDF, which the
+    manifest records next to each output, so rebuilt indexes and exports use
+    the same IDs. Results with no manifest entry fall back to hashing the PDF
+    of the same name one level up (the default ``<dir>/extracted_data``
+    layout), and to the file name with no source when that PDF is gone.
+    """
+    by_output = {}
+    for entry in JobManifest(output_dir).load().values():
+        if entry.get("output") and entry.get("hash"):
+            by_output[os.path.abspath(entry["output"])] = entry
+    for item in os.scandir(output_dir):
+        if not item.name.endswith('.json') or item.name == 'fingerprints.json':
+            continue
+        entry = by_output.get(os.path.abspath(item.path))
+        if entry is not None:
+            yield item.path, entry["hash"], entry["path"]
+            continue
+        stem = os.path.splitext(item.name)[0]
+        pdf_path = os.path.join(os.path.dirname(os.path.abspath(output_dir)), f"{stem}.pdf")
+        if os.path.exists(pdf_path):
+            yield item.path, hash_file(pdf_path), pdf_path
+        else:
+            yield item.path, stem, None
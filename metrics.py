@@ -0,0 +1,261 @@
+import atexit
+import bisect
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, like Prometheus client defaults
+# but extended for remote extractions that take minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Span:
+    """Times a block and records it when the block exits"""
+
+    def __init__(self, registry, name, labels, attrs):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        self.registry.finish_span(self.name, duration, self.labels, error=exc_type is not None, attrs=self.attrs)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    """Counters, histograms and timing spans for the extraction paths
+
+    Disabled registries return immediately from every call, so instrumented
+    code pays one attribute check. When enabled, finished spans are written
+    as JSON lines to ``log_path`` ('-' for stderr) and passed to any hooks
+    added with ``add_hook`` (e.g. to forward them to a tracing backend), and
+    ``write_prometheus`` renders everything in the Prometheus text format.
+    """
+
+    def __init__(self, enabled=False, log_path=None, prometheus_path=None, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+        self._log = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, log_path=None, prometheus_path=None):
+        """Turn collection on and set where logs and the Prometheus file go"""
+        with self._lock:
+            self.enabled = enabled
+            if log_path is not None:
+                self.log_path = log_path
+                self._log = None
+            if prometheus_path is not None:
+                self.prometheus_path = prometheus_path
+
+    def add_hook(self, hook):
+        """Call ``hook(event)`` with the dict of every finished span"""
+        self._hooks.append(hook)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def span(self, name, attrs=None, **labels):
+        """Context manager that records the block's duration as ``<name>_seconds``
+
+        ``labels`` become metric labels and should have few distinct values;
+        per-call details such as file names go in ``attrs``, which only appear
+        in the JSON log.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, labels, attrs)
+
+    def finish_span(self, name, duration, labels, error=False, attrs=None):
+        self.observe(f"{name}_seconds", duration, **labels)
+        if error:
+            self.inc(f"{name}_errors_total", **labels)
+        if self.log_path is None and not self._hooks:
+            return
+        event = {"time": time.time(), "span": name, "duration_ms": round(duration * 1000, 3), "error": error}
+        event.update(labels)
+        if attrs:
+            event.update(attrs)
+        self.log(event)
+        for hook in self._hooks:
+            hook(event)
+
+    def log(self, event):
+        """Write one structured JSON log line"""
+        if not self.enabled or self.log_path is None:
+            return
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock:
+            if self._log is None:
+                self._log = sys.stderr if self.log_path == "-" else open(self.log_path, 'a')
+            self._log.write(line)
+            self._log.flush()
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def render_prometheus(self):
+        """All counters and histograms in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for (name, key), value in counters:
+                if name not in seen:
+                    lines.append(f"# TYPE termsheet_{name} counter")
+                    seen.add(name)
+                lines.append(f"termsheet_{name}{_format_labels(key)} {value}")
+            for (name, key), histogram in histograms:
+                if name not in seen:
+                    lines.append(f"# TYPE termsheet_{name} histogram")
+                    seen.add(name)
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"termsheet_{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"termsheet_{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"termsheet_{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Atomically rewrite the Prometheus text file, e.g. for node_exporter's textfile collector"""
+        path = path or self.prometheus_path
+        if not self.enabled or not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve ``/metrics`` over HTTP from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        return server
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide registry, configured from environment variables"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                log_path = os.getenv("TERMSHEET_METRICS_LOG")
+                prometheus_path = os.getenv("TERMSHEET_METRICS_FILE")
+                port = os.getenv("TERMSHEET_METRICS_PORT")
+                enabled = (os.getenv("TERMSHEET_METRICS", "").lower() in ("1", "true", "yes")
+                           or bool(log_path or prometheus_path or port))
+                registry = MetricsRegistry(enabled, log_path, prometheus_path)
+                if port:
+                    registry.serve(int(port))
+                atexit.register(registry.write_prometheus)
+                _registry = registry
+    return _registry
+
+
+def timed(name, **labels):
+    """Decorator recording every call of a function, sync or async, as a span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_metrics().span(name, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
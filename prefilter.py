@@ -0,0 +1,133 @@
+import os
+import re
+import sys
+
+# pypdf is optional; without it documents are always sent whole
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = None
+    PdfWriter = None
+
+# Phrases that point at fields of the termsheet schema, with their weights
+FIELD_KEYWORDS = {
+    "isin": 3, "valor": 3, "bloomberg": 3, "ticker": 2, "underlying": 3, "initial fixing": 3,
+    "final fixing": 3, "fixing date": 2, "fixing level": 3, "issue date": 2, "redemption date": 2,
+    "redemption amount": 2, "early redemption": 3, "autocall": 3, "observation date": 3,
+    "barrier": 3, "strike": 3, "coupon": 3, "coupon rate": 2, "payment date": 2, "denomination": 2,
+    "issue size": 2, "issue price": 2, "currency": 1, "issuer": 1, "rating": 1, "calculation agent": 1,
+    "worst performance": 2, "settlement": 1, "listing": 1, "business day": 1,
+}
+
+# Phrases typical of legal appendices that never carry schema fields
+BOILERPLATE_KEYWORDS = {
+    "selling restrictions": 3, "taxation": 2, "withholding tax": 2, "united states": 2,
+    "u.s. person": 2, "fatca": 2, "disclaimer": 2, "data protection": 2, "prospectus regulation": 2,
+    "not be offered": 2, "jurisdiction": 1, "governing law": 1, "liability": 1, "hereby": 1,
+}
+
+DATE_PATTERN = re.compile(r"\b\d{1,2}[./-]\d{1,2}[./-]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b|"
+                          r"\b\d{1,2} (?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]* \d{4}\b")
+PERCENT_PATTERN = re.compile(r"\d+(?:[.,]\d+)?\s?%")
+
+
+def score_page(text):
+    """Score how likely a page is to hold schema fields, using only local features
+
+    Keyword hits are combined with layout signals: dates, percentages and
+    lines made up mostly of numbers, which is what schedules and fixing tables
+    look like once flattened to text.
+    """
+    lowered = text.lower()
+    score = sum(weight * lowered.count(word) for word, weight in FIELD_KEYWORDS.items())
+    score -= sum(weight * lowered.count(word) for word, weight in BOILERPLATE_KEYWORDS.items())
+    score += 0.5 * len(DATE_PATTERN.findall(lowered))
+    score += 0.5 * len(PERCENT_PATTERN.findall(lowered))
+    lines = [line for line in lowered.splitlines() if line.strip()]
+    numeric_lines = sum(1 for line in lines if sum(c.isdigit() for c in line) > len(line) / 3)
+    score += numeric_lines
+    return score
+
+
+def page_ranges(pages):
+    """Format 0-based page indexes as a 1-based range string like '1-3,7'"""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(f"{a + 1}-{b + 1}" if a != b else f"{a + 1}" for a, b in ranges)
+
+
+class Reduction:
+    """Audit record of one pre-filtered document"""
+
+    def __init__(self, source, output, kept, page_count, bytes_before, bytes_after):
+        self.source = source
+        self.output = output
+        self.kept = kept
+        self.page_count = page_count
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+
+    @property
+    def ranges(self):
+        return page_ranges(self.kept)
+
+    def to_dict(self):
+        return {"pages": self.ranges, "page_count": self.page_count,
+                "bytes_before": self.bytes_before, "bytes_after": self.bytes_after}
+
+
+def select_pages(scores, threshold=4.0, min_keep_ratio=0.0):
+    """Pick pages scoring at least ``threshold``; the first page is always kept"""
+    kept = [i for i, score in enumerate(scores) if score >= threshold or i == 0]
+    if len(kept) < max(1, min_keep_ratio * len(scores)):
+        return list(range(len(scores)))
+    return kept
+
+
+def write_pages(reader, pages, output_path):
+    """Write the 0-based ``pages`` of an open PdfReader to a new PDF"""
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+
+
+def reduce_pdf(pdf_path, output_path, threshold=4.0, reader=None, texts=None):
+    """Write a copy of ``pdf_path`` holding only relevant pages and return a Reduction
+
+    Returns None when pypdf is missing, the PDF cannot be parsed or rewritten,
+    or no page would be dropped; callers should then upload the original
+    file. A partly written ``output_path`` is removed. A reader
+    and page texts that were already extracted may be passed in to avoid
+    parsing the PDF again.
+    """
+    if PdfReader is None:
+        return None
+    try:
+        if reader is None:
+            reader = PdfReader(pdf_path)
+        if texts is None:
+            texts = [page.extract_text() or "" for page in reader.pages]
+        scores = [score_page(text) for text in texts]
+    except Exception as e:
+        print(f"Could not score pages of {pdf_path}: {e}", file=sys.stderr)
+        return None
+
+    kept = select_pages(scores, threshold)
+    if len(kept) == len(scores):
+        return None
+
+    try:
+        write_pages(reader, kept, output_path)
+    except Exception as e:
+        print(f"Could not write reduced copy of {pdf_path}: {e}", file=sys.stderr)
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        return None
+    return Reduction(pdf_path, output_path, kept, len(scores),
+                     os.path.getsize(pdf_path), os.path.getsize(output_path))
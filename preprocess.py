@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import hash_file
+from dedup import minhash, shingles
+from prefilter import reduce_pdf
+from engines import LocalRuleEngine
+from metrics import get_metrics
+
+# pypdf is optional; without it only hashing runs in the worker processes
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+DEFAULT_WORKERS = int(os.getenv("TERMSHEET_PREPROCESS_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def scan_pdfs(directory):
+    """Yield PDF paths as the directory is read instead of listing it up front"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith('.pdf') and entry.is_file():
+                yield entry.path
+
+
+def hash_pdf(pdf_file):
+    """Return (path, content hash), with a None hash if the file vanished or is unreadable"""
+    try:
+        return pdf_file, hash_file(pdf_file)
+    except OSError as e:
+        # Runs in worker processes, whose stdout may be the NDJSON stream
+        print(f"Could not read {pdf_file}: {e}", file=sys.stderr)
+        return pdf_file, None
+
+
+class Analysis:
+    """Everything the batch needs from one PDF's text layer, computed in a worker process"""
+
+    def __init__(self, pdf_file):
+        self.pdf_file = pdf_file
+        self.page_count = None
+        self.signature = None
+        self.reduction = None
+        self.local_result = None
+        self.local_complete = False
+        self.error = None
+
+
+def analyze_pdf(pdf_file, reduce_to=None, signature=False, local=None):
+    """Parse a PDF once and derive its dedup signature, page reduction and local result
+
+    ``local`` is the engine mode; for "local" and "local-first" the rule-based
+    engine runs on the text, and no reduction is written when its result will
+    be used instead of an upload.
+    """
+    analysis = Analysis(pdf_file)
+    if PdfReader is None:
+        return analysis
+    try:
+        reader = PdfReader(pdf_file)
+        texts = [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        analysis.error = str(e)
+        return analysis
+    analysis.page_count = len(texts)
+    text = "\n".join(texts)
+
+    if signature:
+        hashed = minhash(shingles(text))
+        analysis.signature = hashed.tolist() if hashed is not None else None
+
+    if local in ("local", "local-first"):
+        engine = LocalRuleEngine()
+        try:
+            analysis.local_result = engine.parse(text)
+            analysis.local_complete = engine.is_complete(analysis.local_result)
+        except Exception as e:
+            analysis.error = str(e)
+        if local == "local" or analysis.local_complete:
+            return analysis
+
+    if reduce_to is not None:
+        analysis.reduction = reduce_pdf(pdf_file, reduce_to, reader=reader, texts=texts)
+    return analysis
+
+
+def create_executor(workers=None):
+    """Process pool for the CPU-bound stages
+
+    Workers are spawned rather than forked, because the batch already runs
+    SDK calls in threads by the time the pool starts its processes.
+    """
+    return ProcessPoolExecutor(max_workers=workers or DEFAULT_WORKERS,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+async def process_map(executor, func, items, limit, *args):
+    """Run ``func(item, *args)`` in the pool and yield results in completion order
+
+    Tuple items are unpacked, so ``(path, extra)`` pairs call ``func(path, extra, *args)``.
+    At most ``limit`` calls are pending at a time, and the next item is only
+    taken from ``items`` (a plain or async iterable) when a slot frees up, so
+    a slow consumer holds back the producer instead of filling memory.
+    """
+    loop = asyncio.get_running_loop()
+    metrics = get_metrics()
+    started = {}
+    pending = set()
+    source = items.__aiter__() if hasattr(items, '__aiter__') else None
+    iterator = iter(items) if source is None else None
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < limit:
+            try:
+                item = await source.__anext__() if source is not None else next(iterator)
+            except (StopIteration, StopAsyncIteration):
+                exhausted = True
+                break
+            item = item if isinstance(item, tuple) else (item,)
+            future = loop.run_in_executor(executor, func, *item, *args)
+            started[future] = time.perf_counter()
+            pending.add(future)
+        if not pending:
+            return
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            # Time in the pool, including the wait for a free worker
+            metrics.observe("preprocess_seconds", time.perf_counter() - started.pop(future), stage=func.__name__)
+            yield future.result()
@@ -0,0 +1,342 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+from metrics import get_metrics
+
+# PARTIAL_SUCCESS jobs still have a result, which the completeness checks can repair
+COMPLETED_STATUSES = {'completed', 'success', 'partial_success'}
+FAILED_STATUSES = {'failed', 'error', 'cancelled', 'canceled'}
+PENDING_STATUSES = {'pending', 'queued', 'running', 'in_progress', 'processing'}
+
+# Outcomes of tracking one job. A failed job may be submitted again; a result
+# that was fetched but could not be handled was already paid for and must not be.
+HANDLED = "handled"
+JOB_FAILED = "job_failed"
+HANDLER_FAILED = "handler_failed"
+
+# Consecutive poll or fetch errors before a job is given up
+MAX_POLL_ERRORS = int(os.getenv("TERMSHEET_MAX_POLL_ERRORS", 5))
+# Seconds after which a job that has not finished is given up
+JOB_TIMEOUT = float(os.getenv("TERMSHEET_JOB_TIMEOUT", 3600))
+# Finished job durations kept for estimating the first poll delay
+DURATION_WINDOW = 200
+
+
+def status_name(status):
+    """Normalise an SDK job status (plain string or enum) to a lowercase string"""
+    return str(getattr(status, 'value', status)).lower()
+
+
+def is_unknown_job(error):
+    """True for errors saying a job does not exist, e.g. a stale ID from an old manifest"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 404 or isinstance(error, KeyError) or 'not found' in str(error).lower()
+
+
+def jittered_delay(attempt, base_delay, max_delay):
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def chunked(items, size):
+    """Yield lists of up to ``size`` items without materialising the input"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def achunked(items, size):
+    """Like ``chunked`` but also accepts async iterables, e.g. a pre-processing stage"""
+    if not hasattr(items, '__aiter__'):
+        for chunk in chunked(items, size):
+            yield chunk
+        return
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JobScheduler:
+    """Poll pending extraction jobs concurrently with adaptive exponential backoff
+
+    Only jobs that are still pending are polled. Blocking SDK calls run in worker
+    threads so the event loop stays free, and each result is handed to
+    ``on_complete`` as soon as its job finishes.
+    """
+
+    def __init__(self, agent, max_concurrency=8, initial_delay=1.0, max_delay=30.0, backoff=2.0,
+                 max_poll_errors=MAX_POLL_ERRORS, job_timeout=JOB_TIMEOUT, handler_retries=2):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_poll_errors = max_poll_errors
+        self.job_timeout = job_timeout
+        self.handler_retries = handler_retries
+        self.poll_calls = 0
+        self.completed = 0
+        self.failed = 0
+        self.total = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._durations = deque(maxlen=DURATION_WINDOW)
+        self.metrics = get_metrics()
+
+    def _first_delay(self):
+        # Once some jobs have finished, wait roughly as long as a typical job took
+        # before the first poll instead of hammering the API from the start
+        if not self._durations:
+            return self.initial_delay
+        durations = sorted(self._durations)
+        return min(max(durations[len(durations) // 2], self.initial_delay), self.max_delay)
+
+    async def call(self, func, *args):
+        """Run a blocking SDK call in a worker thread, bounded by max_concurrency"""
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def lookup(self, job_id):
+        """Check once that the API still knows ``job_id``, e.g. one read back from a manifest"""
+        try:
+            await self.call(self.agent.get_extraction_job, job_id)
+            return True
+        except Exception as e:
+            print(f"Could not look up job {job_id}: {e}")
+            return False
+
+    def report_progress(self):
+        print(f"Progress: {self.completed + self.failed}/{self.total} completed")
+
+    async def track(self, job_id, context, on_complete):
+        """Poll one job until it finishes and hand its result to ``on_complete``
+
+        Returns HANDLED, JOB_FAILED when the job failed, ended with an unknown
+        status, is unknown to the API, ran past ``job_timeout`` or could not be
+        polled or fetched ``max_poll_errors`` times in a row, or HANDLER_FAILED
+        when its result was fetched but ``on_complete`` kept raising.
+        """
+        started = time.monotonic()
+        delay = self._first_delay()
+        errors = 0
+        while True:
+            if time.monotonic() - started > self.job_timeout:
+                print(f"Job {job_id} did not finish within {self.job_timeout:.0f}s")
+                return JOB_FAILED
+            await asyncio.sleep(delay)
+            delay = min(delay * self.backoff, self.max_delay)
+            self.poll_calls += 1
+            self.metrics.inc("remote_calls_total", call="poll")
+            try:
+                with self.metrics.span("poll", attrs={"job_id": job_id}):
+                    job = await self.call(self.agent.get_extraction_job, job_id)
+                status = status_name(job.status)
+            except Exception as e:
+                if is_unknown_job(e):
+                    print(f"Job {job_id} is unknown to the API: {e}")
+                    return JOB_FAILED
+                errors += 1
+                print(f"Error polling job {job_id} ({errors}/{self.max_poll_errors}): {e}")
+                if errors >= self.max_poll_errors:
+                    return JOB_FAILED
+                continue
+            errors = 0
+
+            if status in PENDING_STATUSES:
+                continue
+            if status in FAILED_STATUSES:
+                print(f"Job {job_id} failed")
+                return JOB_FAILED
+            if status not in COMPLETED_STATUSES:
+                print(f"Job {job_id} ended with unexpected status {status}")
+                return JOB_FAILED
+
+            self._durations.append(time.monotonic() - started)
+            try:
+                result = await self._fetch(job_id)
+            except Exception as e:
+                print(f"Error retrieving results for job {job_id}: {e}")
+                return JOB_FAILED
+            return await self._handle(job_id, context, result, on_complete)
+
+    async def _fetch(self, job_id):
+        """Fetch a finished job's result, retrying transient errors"""
+        delay = self.initial_delay
+        for attempt in range(self.max_poll_errors):
+            self.metrics.inc("remote_calls_total", call="fetch")
+            try:
+                with self.metrics.span("fetch_result", attrs={"job_id": job_id}):
+                    return await self.call(self.agent.get_extraction_run_for_job, job_id)
+            except Exception as e:
+                if is_unknown_job(e) or attempt + 1 >= self.max_poll_errors:
+                    raise
+                print(f"Error retrieving results for job {job_id}, retrying: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * self.backoff, self.max_delay)
+
+    async def _handle(self, job_id, context, result, on_complete):
+        """Run ``on_complete``, retrying it with the result already fetched"""
+        for attempt in range(self.handler_retries + 1):
+            try:
+                with self.metrics.span("handle_result"):
+                    await asyncio.to_thread(on_complete, job_id, context, result)
+            except Exception as e:
+                print(f"Error handling results for job {job_id}: {e}")
+                if attempt == self.handler_retries:
+                    return HANDLER_FAILED
+                await asyncio.sleep(jittered_delay(attempt, self.initial_delay, self.max_delay))
+                continue
+            self.completed += 1
+            self.report_progress()
+            return HANDLED
+
+    async def _track_once(self, job_id, context, on_complete, on_failure):
+        if await self.track(job_id, context, on_complete) != HANDLED:
+            self.failed += 1
+            if on_failure is not None:
+                await asyncio.to_thread(on_failure, job_id, context)
+            self.report_progress()
+
+    async def run(self, jobs, on_complete, on_failure=None):
+        """Track already-queued ``(job_id, context)`` pairs until every job has finished
+
+        ``on_complete(job_id, context, result)`` and ``on_failure(job_id, context)``
+        are called from a worker thread, so they may do blocking file I/O.
+        """
+        jobs = list(jobs)
+        self.total += len(jobs)
+        await asyncio.gather(*(self._track_once(job_id, context, on_complete, on_failure)
+                               for job_id, context in jobs))
+        return self.completed, self.failed
+
+
+class SubmissionPipeline:
+    """Submit files in windows of ``chunk_size`` while keeping at most ``max_in_flight`` jobs open
+
+    Throttled submissions and failed jobs are retried with jittered exponential
+    backoff, so a large backlog drains at a steady rate instead of failing at once.
+    """
+
+    def __init__(self, agent, scheduler=None, chunk_size=10, max_in_flight=50, max_retries=3,
+                 retry_delay=2.0, max_retry_delay=60.0):
+        self.agent = agent
+        self.scheduler = scheduler or JobScheduler(agent)
+        self.chunk_size = max(1, min(chunk_size, max_in_flight))
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.submitted = 0
+        self.retries = 0
+        self.upload_path = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.metrics = get_metrics()
+
+    async def _submit(self, files):
+        """Queue a list of files, retrying throttled or failed submissions"""
+        if self.upload_path is not None:
+            files = [self.upload_path(f) for f in files]
+        for attempt in range(self.max_retries + 1):
+            self.metrics.inc("remote_calls_total", call="queue")
+            try:
+                with self.metrics.span("queue", attrs={"files": len(files)}):
+                    jobs = await self.agent.queue_extraction(files)
+                self.submitted += len(files)
+                if self.metrics.enabled:
+                    self.metrics.inc("bytes_uploaded_total", sum(os.path.getsize(f) for f in files))
+                return jobs
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Giving up on submitting {len(files)} files: {e}")
+                    return None
+                delay = jittered_delay(attempt, self.retry_delay, self.max_retry_delay)
+                print(f"Submission failed ({e}), retrying in {delay:.1f}s")
+                self.retries += 1
+                self.metrics.inc("retries_total", stage="submit")
+                await asyncio.sleep(delay)
+
+    async def _fail(self, pdf_file, job_id, on_failure):
+        self.scheduler.failed += 1
+        if on_failure is not None:
+            await asyncio.to_thread(on_failure, job_id, pdf_file)
+        self.scheduler.report_progress()
+
+    async def _run_job(self, job_id, pdf_file, on_complete, on_failure, on_queued):
+        # The in-flight slot is held across retries and released once the file is done
+        try:
+            for attempt in range(self.max_retries + 1):
+                outcome = await self.scheduler.track(job_id, pdf_file, on_complete)
+                if outcome == HANDLED:
+                    return
+                # A result that was already fetched is never paid for twice
+                if outcome == HANDLER_FAILED or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(jittered_delay(attempt, self.retry_delay, self.max_retry_delay))
+                self.retries += 1
+                self.metrics.inc("retries_total", stage="job")
+                jobs = await self._submit([pdf_file])
+                if not jobs:
+                    break
+                job_id = jobs[0].id
+                print(f"Retrying {pdf_file} as job {job_id}")
+                if on_queued is not None:
+                    on_queued(job_id, pdf_file)
+            await self._fail(pdf_file, job_id, on_failure)
+        finally:
+            self._slots.release()
+
+    async def run(self, files, on_complete, on_failure=None, total=None, on_queued=None, upload_path=None):
+        """Submit and track every file, returning (completed, failed)
+
+        ``files`` may be any iterable, including a generator or an async
+        generator, so large directories are consumed lazily and submission
+        overlaps with whatever produces the files. ``on_queued(job_id, file)`` is called
+        on the event loop as soon as a job ID is known. ``upload_path(file)``
+        may map a file to the path actually uploaded, e.g. a reduced copy.
+        """
+        self.upload_path = upload_path
+        if total is not None:
+            self.scheduler.total += total
+        tasks = set()
+        async for chunk in achunked(files, self.chunk_size):
+            if total is None:
+                self.scheduler.total += len(chunk)
+            for _ in chunk:
+                await self._slots.acquire()
+
+            jobs = await self._submit(chunk)
+            if not jobs:
+                for pdf_file in chunk:
+                    self._slots.release()
+                    await self._fail(pdf_file, None, on_failure)
+                continue
+
+            print(f"Queued {len(jobs)} extraction jobs")
+            if len(jobs) != len(chunk):
+                # Jobs are matched to files by position, so files past the last job have none
+                print(f"Expected {len(chunk)} jobs for the chunk but the API returned {len(jobs)}")
+                for pdf_file in chunk[len(jobs):]:
+                    self._slots.release()
+                    await self._fail(pdf_file, None, on_failure)
+            for job, pdf_file in zip(jobs, chunk):
+                if on_queued is not None:
+                    on_queued(job.id, pdf_file)
+                task = asyncio.create_task(self._run_job(job.id, pdf_file, on_complete, on_failure, on_queued))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self.scheduler.completed, self.scheduler.failed
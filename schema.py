@@ -0,0 +1,328 @@
+import re
+from datetime import date, datetime
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, TypeAdapter
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y")
+
+NUMBER_PATTERN = re.compile(r"-?\d(?:[\d.,'’]*\d)?")
+MAGNITUDE_PATTERN = re.compile(r"\s*(thousand|k|million|mio|mn|mm|m|billion|bn|mrd|b)\b\.?", re.IGNORECASE)
+MAGNITUDES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "mio": 1e6, "mn": 1e6, "mm": 1e6, "m": 1e6,
+              "billion": 1e9, "bn": 1e9, "mrd": 1e9, "b": 1e9}
+# ISO 4217 codes of currencies termsheets are issued or settled in
+CURRENCY_CODES = {
+    "AED", "ARS", "AUD", "BRL", "CAD", "CHF", "CLP", "CNH", "CNY", "COP", "CZK", "DKK", "EUR", "GBP", "HKD",
+    "HUF", "IDR", "ILS", "INR", "ISK", "JPY", "KRW", "KWD", "MXN", "MYR", "NOK", "NZD", "PEN", "PHP", "PLN",
+    "QAR", "RON", "RUB", "SAR", "SEK", "SGD", "THB", "TRY", "TWD", "USD", "ZAR",
+}
+CURRENCY_PATTERN = re.compile(r"\b[A-Z]{3}\b")
+CURRENCY_NAMES = {
+    "swiss franc": "CHF", "euro": "EUR", "us dollar": "USD", "u.s. dollar": "USD", "pound sterling": "GBP",
+    "british pound": "GBP", "japanese yen": "JPY", "yen": "JPY", "hong kong dollar": "HKD",
+    "singapore dollar": "SGD", "australian dollar": "AUD", "canadian dollar": "CAD", "swedish krona": "SEK",
+    "norwegian krone": "NOK", "danish krone": "DKK", "renminbi": "CNY", "yuan": "CNY",
+}
+CURRENCY_SYMBOLS = {"US$": "USD", "$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "Fr.": "CHF", "SFr.": "CHF"}
+
+
+def _digits(text):
+    """Float value of a number written with thousands separators and a decimal mark, or None if ambiguous
+
+    Apostrophes only ever group thousands (Swiss style). When both a dot and
+    a comma appear, the last one is the decimal mark. A mark used more than
+    once groups thousands, and so does a single comma followed by exactly
+    three digits ('1,000'). A single dot followed by three digits could be
+    either ('1.000'), unless the number has apostrophes or starts with 0.
+    Any other single dot or comma is a decimal mark ('8,25', '1.5', '0,125').
+    Grouped digits must come in threes.
+    """
+    marks = [c for c in text if c in ".,"]
+    if "." in marks and "," in marks:
+        decimal = marks[-1]
+        if marks.count(decimal) > 1:
+            return None
+    elif len(marks) == 1:
+        integer, fraction = re.split(r"[.,]", text)
+        grouped = len(fraction) == 3 and integer.lstrip("-") != "0" and not re.search(r"['’]", integer)
+        if grouped and marks[0] == ".":
+            return None
+        decimal = None if grouped else marks[0]
+    else:
+        decimal = None
+    integer, _, fraction = text.rpartition(decimal) if decimal else (text, None, "")
+    groups = re.split(r"[.,'’]", integer)
+    if len(groups) > 1 and not (1 <= len(groups[0].lstrip("-")) <= 3 and all(len(g) == 3 for g in groups[1:])):
+        return None
+    try:
+        return float("".join(groups) + ("." + fraction if fraction else ""))
+    except ValueError:
+        return None
+
+
+def parse_number(value):
+    """Turn values like '1,000.50', 'EUR 1.000.000,00', 'CHF 5 million' or '8,25% p.a.' into floats
+
+    Returns None when there is no number or its separators are ambiguous.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    number = _digits(match.group(0))
+    magnitude = MAGNITUDE_PATTERN.match(text, match.end())
+    if number is not None and magnitude:
+        number *= MAGNITUDES[magnitude.group(1).lower()]
+    return number
+
+
+def parse_percent(value):
+    """Rates in percent: '8.25% p.a.', '8,25' and 8.25 become 8.25, and '50 bps' becomes 0.5
+
+    Bare numbers are taken as percent as they are, since a quarterly coupon
+    of 1.25% cannot be told apart from a fraction.
+    """
+    number = parse_number(value)
+    if number is not None and isinstance(value, str) and re.search(r"\d\s*(bps?|basis points?)\b", value, re.I):
+        return round(number / 100, 10)
+    return number
+
+
+def parse_level(value):
+    """Strike, barrier and autocall levels in percent of the initial level
+
+    '60%', 60 and 0.6 all become 60.0: values up to 1.5 without a percent
+    sign are fractions, because these levels are never that close to zero.
+    """
+    number = parse_number(value)
+    if number is None or (isinstance(value, str) and "%" in value):
+        return number
+    return round(number * 100, 10) if abs(number) <= 1.5 else number
+
+
+def parse_date(value):
+    """Parse the date formats termsheets commonly use, or return None"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_currency(value):
+    """Return the ISO currency code in values like 'CHF', 'chf 1,000', 'Swiss Franc' or '$', or None"""
+    if not isinstance(value, str):
+        return None
+    for code in CURRENCY_PATTERN.findall(value.upper()):
+        if code in CURRENCY_CODES:
+            return code
+    lowered = value.lower()
+    for name, code in CURRENCY_NAMES.items():
+        if re.search(rf"\b{re.escape(name)}s?\b", lowered):
+            return code
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in value:
+            return code
+    return None
+
+
+def _int(value):
+    number = parse_number(value)
+    return int(number) if number is not None else None
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        value = ", ".join(str(v) for v in value if v)
+    text = str(value).strip()
+    return text or None
+
+
+def _texts(value):
+    if isinstance(value, str):
+        value = [value]
+    return [text for text in map(_text, value) if text] if isinstance(value, list) else []
+
+
+def _mapping(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _records(value):
+    return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+
+
+# Field types: each one coerces whatever the agent returned, or gives None
+Text = Annotated[Optional[str], BeforeValidator(_text)]
+Number = Annotated[Optional[float], BeforeValidator(parse_number)]
+# Rates are kept in percent as given; levels also turn fractions into percent (0.6 -> 60.0)
+Percent = Annotated[Optional[float], BeforeValidator(parse_percent)]
+Level = Annotated[Optional[float], BeforeValidator(parse_level)]
+Integer = Annotated[Optional[int], BeforeValidator(_int)]
+IsoDate = Annotated[Optional[date], BeforeValidator(parse_date)]
+Currency = Annotated[Optional[str], BeforeValidator(parse_currency)]
+TextList = Annotated[List[str], BeforeValidator(_texts)]
+
+
+def section_of(model):
+    """A sub-section that is empty, never None, when missing or malformed"""
+    return Annotated[model, BeforeValidator(_mapping), Field(default_factory=model)]
+
+
+def list_of(model):
+    """A list of records that skips anything that is not an object"""
+    return Annotated[List[model], BeforeValidator(_records), Field(default_factory=list)]
+
+
+class Section(BaseModel):
+    """A result section; empty sections are falsy so they can be skipped"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    def __bool__(self):
+        return any(value not in (None, []) and not (isinstance(value, Section) and not value)
+                   for value in self.__dict__.values())
+
+
+class ReferenceCodes(Section):
+    code: Text = None
+
+
+class ProductGeneral(Section):
+    productName: Text = None
+    productType: Text = None
+    currency: Currency = None
+    issueSize: Number = None
+    denomination: Number = None
+    minimumInvestment: Number = None
+    ISIN: Text = None
+    valor: Text = None
+
+
+class IssuerInformation(Section):
+    issuerName: Text = None
+    issuerAddress: Text = None
+    issuerRating: Text = None
+    supervisoryAuthority: Text = None
+    calculationAgent: Text = None
+    fiscalTransferPayingAgents: TextList = []
+
+
+class ProductDescription(Section):
+    description: Text = None
+    marketExpectation: Text = None
+    referenceCodes: section_of(ReferenceCodes)
+
+
+class Dates(Section):
+    initialFixingDate: IsoDate = None
+    issueDate: IsoDate = None
+    finalFixingDate: IsoDate = None
+    redemptionDate: IsoDate = None
+
+
+class Underlying(Section):
+    name: Text = None
+    relatedExchange: Text = None
+    referenceCurrency: Currency = None
+    bloombergTicker: Text = None
+    initialFixingLevel: Number = None
+    strikeLevel: Level = None
+
+
+class CouponPayment(Section):
+    paymentNumber: Integer = None
+    couponRate: Percent = None
+    paymentDate: IsoDate = None
+
+
+class Coupon(Section):
+    couponAmountFormula: Text = None
+    couponRate: Percent = None
+    couponPaymentDates: list_of(CouponPayment)
+
+
+class RedemptionEvent(Section):
+    observationNumber: Integer = None
+    autocallLevel: Level = None
+    earlyRedemptionAmount: Number = None
+    observationDate: IsoDate = None
+    redemptionDate: IsoDate = None
+
+
+class EarlyRedemption(Section):
+    automaticEarlyRedemptionEvent: Text = None
+    redemptionEvents: list_of(RedemptionEvent)
+
+
+class Redemption(Section):
+    redemptionFormula: Text = None
+    finalFixingLevel: Text = None
+    performanceCalculation: Text = None
+    worstPerformance: Text = None
+
+
+class RiskFactors(Section):
+    riskOfLoss: Text = None
+    additionalRiskFactors: Text = None
+    issuerCreditRisk: Text = None
+    marketRisks: Text = None
+
+
+class ProductDocumentation(Section):
+    uniqueIdentifier: Text = None
+    notices: Text = None
+    listingExchange: Text = None
+    businessDayConvention: Text = None
+    secondaryMarket: Text = None
+    settlementType: Text = None
+
+
+class Termsheet(Section):
+    """One extraction result with every value normalized
+
+    Numbers and percentages are floats, dates are ``datetime.date`` and
+    currencies are ISO codes; anything that cannot be read becomes None, and
+    missing or malformed sections are empty rather than absent.
+    """
+
+    productGeneral: section_of(ProductGeneral)
+    issuerInformation: section_of(IssuerInformation)
+    productDescription: section_of(ProductDescription)
+    dates: section_of(Dates)
+    underlyings: list_of(Underlying)
+    coupon: section_of(Coupon)
+    earlyRedemption: section_of(EarlyRedemption)
+    redemption: section_of(Redemption)
+    riskFactors: section_of(RiskFactors)
+    productDocumentation: section_of(ProductDocumentation)
+
+
+_termsheets = TypeAdapter(List[Termsheet])
+
+
+def normalize(result):
+    """Validate one raw result (or pass a normalized one through) into a Termsheet"""
+    if isinstance(result, Termsheet):
+        return result
+    return Termsheet.model_validate(_mapping(result))
+
+
+def normalize_many(results):
+    """Validate a list of raw results in one call through the compiled list schema"""
+    return _termsheets.validate_python([result if isinstance(result, Termsheet) else _mapping(result)
+                                        for result in results])
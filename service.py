@@ -0,0 +1,484 @@
+import contextlib
+import json
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import quote, urlparse, parse_qs
+from urllib.request import Request, urlopen
+
+from cache import hash_bytes
+from manifest import QUEUED, COMPLETED, FAILED
+from metrics import get_metrics
+
+RUNNING = "running"
+
+QUEUE_NAME = "queue.sqlite"
+SERVICE_URL = os.getenv("TERMSHEET_SERVICE_URL")
+SERVICE_DIR = os.getenv("TERMSHEET_SERVICE_DIR", "service_data")
+# A document whose worker has not renewed its lease for this many seconds goes to another
+# worker; workers renew every third of it while they extract
+LEASE_SECONDS = float(os.getenv("TERMSHEET_SERVICE_LEASE", 900))
+# Extraction attempts per document before it is marked failed
+MAX_ATTEMPTS = int(os.getenv("TERMSHEET_SERVICE_ATTEMPTS", 3))
+MAX_UPLOAD_MB = float(os.getenv("TERMSHEET_SERVICE_MAX_MB", 50))
+# Seconds an idle worker waits before checking the queue again
+IDLE_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    hash TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    queued_at REAL,
+    started_at REAL,
+    lease_until REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    name TEXT,
+    submitted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status, queued_at);
+"""
+
+JOB_COLUMNS = ("j.job_id, j.hash, j.name, j.submitted_at, d.status, d.attempts, d.worker, "
+               "d.started_at, d.finished_at, d.error")
+
+
+class JobQueue:
+    """Durable SQLite queue of extraction jobs shared by the API and worker processes
+
+    Every submission gets its own job ID, but the work is tracked per
+    document content hash: a job for a document that is already queued or
+    running joins it instead of adding a second extraction, and one for a
+    document that already finished is answered from the stored result.
+    Uploaded PDFs are kept in ``<data_dir>/uploads`` until their document is
+    extracted. Workers claim documents with a lease that they renew while
+    they extract, so a document whose worker died is picked up again once
+    the lease runs out. Every write runs in a ``BEGIN IMMEDIATE``
+    transaction, which also serializes the upload file changes that go
+    with it across processes.
+    """
+
+    def __init__(self, data_dir=SERVICE_DIR, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.data_dir = data_dir
+        self.upload_dir = os.path.join(data_dir, "uploads")
+        self.lease = lease
+        self.max_attempts = max_attempts
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self.path = os.path.join(data_dir, QUEUE_NAME)
+        # Transactions are explicit (see _transaction)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Take the database write lock up front, so workers in other processes wait
+        their turn instead of failing on a stale snapshot"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def upload_path(self, content_hash):
+        return os.path.join(self.upload_dir, f"{content_hash}.pdf")
+
+    def _store(self, content_hash, data):
+        path = self.upload_path(content_hash)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def submit(self, data, name=None):
+        """Queue a PDF and return ``(job, coalesced)``
+
+        ``coalesced`` is True when the document was already queued or running,
+        so no new extraction was added for it.
+        """
+        content_hash = hash_bytes(data)
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction():
+            # Stored inside the transaction: no worker can claim the document before the file
+            # is in place, and no failing attempt can remove it between the check and the insert
+            self._store(content_hash, data)
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO documents (hash, status, queued_at) VALUES (?, ?, ?)",
+                (content_hash, QUEUED, now)).rowcount
+            if not added:
+                # Failed documents are tried again from scratch when they are resubmitted
+                added = self._conn.execute(
+                    "UPDATE documents SET status = ?, attempts = 0, error = NULL, queued_at = ? "
+                    "WHERE hash = ? AND status = ?", (QUEUED, now, content_hash, FAILED)).rowcount
+            self._conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?)", (job_id, content_hash, name, now))
+            status = self._conn.execute("SELECT status FROM documents WHERE hash = ?",
+                                        (content_hash,)).fetchone()["status"]
+            if status == COMPLETED:
+                self._discard(content_hash)
+        return self.job(job_id), not added and status in (QUEUED, RUNNING)
+
+    def claim(self, worker):
+        """Lease the oldest queued (or abandoned) document to ``worker``; return its hash and path"""
+        while True:
+            now = time.time()
+            with self._transaction():
+                row = self._conn.execute(
+                    "SELECT hash, attempts FROM documents WHERE status = ? OR (status = ? AND lease_until < ?) "
+                    "ORDER BY queued_at LIMIT 1", (QUEUED, RUNNING, now)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE documents SET status = ?, worker = ?, started_at = ?, lease_until = ?, "
+                        "attempts = attempts + 1 WHERE hash = ?",
+                        (RUNNING, worker, now, now + self.lease, row["hash"]))
+            if row is None:
+                return None
+            if row["attempts"] < self.max_attempts:
+                return row["hash"], self.upload_path(row["hash"])
+            # Its workers kept dying; give up instead of taking the next one down too
+            self.fail(row["hash"], "Worker lost while extracting")
+
+    def renew(self, content_hash, worker):
+        """Extend ``worker``'s lease on a document; False if another worker has taken it over"""
+        with self._transaction():
+            return self._conn.execute(
+                "UPDATE documents SET lease_until = ? WHERE hash = ? AND status = ? AND worker = ?",
+                (time.time() + self.lease, content_hash, RUNNING, worker)).rowcount > 0
+
+    def complete(self, content_hash, result):
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE documents SET status = ?, result = ?, finished_at = ?, error = NULL, lease_until = NULL "
+                "WHERE hash = ?", (COMPLETED, json.dumps(result, default=str), time.time(), content_hash))
+            self._discard(content_hash)
+
+    def fail(self, content_hash, error):
+        """Record a failed attempt; the document is queued again until it runs out of attempts"""
+        with self._transaction():
+            row = self._conn.execute("SELECT attempts FROM documents WHERE hash = ?", (content_hash,)).fetchone()
+            status = QUEUED if row is not None and row["attempts"] < self.max_attempts else FAILED
+            self._conn.execute(
+                "UPDATE documents SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE hash = ?",
+                (status, str(error), time.time(), content_hash))
+            if status == FAILED:
+                self._discard(content_hash)
+        return status
+
+    def release(self, content_hash):
+        """Put a document back without counting the attempt, e.g. when a worker shuts down"""
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE documents SET status = ?, attempts = MAX(attempts - 1, 0), lease_until = NULL "
+                "WHERE hash = ? AND status = ?", (QUEUED, content_hash, RUNNING))
+
+    def _discard(self, content_hash):
+        path = self.upload_path(content_hash)
+        if os.path.exists(path):
+            os.unlink(path)
+
+    def job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs j JOIN documents d USING (hash) "
+                                     "WHERE j.job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def result(self, job_id):
+        """Return ``(status, result)``, with the result only once the job has completed"""
+        with self._lock:
+            row = self._conn.execute("SELECT d.status, d.result FROM jobs j JOIN documents d USING (hash) "
+                                     "WHERE j.job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None, None
+        return row["status"], json.loads(row["result"]) if row["result"] else None
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM documents GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        self._conn.close()
+
+
+@contextlib.contextmanager
+def _leased(queue, content_hash, worker):
+    """Renew a claimed document's lease in the background while the block runs
+
+    Long extractions, e.g. with section repair, keep their document instead of
+    having it claimed and paid for a second time by another worker.
+    """
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(queue.lease / 3):
+            if not queue.renew(content_hash, worker):
+                print(f"Lost the lease on {content_hash[:12]} to another worker")
+                return
+
+    heartbeat = threading.Thread(target=renew, name="lease-heartbeat", daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def run_worker(data_dir=SERVICE_DIR, engine=None, prefilter=None, repair=None, stop=None):
+    """Claim and extract documents until ``stop`` (a multiprocessing Event) is set"""
+    from extract import extract_termsheet
+
+    if threading.current_thread() is threading.main_thread():
+        # Process managers signal every process of the service, not just the parent:
+        # release the claimed document and exit instead of dying mid-write
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    queue = JobQueue(data_dir)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    metrics = get_metrics()
+    claimed = None
+    try:
+        while stop is None or not stop.is_set():
+            claimed = queue.claim(worker)
+            if claimed is None:
+                if stop is not None:
+                    stop.wait(IDLE_SECONDS)
+                else:
+                    time.sleep(IDLE_SECONDS)
+                continue
+            content_hash, path = claimed
+            try:
+                with _leased(queue, content_hash, worker), metrics.span("service_extract",
+                                                                       attrs={"hash": content_hash}):
+                    result = extract_termsheet(path, content_hash=content_hash, engine=engine,
+                                               prefilter=prefilter, repair=repair)
+            except Exception as e:
+                status = queue.fail(content_hash, e)
+                metrics.inc("service_documents_total", outcome=status)
+                print(f"Extraction of {content_hash[:12]} failed ({status}): {e}")
+            else:
+                queue.complete(content_hash, result)
+                metrics.inc("service_documents_total", outcome=COMPLETED)
+            claimed = None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if claimed is not None:
+            queue.release(claimed[0])
+        queue.close()
+
+
+def make_server(queue, host="127.0.0.1", port=8000, max_upload_mb=MAX_UPLOAD_MB):
+    """HTTP/JSON API over a JobQueue
+
+    ``POST /jobs?name=file.pdf`` with the PDF as the request body queues it.
+    ``GET /jobs/<id>`` returns the job status, ``GET /jobs/<id>/result`` the
+    extracted result (409 while it is not finished), ``GET /health`` the
+    number of documents per status and ``GET /metrics`` the API's counters.
+    """
+    metrics = get_metrics()
+    max_bytes = int(max_upload_mb * 1024 * 1024)
+
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/jobs":
+                self.send_json(404, {"error": "Not found"})
+                return
+            length = self.headers.get("Content-Length")
+            if length is None:
+                self.send_json(411, {"error": "Content-Length is required"})
+                return
+            length = int(length) if length.strip().isdigit() else -1
+            if length < 0:
+                self.send_json(400, {"error": "Invalid Content-Length"})
+                return
+            if length > max_bytes:
+                self.send_json(413, {"error": f"Uploads are limited to {max_upload_mb:g} MB"})
+                return
+            data = self.rfile.read(length)
+            if not data.startswith(b"%PDF"):
+                self.send_json(400, {"error": "The request body must be a PDF"})
+                return
+            name = parse_qs(url.query).get("name", [None])[0]
+            job, coalesced = queue.submit(data, name)
+            metrics.inc("service_jobs_total", outcome="coalesced" if coalesced else job["status"])
+            job["coalesced"] = coalesced
+            self.send_json(200 if job["status"] == COMPLETED else 202, job)
+
+        def do_GET(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+            if parts == ["health"]:
+                self.send_json(200, {"documents": queue.counts()})
+            elif parts == ["metrics"]:
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = queue.job(parts[1])
+                if job is None:
+                    self.send_json(404, {"error": "Unknown job"})
+                else:
+                    self.send_json(200, job)
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+                status, result = queue.result(parts[1])
+                if status is None:
+                    self.send_json(404, {"error": "Unknown job"})
+                elif status != COMPLETED:
+                    self.send_json(409, {"status": status})
+                else:
+                    self.send_json(200, result)
+            else:
+                self.send_json(404, {"error": "Not found"})
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+class ServiceClient:
+    """Submits PDFs to an extraction service and waits for their results"""
+
+    def __init__(self, url=None, timeout=30, poll_interval=1.0, max_poll_interval=10.0):
+        self.url = (url or SERVICE_URL or "http://127.0.0.1:8000").rstrip("/")
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    def _request(self, path, data=None):
+        request = Request(self.url + path, data=data, method="POST" if data is not None else "GET",
+                          headers={"Content-Type": "application/pdf"} if data is not None else {})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as e:
+            try:
+                body = json.loads(e.read())
+            except ValueError:
+                body = {"error": e.reason}
+            return e.code, body
+
+    def submit(self, data, name=None):
+        """Queue a PDF's bytes and return the job, with its ``job_id``, ``hash`` and ``status``"""
+        path = f"/jobs?name={quote(name)}" if name else "/jobs"
+        status, body = self._request(path, data)
+        if status >= 400:
+            raise RuntimeError(f"Submission failed ({status}): {body.get('error')}")
+        return body
+
+    def status(self, job_id):
+        status, body = self._request(f"/jobs/{job_id}")
+        if status >= 400:
+            raise RuntimeError(f"Status request failed ({status}): {body.get('error')}")
+        return body
+
+    def result(self, job_id):
+        """The job's result, or None while it is still queued or running"""
+        status, body = self._request(f"/jobs/{job_id}/result")
+        if status == 409:
+            return None
+        if status >= 400:
+            raise RuntimeError(f"Result request failed ({status}): {body.get('error')}")
+        return body
+
+    def wait(self, job_id, timeout=None):
+        """Poll with backoff until the job completes and return its result"""
+        started = time.monotonic()
+        interval = self.poll_interval
+        while True:
+            job = self.status(job_id)
+            if job["status"] == COMPLETED:
+                return self.result(job_id)
+            if job["status"] == FAILED:
+                raise RuntimeError(f"Extraction failed: {job.get('error')}")
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(interval)
+            interval = min(interval * 1.5, self.max_poll_interval)
+
+    def extract_bytes(self, data, name=None, timeout=None, **kwargs):
+        """Submit and wait, in the same form as ``extract_termsheet_bytes``
+
+        Other keyword arguments such as ``agent`` are accepted and ignored; the
+        service decides how documents are extracted.
+        """
+        job = self.submit(data, name)
+        if job["status"] == COMPLETED:
+            return self.result(job["job_id"])
+        return self.wait(job["job_id"], timeout)
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+    from engines import ENGINE_MODES
+
+    parser = argparse.ArgumentParser(description="Run the extraction service: an HTTP API and worker processes")
+    parser.add_argument("--data-dir", default=SERVICE_DIR, help="Directory for the job queue and pending uploads")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the API listens on")
+    parser.add_argument("--port", type=int, default=8000, help="Port the API listens on")
+    parser.add_argument("--workers", type=int, default=4, help="Extraction worker processes to start")
+    parser.add_argument("--no-api", action="store_true",
+                        help="Only run workers, e.g. to add capacity to a service already running on this host")
+    parser.add_argument("--engine", choices=ENGINE_MODES, help="Extraction engine (default: TERMSHEET_ENGINE)")
+    parser.add_argument("--prefilter", action="store_true", help="Upload only the relevant pages of each PDF")
+    parser.add_argument("--repair", action="store_true", help="Re-extract incomplete sections from their pages")
+    args = parser.parse_args()
+
+    # Spawned, not forked: the parent may already hold locks and open SQLite connections
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    options = dict(engine=args.engine, prefilter=args.prefilter or None, repair=args.repair or None, stop=stop)
+    processes = [context.Process(target=run_worker, args=(args.data_dir,), kwargs=options,
+                                         name=f"extract-worker-{i + 1}") for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    print(f"Started {len(processes)} workers on {os.path.abspath(args.data_dir)}")
+    # Shut the workers down cleanly when a process manager stops the service
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        if args.no_api:
+            for process in processes:
+                process.join()
+        else:
+            queue = JobQueue(args.data_dir)
+            server = make_server(queue, args.host, args.port)
+            print(f"Serving the extraction API on http://{args.host}:{args.port}")
+            server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
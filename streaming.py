@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import threading
+import time
+
+# Output recorded in the manifest for results written to a stream instead of a file
+STREAMED = "-"
+
+
+class NDJSONWriter:
+    """Append results as compact JSON lines in completion order
+
+    ``path`` is a file to append to, or '-' for stdout so the stream can be
+    piped into a loader. With ``segment_lines`` or ``segment_bytes`` set,
+    ``path`` is a directory and a new ``results-<run>-<n>.ndjson`` segment is
+    started whenever the current one is full. Every line is flushed as soon
+    as it is written, and writes are safe from several threads.
+    """
+
+    def __init__(self, path, segment_lines=None, segment_bytes=None, stream=None):
+        self.path = path
+        self.segment_lines = segment_lines
+        self.segment_bytes = segment_bytes
+        self.lines_written = 0
+        self.segments = []
+        self._stream = stream or (sys.stdout if path == "-" else None)
+        self._file = None
+        self._lines = 0
+        self._bytes = 0
+        self._run = time.strftime("%Y%m%dT%H%M%S")
+        self._lock = threading.Lock()
+        if self.rotating:
+            os.makedirs(path, exist_ok=True)
+
+    @property
+    def rotating(self):
+        return self.path != "-" and bool(self.segment_lines or self.segment_bytes)
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        if self.rotating:
+            segment = os.path.join(self.path, f"results-{self._run}-{len(self.segments) + 1:05d}.ndjson")
+        else:
+            segment = self.path
+            parent = os.path.dirname(os.path.abspath(segment))
+            os.makedirs(parent, exist_ok=True)
+        self._file = open(segment, 'a')
+        self._lines = 0
+        self._bytes = 0
+        self.segments.append(segment)
+
+    def _segment_full(self):
+        return ((self.segment_lines and self._lines >= self.segment_lines)
+                or (self.segment_bytes and self._bytes >= self.segment_bytes))
+
+    def write(self, record):
+        """Write one record and return the path of the segment it went to (``STREAMED`` for stdout)"""
+        line = json.dumps(record, separators=(',', ':'), default=str) + "\n"
+        with self._lock:
+            if self._stream is not None:
+                self._stream.write(line)
+                self._stream.flush()
+                self.lines_written += 1
+                return STREAMED
+            if self._file is None or (self.rotating and self._segment_full()):
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            self._lines += 1
+            self._bytes += len(line)
+            self.lines_written += 1
+            return self.segments[-1]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def result_record(data, pdf_file, content_hash, source, job_id=None, queued_at=None, completed_at=None):
+    """One NDJSON line: the result plus where it came from and how long it took"""
+    completed_at = completed_at or time.time()
+    return {
+        "file": os.path.basename(pdf_file),
+        "path": os.path.abspath(pdf_file),
+        "hash": content_hash,
+        "source": source,
+        "job_id": job_id,
+        "queued_at": queued_at,
+        "completed_at": completed_at,
+        "latency_s": round(completed_at - queued_at, 3) if queued_at else None,
+        "result": data,
+    }
+
+
+def read_result(path, content_hash):
+    """Return the result for ``content_hash`` from a JSON file or an NDJSON segment"""
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            return json.load(f)
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("hash") == content_hash:
+                return record["result"]
+    return None
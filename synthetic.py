@@ -0,0 +1,194 @@
+"""Generator for synthetic termsheet PDFs used by the benchmarks"""
+import datetime
+import os
+import random
+
+from engines import isin_check_digit
+
+UNDERLYINGS = [
+    ("Nestle SA", "NESN SE", "CHF", 98.5), ("Novartis AG", "NOVN SE", "CHF", 84.2),
+    ("Roche Holding AG", "ROG SE", "CHF", 251.0), ("UBS Group AG", "UBSG SE", "CHF", 24.8),
+    ("Siemens AG", "SIE GY", "EUR", 172.3), ("SAP SE", "SAP GY", "EUR", 139.6),
+    ("Apple Inc", "AAPL UW", "USD", 185.9), ("Microsoft Corp", "MSFT UW", "USD", 374.5),
+]
+ISSUERS = ["Bank AG", "Example Securities Ltd", "Demo Finance plc", "Sample Bank SA"]
+
+BOILERPLATE = [
+    "Selling restrictions apply in the United States and to any U.S. person.",
+    "Taxation: withholding tax may apply. FATCA and other regimes are not described here.",
+    "Disclaimer: this document does not constitute an offer in any jurisdiction.",
+    "Governing law and jurisdiction are set out in the base prospectus.",
+    "Data protection: the issuer hereby processes personal data as described in its policy.",
+]
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF with one page per string in ``pages``"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+    page_ids = []
+    for text in pages:
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.split("\n")]
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        contents = add(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        page_ids.append(add(f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 595 842] "
+                            f"/Contents {contents} 0 R /Resources << /Font << /F1 {font} 0 R >> >> >>"))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    add(f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+    catalog = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def termsheet_pages(rng, coupons=12, underlyings=3, boilerplate_pages=2):
+    """Return page texts for one random barrier reverse convertible"""
+    body = f"CH{rng.randrange(10 ** 9):09d}"
+    isin = body + str(isin_check_digit(body))
+    chosen = rng.sample(UNDERLYINGS, min(underlyings, len(UNDERLYINGS)))
+    currency = chosen[0][2]
+    fixing = datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+    final = fixing + datetime.timedelta(days=30 * coupons)
+    rate = rng.choice([4.0, 6.0, 8.0, 10.0, 12.0])
+
+    lines = [
+        f"Barrier Reverse Convertible on {', '.join(name for name, _, _, _ in chosen)}",
+        f"ISIN {isin} Valor {rng.randrange(10 ** 6, 10 ** 8)}",
+        f"Issuer: {rng.choice(ISSUERS)}",
+        f"Rating: {rng.choice(['AA-', 'A+', 'A', 'BBB+'])}",
+        f"Currency: {currency}",
+        f"Denomination: {currency} 1,000",
+        f"Issue Size: {currency} {rng.choice([5, 10, 20, 50])},000,000",
+        f"Initial Fixing Date: {fixing:%d.%m.%Y}",
+        f"Issue Date: {fixing + datetime.timedelta(days=7):%d.%m.%Y}",
+        f"Final Fixing Date: {final:%d.%m.%Y}",
+        f"Redemption Date: {final + datetime.timedelta(days=7):%d.%m.%Y}",
+        f"Coupon Rate: {rate:.2f}% p.a.",
+        "Underlyings",
+    ]
+    for name, ticker, ccy, level in chosen:
+        lines.append(f"{name} {ticker} {ccy} {level * rng.uniform(0.8, 1.2):.2f} "
+                     f"{rng.choice([50, 60, 70]):.2f}%")
+    schedule = ["Coupon Payment Dates"]
+    for i in range(coupons):
+        paid = fixing + datetime.timedelta(days=30 * (i + 1))
+        schedule.append(f"{i + 1} {paid:%d.%m.%Y} {rate / 12:.2f}%")
+    schedule.append("Early Redemption Observation Dates")
+    for i in range(coupons // 3):
+        observed = fixing + datetime.timedelta(days=90 * (i + 1))
+        schedule.append(f"{i + 1} {observed:%d.%m.%Y} {observed + datetime.timedelta(days=7):%d.%m.%Y} "
+                        f"100% {currency} 1,000")
+    schedule.append("Investors may lose some or all of the invested capital.")
+    schedule.append("Investors bear the issuer credit risk.")
+
+    pages = ["\n".join(lines)]
+    # Long schedules run over several pages, like real termsheets
+    for start in range(0, len(schedule), 60):
+        pages.append("\n".join(schedule[start:start + 60]))
+    for _ in range(boilerplate_pages):
+        pages.append("\n".join(rng.sample(BOILERPLATE, len(BOILERPLATE)) * 4))
+    return pages
+
+
+def generate_corpus(directory, count, seed=0, coupons=12, underlyings=3, boilerplate_pages=2, duplicates=0.0):
+    """Write ``count`` synthetic termsheets to ``directory`` and return their paths
+
+    A ``duplicates`` fraction of the files are byte-identical copies of earlier
+    ones, so dedup can be benchmarked as well.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"termsheet_{i:05d}.pdf")
+        if paths and rng.random() < duplicates:
+            with open(rng.choice(paths), 'rb') as src, open(path, 'wb') as dst:
+                dst.write(src.read())
+        else:
+            write_pdf(path, termsheet_pages(rng, coupons, underlyings, boilerplate_pages))
+        paths.append(path)
+    return paths
+
+
+def synthetic_book(count, seed=0, coupons=12, underlyings=3):
+    """The export tables of ``count`` random products as DataFrames, for lifecycle benchmarks
+
+    Built directly with NumPy, so books of 100k+ products take well under a
+    second instead of generating and extracting a PDF for each.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    ids = np.array([f"doc{i:07d}" for i in range(count)], dtype=object)
+    fixing = np.datetime64("2024-01-01") + rng.integers(0, 365, count).astype("timedelta64[D]")
+    months = np.arange(1, coupons + 1)
+    observations = months[2::3]
+    currencies = np.array(["CHF", "EUR", "USD"], dtype=object)
+    products = pd.DataFrame({
+        "document_id": ids,
+        "currency": currencies[rng.integers(0, 3, count)],
+        "denomination": 1000.0,
+        "final_fixing_date": fixing + np.timedelta64(30 * coupons, "D"),
+        "redemption_date": fixing + np.timedelta64(30 * coupons + 7, "D"),
+    })
+    chosen = rng.integers(0, len(UNDERLYINGS), (count, underlyings))
+    tickers = np.array([ticker for _, ticker, _, _ in UNDERLYINGS], dtype=object)
+    levels = np.array([level for _, _, _, level in UNDERLYINGS])
+    underlying_table = pd.DataFrame({
+        "document_id": np.repeat(ids, underlyings),
+        "position": np.tile(np.arange(underlyings), count),
+        "bloomberg_ticker": tickers[chosen].ravel(),
+        "initial_fixing_level": (levels[chosen] * rng.uniform(0.8, 1.2, chosen.shape)).ravel(),
+        "strike_level": rng.choice([50.0, 60.0, 70.0], chosen.size),
+    })
+    rate = rng.choice([4.0, 6.0, 8.0, 10.0, 12.0], count)
+    coupon_payments = pd.DataFrame({
+        "document_id": np.repeat(ids, coupons),
+        "payment_number": np.tile(months, count),
+        "coupon_rate": np.repeat(rate / 12, coupons),
+        "payment_date": (np.repeat(fixing, coupons) + (30 * np.tile(months, count)).astype("timedelta64[D]")),
+    })
+    redemption_events = pd.DataFrame({
+        "document_id": np.repeat(ids, len(observations)),
+        "observation_number": np.tile(np.arange(1, len(observations) + 1), count),
+        "autocall_level": 100.0,
+        "early_redemption_amount": 1000.0,
+        "observation_date": (np.repeat(fixing, len(observations))
+                             + (30 * np.tile(observations, count)).astype("timedelta64[D]")),
+    })
+    return products, underlying_table, coupon_payments, redemption_events
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic termsheet PDFs")
+    parser.add_argument("directory", help="Directory to write the PDFs to")
+    parser.add_argument("--count", type=int, default=100, help="Number of PDFs")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible corpora")
+    parser.add_argument("--coupons", type=int, default=12, help="Coupon payments per termsheet")
+    parser.add_argument("--underlyings", type=int, default=3, help="Underlyings per termsheet")
+    parser.add_argument("--boilerplate-pages", type=int, default=2, help="Legal pages per termsheet")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Fraction of exact duplicate files")
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.directory, args.count, args.seed, args.coupons, args.underlyings,
+                            args.boilerplate_pages, args.duplicates)
+    print(f"Wrote {len(paths)} termsheets to {args.directory}")
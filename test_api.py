@@ -1,6 +1,7 @@
 from llama_extract import LlamaExtract
 from dotenv import load_dotenv
 import os
+from engines import LocalRuleEngine
 
 def test_api_connection():
     print("Testing Llama Extract API Connection...")
@@ -24,6 +25,9 @@ def test_api_connection():
         
     except Exception as e:
         print(f"Error accessing agent: {e}")
+    
+    # The local engine is the fallback when the API cannot be reached
+    print(f"\nLocal engine available: {'Yes' if LocalRuleEngine().available() else 'No (pip install pypdf)'}")
 
 if __name__ == "__main__":
     test_api_connection() 
\ No newline at end of file
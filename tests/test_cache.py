@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+from cache import ExtractionCache
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    cache.put("abc", "agent", {"value": 1})
+    assert cache.get("abc", "agent") == {"value": 1}
+    assert cache.get("abc", "other agent") is None
+
+
+def test_size_limit_evicts_oldest(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=200)
+    for i in range(10):
+        cache.put(f"doc{i}", "agent", {"text": "x" * 50})
+    assert cache.get("doc9", "agent") is not None
+    assert cache.get("doc0", "agent") is None
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 200
+
+
+def test_concurrent_puts_with_expired_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_age=60, evict_interval=0)
+    for i in range(20):
+        cache.put(f"old{i}", "agent", {"i": i})
+    stale = time.time() - 3600
+    for entry in os.scandir(tmp_path):
+        os.utime(entry.path, (stale, stale))
+
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def worker(n):
+        barrier.wait()
+        try:
+            for i in range(5):
+                cache.put(f"new{n}-{i}", "agent", {"n": n})
+                cache.get(f"old{i}", "agent")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cache.get("new7-4", "agent") == {"n": 7}
+
+
+def test_put_only_scans_when_due(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path))
+    cache.put("first", "agent", {})
+    scans = []
+    original = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or original())
+    for i in range(20):
+        cache.put(f"doc{i}", "agent", {})
+    assert scans == []
+
+
+def test_expired_get_keeps_the_size_in_step(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_age=60)
+    cache.put("old", "agent", {"text": "x" * 50})
+    cache.put("new", "agent", {"text": "y"})
+    cache.evict()
+    stale = time.time() - 3600
+    os.utime(cache._path(cache.key_for("old", "agent")), (stale, stale))
+
+    assert cache.get("old", "agent") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "evictions": 1}
+    assert cache._size == sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+
+
+def test_abandoned_temporary_files_are_evicted(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    abandoned = tmp_path / "entry.json.123.456.tmp"
+    abandoned.write_text("{")
+    stale = time.time() - 2 * 3600
+    os.utime(abandoned, (stale, stale))
+    in_progress = tmp_path / "entry.json.123.789.tmp"
+    in_progress.write_text("{")
+
+    cache.evict()
+    assert not abandoned.exists()
+    assert in_progress.exists()
+
+
+def test_counters_are_exact_under_concurrent_gets(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    cache.put("doc", "agent", {})
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(200):
+            cache.get("doc", "agent")
+            cache.get("missing", "agent")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 1600
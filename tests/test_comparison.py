@@ -0,0 +1,18 @@
+from comparison import build_comparison_frame, comparison_row
+from fake_agent import sample_result
+
+
+def test_row_holds_normalized_headline_fields():
+    row = comparison_row("a.pdf", sample_result("a.pdf", rows=3))
+    assert row["File"] == "a.pdf"
+    assert row["Currency"] == "CHF"
+    assert row["Coupon Rate (%)"] == 8.0
+    assert row["Coupon Payments"] == 3
+    assert row["Bloomberg Tickers"] == "NESN SE"
+
+
+def test_frame_has_one_row_per_product_and_tolerates_missing_sections():
+    frame = build_comparison_frame([("a.pdf", sample_result("a.pdf")), ("empty.pdf", {})])
+    assert list(frame["File"]) == ["a.pdf", "empty.pdf"]
+    assert frame.loc[1, "Underlyings"] == ""
+    assert frame.loc[1, "Coupon Payments"] is None
@@ -0,0 +1,58 @@
+import asyncio
+
+import batch_process
+from completeness import deficient_sections, repair_result, score_result
+from fake_agent import FakeAgent, sample_result
+
+
+def complete(file_path):
+    return sample_result(file_path, rows=2)
+
+
+def without_dates(file_path):
+    result = complete(file_path)
+    result["dates"] = {}
+    return result
+
+
+def test_complete_result_has_no_deficient_sections():
+    scores = score_result(complete("doc.pdf"))
+    assert scores["productGeneral"] == 1.0
+    assert deficient_sections(scores) == []
+
+
+def test_missing_section_is_re_extracted_and_merged(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return complete(path)
+
+    data, report = repair_result(without_dates(str(pdf)), str(pdf), extract)
+    assert report.sections == ["dates"]
+    assert report.improved == ["dates"]
+    assert data["dates"]["issueDate"] == "2024-01-22"
+    assert len(calls) == 1
+
+
+def test_handler_retry_does_not_repair_again(tmp_path, monkeypatch):
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    agent = FakeAgent(latency=0, result_factory=without_dates)
+    save_result = batch_process.save_result
+    failures = []
+
+    def flaky_save(data, pdf_file, output_dir):
+        if not failures:
+            failures.append(pdf_file)
+            raise OSError("disk full")
+        return save_result(data, pdf_file, output_dir)
+
+    monkeypatch.setattr(batch_process, "save_result", flaky_save)
+    asyncio.run(batch_process.batch_process_termsheets(str(tmp_path), use_cache=False, agent=agent,
+                                                       repair=True, workers=1))
+    assert failures
+    assert agent.fetch_calls == 1
+    assert agent.extract_calls == 1
+    assert (tmp_path / "extracted_data" / "doc.json").exists()
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+from collections import Counter
+
+from batch_process import batch_process_termsheets
+from dedup import DedupPlan, SignatureIndex, minhash, shingles, similarity
+from fake_agent import FakeAgent
+from manifest import COMPLETED, MANIFEST_NAME
+
+WORDS = " ".join(f"clause{i} applies to the notes" for i in range(200))
+
+
+def manifest_lines(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_plan_links_exact_copies_to_the_first_file():
+    plan = DedupPlan(near=False)
+    assert plan.add_exact("a.pdf", "hash-1") is None
+    assert plan.add_exact("b.pdf", "hash-1") == "a.pdf"
+    assert plan.add_exact("c.pdf", "hash-2") is None
+    assert plan.duplicates_of("a.pdf") == ["b.pdf"]
+    assert plan.avoided == 1
+
+
+def test_identical_files_are_submitted_once_and_published_once_each(tmp_path):
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.pdf").write_bytes(b"%PDF-1.4 same document")
+    (tmp_path / "d.pdf").write_bytes(b"%PDF-1.4 other document")
+    agent = FakeAgent(latency=0)
+
+    output_dir = asyncio.run(batch_process_termsheets(str(tmp_path), use_cache=False, agent=agent,
+                                                      dedup="exact", workers=1))
+
+    assert agent.fetch_calls == 2
+    completed = Counter(os.path.basename(e["path"]) for e in manifest_lines(output_dir)
+                        if e["status"] == COMPLETED)
+    assert completed == {"a.pdf": 1, "b.pdf": 1, "c.pdf": 1, "d.pdf": 1}
+    for name in "abcd":
+        assert os.path.exists(os.path.join(output_dir, f"{name}.json"))
+
+
+
+def test_minhash_estimates_similarity():
+    signature = minhash(shingles(WORDS))
+    edited = minhash(shingles(WORDS.replace("clause7 ", "section7 ")))
+    other = minhash(shingles(" ".join(f"unrelated{i} text here" for i in range(200))))
+    assert similarity(signature, signature) == 1.0
+    assert similarity(signature, edited) > 0.9
+    assert similarity(signature, other) < 0.2
+    assert minhash(shingles("too short")) is None
+
+
+def test_signature_index_finds_near_duplicates_across_runs(tmp_path):
+    signature = minhash(shingles(WORDS)).tolist()
+    index = SignatureIndex(str(tmp_path))
+    index.add("hash-1", signature, "a.json", persist=True)
+
+    reloaded = SignatureIndex(str(tmp_path))
+    edited = minhash(shingles(WORDS.replace("clause7 ", "section7 "))).tolist()
+    key, output, score = reloaded.best_match(edited)
+    assert (key, output) == ("hash-1", "a.json")
+    assert score > 0.9
+    assert reloaded.best_match(minhash(shingles(" ".join(f"x{i} y z w" for i in range(200)))).tolist()) is None
+
+
+def test_plan_links_near_duplicates_within_a_batch():
+    plan = DedupPlan(SignatureIndex(), near=True)
+    signature = minhash(shingles(WORDS)).tolist()
+    assert plan.add_near("a.pdf", signature)
+    assert not plan.add_near("b.pdf", minhash(shingles(WORDS.replace("clause7 ", "section7 "))).tolist())
+    assert plan.near == {"b.pdf": "a.pdf"}
+    assert plan.submit == ["a.pdf"]
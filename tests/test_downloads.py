@@ -0,0 +1,50 @@
+import io
+import json
+import zipfile
+
+from downloads import DownloadStore, bundle_bytes, json_bytes, table_frames
+from fake_agent import sample_result
+
+
+def test_json_is_compact_unless_asked_otherwise():
+    result = {"name": "Zürich", "rate": 1.5}
+    assert json_bytes(result) == '{"name":"Zürich","rate":1.5}'.encode()
+    assert json.loads(json_bytes(result, compact=False)) == result
+
+
+def test_tables_have_a_row_per_product():
+    frames = table_frames([("a", sample_result("a.pdf", rows=2)), ("b", sample_result("b.pdf"))])
+    assert list(frames["products"]["document_id"]) == ["a", "b"]
+    assert len(frames["underlyings"]) == 2
+
+
+def test_bundle_keeps_uploads_with_the_same_name_apart():
+    documents = [("a.pdf", sample_result("a.pdf")), ("a.pdf", sample_result("other.pdf"))]
+    with zipfile.ZipFile(io.BytesIO(bundle_bytes(documents))) as archive:
+        names = archive.namelist()
+        assert "json/a.json" in names and "json/a_2.json" in names
+        assert "tables/products.csv" in names
+        assert json.loads(archive.read("json/a_2.json"))["productGeneral"]["productName"] == "other"
+
+
+def test_store_builds_once_and_evicts_least_recently_used():
+    store = DownloadStore(max_bytes=10)
+    builds = []
+
+    def build(data):
+        def _build():
+            builds.append(data)
+            return data
+        return _build
+
+    assert store.get("a", "json", build(b"aaaa")) == b"aaaa"
+    assert store.get("a", "json", build(b"xxxx")) == b"aaaa"
+    store.get("b", "json", build(b"bbbb"))
+    store.get("a", "json", build(b"xxxx"))
+    store.get("c", "json", build(b"cccc"))
+    assert builds == [b"aaaa", b"bbbb", b"cccc"]
+    assert store.size == 8
+    assert store.get("b", "json", build(b"BBBB")) == b"BBBB"
+
+    store.discard("a")
+    assert store.get("a", "json", build(b"AAAA")) == b"AAAA"
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+import engines
+import extract
+from batch_process import batch_process_termsheets
+from engines import EnginePolicy, ExtractionEngine, LlamaExtractEngine
+
+LOCAL_RESULT = {"productGeneral": {"ISIN": "CH0000000001", "currency": "CHF"}, "source": "local"}
+
+
+class FakeLocalEngine(ExtractionEngine):
+    name = "local"
+
+    def __init__(self, complete=True):
+        self.complete = complete
+        self.calls = 0
+
+    def extract(self, file_path):
+        self.calls += 1
+        return dict(LOCAL_RESULT)
+
+    def is_complete(self, result):
+        return self.complete
+
+
+def unreachable():
+    raise ConnectionError("API unreachable")
+
+
+def test_engines_must_implement_extract():
+    class Incomplete(ExtractionEngine):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_remote_first_falls_back_to_local():
+    policy = EnginePolicy("remote-first", LlamaExtractEngine(unreachable), FakeLocalEngine())
+    assert policy.extract("doc.pdf") == (LOCAL_RESULT, "local")
+
+
+def test_remote_mode_does_not_fall_back():
+    policy = EnginePolicy("remote", LlamaExtractEngine(unreachable), FakeLocalEngine())
+    with pytest.raises(ConnectionError):
+        policy.extract("doc.pdf")
+
+
+def test_local_first_skips_remote_when_complete():
+    local = FakeLocalEngine(complete=True)
+    policy = EnginePolicy("local-first", LlamaExtractEngine(unreachable), local)
+    assert policy.extract("doc.pdf") == (LOCAL_RESULT, "local")
+    assert local.calls == 1
+
+
+def test_lazy_agent_only_looks_up_on_use(monkeypatch):
+    lookups = []
+
+    def get_agent(name=None, agent_id=None):
+        lookups.append(agent_id)
+        raise ConnectionError("API unreachable")
+
+    monkeypatch.setattr(extract, "get_agent", get_agent)
+    agent = extract.LazyAgent(agent_id="agent-1")
+    assert lookups == []
+    with pytest.raises(ConnectionError):
+        agent.queue_extraction
+    assert lookups == ["agent-1"]
+
+
+def test_batch_remote_first_survives_an_outage(tmp_path, monkeypatch):
+    def get_agent(name=None, agent_id=None):
+        raise ConnectionError("API unreachable")
+
+    monkeypatch.setattr(extract, "get_agent", get_agent)
+    monkeypatch.setattr(engines, "LocalRuleEngine", FakeLocalEngine)
+    for i in range(2):
+        (tmp_path / f"doc{i}.pdf").write_bytes(b"%%PDF-1.4 document %d" % i)
+
+    output_dir = asyncio.run(batch_process_termsheets(str(tmp_path), use_cache=False, engine="remote-first",
+                                                      max_retries=0, workers=1))
+    for i in range(2):
+        with open(tmp_path / "extracted_data" / f"doc{i}.json") as f:
+            assert json.load(f)["source"] == "local"
+    assert output_dir == str(tmp_path / "extracted_data")
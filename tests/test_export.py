@@ -0,0 +1,38 @@
+import pytest
+
+from export import ParquetExporter
+
+ds = pytest.importorskip("pyarrow.dataset")
+
+RESULT = {
+    "productGeneral": {"productName": "Autocall on Nestle", "productType": "Autocall", "currency": "CHF"},
+    "underlyings": [{"name": "Nestle", "initialFixingLevel": 100.0}],
+}
+
+
+def export(base_dir, document_ids):
+    exporter = ParquetExporter(str(base_dir))
+    for document_id in document_ids:
+        exporter.add(RESULT, document_id)
+    exporter.flush()
+    return exporter
+
+
+def count_rows(base_dir, table):
+    return ds.dataset(str(base_dir / table), format="parquet", partitioning="hive").count_rows()
+
+
+def test_rerun_adds_no_duplicate_documents(tmp_path):
+    export(tmp_path, ["a", "b", "c"])
+    exporter = export(tmp_path, ["a", "b", "c"])
+    assert exporter.skipped == 3
+    assert exporter.rows_written == 0
+    assert count_rows(tmp_path, "products") == 3
+    assert count_rows(tmp_path, "underlyings") == 3
+
+
+def test_rerun_appends_only_new_documents(tmp_path):
+    export(tmp_path, ["a", "b"])
+    exporter = export(tmp_path, ["b", "c", "c"])
+    assert exporter.skipped == 2
+    assert count_rows(tmp_path, "products") == 3
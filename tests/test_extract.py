@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import extract
+from extract import AgentRegistry
+
+
+class FakeClient:
+    lookups = []
+
+    def __init__(self, api_key=None):
+        pass
+
+    def get_agent(self, name=None, id=None):
+        FakeClient.lookups.append(id or name)
+        return object()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    FakeClient.lookups = []
+    monkeypatch.setattr(extract, "LlamaExtract", FakeClient)
+    return FakeClient
+
+
+def test_agents_are_reused_within_the_ttl(client):
+    registry = AgentRegistry(ttl=60)
+    agent = registry.get_agent(name="sp termsheet")
+    assert registry.get_agent(name="sp termsheet") is agent
+    assert registry.get_agent(agent_id="agent-1") is not agent
+    assert client.lookups == ["sp termsheet", "agent-1"]
+
+
+def test_agents_are_looked_up_again_after_the_ttl(client):
+    registry = AgentRegistry(ttl=0.01)
+    agent = registry.get_agent(name="sp termsheet")
+    time.sleep(0.02)
+    assert registry.get_agent(name="sp termsheet") is not agent
+    assert client.lookups == ["sp termsheet", "sp termsheet"]
+
+
+def test_invalidate_forgets_cached_agents(client):
+    registry = AgentRegistry(ttl=60)
+    registry.get_agent(name="sp termsheet")
+    registry.invalidate()
+    registry.get_agent(name="sp termsheet")
+    assert len(client.lookups) == 2
+
+
+def test_missing_sdk_is_reported(monkeypatch):
+    monkeypatch.setattr(extract, "LlamaExtract", None)
+    with pytest.raises(ImportError):
+        AgentRegistry().get_agent(name="sp termsheet")
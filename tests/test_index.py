@@ -0,0 +1,48 @@
+from fake_agent import sample_result
+from index import TermsheetIndex
+
+
+def result(name, isin, ticker="NESN SE"):
+    data = sample_result(name, rows=2)
+    data["productGeneral"]["ISIN"] = isin
+    data["underlyings"][0]["bloombergTicker"] = ticker
+    data["issuerInformation"] = {"issuerName": "Bank Example AG"}
+    return data
+
+
+def test_point_lookups(tmp_path):
+    index = TermsheetIndex(str(tmp_path / "index.sqlite"))
+    index.add(result("a.pdf", "CH0000000001"), "doc-a", source="a.pdf", output_path="a.json")
+    index.add_many([(result("b.pdf", "CH0000000002", ticker="ROG SE"), "doc-b", "b.pdf", "b.json")])
+
+    assert [row["document_id"] for row in index.by_isin("CH0000000002")] == ["doc-b"]
+    assert [row["output_path"] for row in index.by_ticker("nesn se")] == ["a.json"]
+    assert len(index.by_issuer("bank example ag")) == 2
+    assert index.by_valor("0000000")[0]["currency"] == "CHF"
+    index.close()
+
+
+def test_event_ranges_are_ordered_and_filtered(tmp_path):
+    index = TermsheetIndex(str(tmp_path / "index.sqlite"))
+    index.add(result("a.pdf", "CH0000000001"), "doc-a")
+    events = index.events_between("2024-01-01", "2024-12-31")
+    dates = [event["event_date"] for event in events]
+    assert dates == sorted(dates)
+    assert {event["kind"] for event in events} >= {"initial_fixing", "coupon", "observation"}
+    coupons = index.events_between("2024-01-01", "2024-12-31", kind="coupon")
+    assert [event["number"] for event in coupons] == [1, 2]
+    index.close()
+
+
+def test_reindexing_a_document_replaces_its_rows(tmp_path):
+    path = str(tmp_path / "index.sqlite")
+    index = TermsheetIndex(path)
+    index.add(result("a.pdf", "CH0000000001"), "doc-a")
+    index.add(result("a.pdf", "CH0000000009", ticker="ROG SE"), "doc-a")
+    index.close()
+
+    index = TermsheetIndex(path)
+    assert index.by_isin("CH0000000001") == []
+    assert index.by_ticker("NESN SE") == []
+    assert len(index.events_between("2024-01-01", "2024-12-31", kind="coupon")) == 2
+    index.close()
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from export import ParquetExporter
+from lifecycle import Book, load_book
+from manifest import COMPLETED, JobManifest
+
+
+def product(strike=60.0, denomination=1000.0, tickers=("NESN SW", "ROG SW")):
+    return {
+        "productGeneral": {"productName": "BRC", "currency": "CHF", "denomination": denomination},
+        "dates": {"finalFixingDate": "2025-06-16", "redemptionDate": "2025-06-23"},
+        "underlyings": [{"name": ticker, "bloombergTicker": ticker, "initialFixingLevel": 100.0,
+                         "strikeLevel": strike} for ticker in tickers],
+    }
+
+
+def test_worst_of_without_fixings():
+    book = Book.from_results([product(), product()])
+    worst, ticker, below_strike, of_strike = book.worst_of({})
+    assert np.isnan(worst).all()
+    assert list(ticker) == [None, None]
+    assert not below_strike.any()
+    assert np.isnan(of_strike).all()
+
+
+def test_redemption_below_strike_is_relative_to_strike():
+    book = Book.from_results([product(strike=60.0), product(strike=60.0)], ["low", "high"])
+    table = book.evaluate("2024-06-01", {"NESN SW": 45.0, "ROG SW": 110.0})
+    assert list(table["below_strike"]) == [True, True]
+    # 45% of initial is 75% of a 60% strike
+    assert table["expected_redemption"].tolist() == [750.0, 750.0]
+    table = book.evaluate("2024-06-01", {"NESN SW": 70.0, "ROG SW": 110.0})
+    assert list(table["below_strike"]) == [False, False]
+    assert table["expected_redemption"].tolist() == [1000.0, 1000.0]
+
+
+def export(base_dir, result, document_id):
+    pytest.importorskip("pyarrow")
+    exporter = ParquetExporter(str(base_dir))
+    exporter.add(result, document_id)
+    exporter.flush()
+
+
+def test_from_parquet_keeps_latest_export_of_a_document(tmp_path):
+    export(tmp_path / "book", product(denomination=1000.0), "a")
+    export(tmp_path / "book", product(denomination=5000.0), "b")
+    # An older dataset written before re-runs were skipped holds "a" twice
+    export(tmp_path / "rerun", product(denomination=2000.0, tickers=("NESN SW",)), "a")
+    for table in os.listdir(tmp_path / "rerun"):
+        shutil.copytree(tmp_path / "rerun" / table, tmp_path / "book" / table, dirs_exist_ok=True)
+
+    book = Book.from_parquet(str(tmp_path / "book"))
+    assert sorted(book.ids) == ["a", "b"]
+    index = list(book.ids).index("a")
+    assert book.denomination[index] == 2000.0
+    assert (book.underlying_product == index).sum() == 1
+    assert len(book.evaluate("2024-06-01", {})) == 2
+
+
+def test_document_ids_may_be_an_array():
+    book = Book.from_results([product(), product()], np.array(["a", "b"]))
+    assert list(book.ids) == ["a", "b"]
+
+
+def test_json_results_use_the_manifest_document_ids(tmp_path):
+    output_dir = tmp_path / "extracted_data"
+    output_dir.mkdir()
+    for name in ("first", "second"):
+        with open(output_dir / f"{name}.json", 'w') as f:
+            json.dump(product(), f)
+    JobManifest(str(output_dir)).record(str(tmp_path / "first.pdf"), "hash-1", COMPLETED,
+                                        output=str(output_dir / "first.json"))
+
+    book = load_book(str(output_dir))
+    assert sorted(book.ids) == ["hash-1", "second"]
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+from batch_process import batch_process_termsheets
+from cache import hash_file
+from fake_agent import FakeAgent
+from manifest import COMPLETED, DUPLICATE, FAILED, QUEUED, JobManifest, reconcile
+
+
+def write_pdfs(directory, count):
+    paths = []
+    for i in range(count):
+        pdf = directory / f"doc{i}.pdf"
+        pdf.write_bytes(b"%%PDF-1.4 document %d" % i)
+        paths.append(str(pdf))
+    return paths
+
+
+def run(directory, agent, resume):
+    return asyncio.run(batch_process_termsheets(str(directory), use_cache=False, agent=agent, resume=resume,
+                                                workers=1))
+
+
+def test_reconcile_sorts_files_by_their_last_entry(tmp_path):
+    output = tmp_path / "done.json"
+    output.write_text("{}")
+    entries = {
+        "/d/done.pdf": {"hash": "h", "status": COMPLETED, "output": str(output)},
+        "/d/lost.pdf": {"hash": "h", "status": COMPLETED, "output": str(tmp_path / "deleted.json")},
+        "/d/changed.pdf": {"hash": "old", "status": COMPLETED, "output": str(output)},
+        "/d/dup.pdf": {"hash": "h", "status": DUPLICATE, "output": None},
+        "/d/queued.pdf": {"hash": "h", "status": QUEUED, "job_id": "job-1"},
+        "/d/failed.pdf": {"hash": "h", "status": FAILED, "job_id": "job-2"},
+    }
+    files = list(entries) + ["/d/new.pdf"]
+    done, in_flight, todo = reconcile(entries, files, {f: "h" for f in files})
+    assert done == ["/d/done.pdf", "/d/dup.pdf"]
+    assert in_flight == [("job-1", "/d/queued.pdf")]
+    assert todo == ["/d/lost.pdf", "/d/changed.pdf", "/d/failed.pdf", "/d/new.pdf"]
+
+
+def test_load_keeps_the_latest_entry_and_ignores_a_torn_line(tmp_path):
+    manifest = JobManifest(str(tmp_path))
+    manifest.record("a.pdf", "h", QUEUED, job_id="job-1")
+    manifest.record("a.pdf", "h", COMPLETED, job_id="job-1", output="a.json")
+    with open(manifest.path, 'a') as f:
+        f.write('{"path": "b.pdf", "hash"')
+    entries = manifest.load()
+    assert list(entries) == [os.path.abspath("a.pdf")]
+    assert entries[os.path.abspath("a.pdf")]["status"] == COMPLETED
+
+
+def test_resume_only_extracts_new_files(tmp_path):
+    write_pdfs(tmp_path, 2)
+    agent = FakeAgent(latency=0)
+    run(tmp_path, agent, resume=False)
+    write_pdfs(tmp_path, 3)
+    run(tmp_path, agent, resume=True)
+    assert agent.fetch_calls == 3
+    results = sorted(name for name in os.listdir(tmp_path / "extracted_data") if name.endswith('.json'))
+    assert results == ["doc0.json", "doc1.json", "doc2.json"]
+
+
+def test_resume_reattaches_to_known_jobs_and_resubmits_unknown_ones(tmp_path):
+    known, unknown = write_pdfs(tmp_path, 2)
+    agent = FakeAgent(latency=0)
+    job = asyncio.run(agent.queue_extraction([known]))[0]
+    output_dir = tmp_path / "extracted_data"
+    output_dir.mkdir()
+    manifest = JobManifest(str(output_dir))
+    manifest.record(known, hash_file(known), QUEUED, job_id=job.id)
+    manifest.record(unknown, hash_file(unknown), QUEUED, job_id="expired-job")
+
+    run(tmp_path, agent, resume=True)
+    # One queue call for the setup, one for the file whose job the API forgot
+    assert agent.queue_calls == 2
+    entries = manifest.load()
+    assert entries[known]["job_id"] == job.id
+    assert entries[known]["status"] == COMPLETED
+    assert entries[unknown]["status"] == COMPLETED
+    assert entries[unknown]["job_id"] != "expired-job"
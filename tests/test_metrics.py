@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry, timed
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.inc("files_total")
+    with registry.span("extract"):
+        pass
+    assert registry.counter_value("files_total") == 0
+    assert registry.render_prometheus() == "\n"
+
+
+def test_counters_and_histograms_render_as_prometheus_text():
+    registry = MetricsRegistry(enabled=True, buckets=(0.1, 1.0))
+    registry.inc("cache_lookups_total", result="hit")
+    registry.inc("cache_lookups_total", 2, result="miss")
+    registry.observe("document_seconds", 0.5, path="batch")
+    registry.observe("document_seconds", 5.0, path="batch")
+
+    assert registry.counter_value("cache_lookups_total", result="miss") == 2
+    text = registry.render_prometheus()
+    assert "# TYPE termsheet_cache_lookups_total counter" in text
+    assert 'termsheet_cache_lookups_total{result="hit"} 1' in text
+    assert 'termsheet_document_seconds_bucket{path="batch",le="0.1"} 0' in text
+    assert 'termsheet_document_seconds_bucket{path="batch",le="1.0"} 1' in text
+    assert 'termsheet_document_seconds_bucket{path="batch",le="+Inf"} 2' in text
+    assert 'termsheet_document_seconds_count{path="batch"} 2' in text
+
+
+def test_spans_log_json_lines_and_count_errors(tmp_path):
+    log_path = tmp_path / "spans.jsonl"
+    registry = MetricsRegistry(enabled=True, log_path=str(log_path))
+    events = []
+    registry.add_hook(events.append)
+    with registry.span("extract", attrs={"file": "a.pdf"}, engine="remote"):
+        pass
+    with pytest.raises(ValueError):
+        with registry.span("extract", engine="remote"):
+            raise ValueError("bad PDF")
+
+    lines = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [line["error"] for line in lines] == [False, True]
+    assert lines[0]["file"] == "a.pdf" and lines[0]["engine"] == "remote"
+    assert events == lines
+    assert registry.counter_value("extract_errors_total", engine="remote") == 1
+
+
+def test_prometheus_file_is_written(tmp_path):
+    registry = MetricsRegistry(enabled=True, prometheus_path=str(tmp_path / "metrics.prom"))
+    registry.inc("files_total")
+    registry.write_prometheus()
+    assert "termsheet_files_total 1" in (tmp_path / "metrics.prom").read_text()
+
+
+def test_timed_wraps_sync_and_async_functions(monkeypatch):
+    registry = MetricsRegistry(enabled=True)
+    monkeypatch.setattr(metrics, "_registry", registry)
+
+    @timed("parse")
+    def parse():
+        return 1
+
+    @timed("fetch")
+    async def fetch():
+        return 2
+
+    assert parse() == 1
+    assert asyncio.run(fetch()) == 2
+    text = registry.render_prometheus()
+    assert "termsheet_parse_seconds_count 1" in text
+    assert "termsheet_fetch_seconds_count 1" in text
@@ -0,0 +1,39 @@
+import pytest
+
+from prefilter import page_ranges, reduce_pdf, score_page, select_pages
+from synthetic import write_pdf
+
+TERMS = ("ISIN CH0012345678 Underlying Nestle SA Bloomberg NESN SE Initial Fixing Date 15.01.2024 "
+         "Strike 60% Barrier 50% Coupon Rate 8.00% p.a. Payment Date 22.04.2024")
+LEGAL = ("Selling restrictions: the notes may not be offered in the United States or to any U.S. person. "
+         "Taxation and withholding tax are described in the prospectus. Disclaimer.")
+
+
+def test_field_pages_outscore_legal_pages():
+    assert score_page(TERMS) > 4.0
+    assert score_page(LEGAL) < 0
+
+
+def test_first_page_is_always_kept():
+    assert select_pages([0, 10, -3, 5]) == [0, 1, 3]
+    assert select_pages([0, 1, 1], min_keep_ratio=0.5) == [0, 1, 2]
+    assert page_ranges([0, 1, 2, 5, 7, 8]) == "1-3,6,8-9"
+
+
+def test_reduced_copy_keeps_only_relevant_pages(tmp_path):
+    pytest.importorskip("pypdf")
+    source = tmp_path / "doc.pdf"
+    write_pdf(str(source), ["Product Termsheet", TERMS, LEGAL, LEGAL, TERMS])
+    reduction = reduce_pdf(str(source), str(tmp_path / "reduced.pdf"))
+    assert reduction.kept == [0, 1, 4]
+    assert reduction.page_count == 5
+    assert reduction.bytes_after < reduction.bytes_before
+    assert reduction.to_dict()["pages"] == "1-2,5"
+
+
+def test_nothing_is_written_when_every_page_is_relevant(tmp_path):
+    pytest.importorskip("pypdf")
+    source = tmp_path / "doc.pdf"
+    write_pdf(str(source), [TERMS, TERMS])
+    assert reduce_pdf(str(source), str(tmp_path / "reduced.pdf")) is None
+    assert not (tmp_path / "reduced.pdf").exists()
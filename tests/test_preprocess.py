@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from preprocess import hash_pdf, process_map
+
+
+def slow_square(n, delay):
+    time.sleep(delay)
+    return n * n
+
+
+def collect(executor, func, items, limit, *args):
+    async def run():
+        return [result async for result in process_map(executor, func, items, limit, *args)]
+    return asyncio.run(run())
+
+
+def test_results_arrive_in_completion_order():
+    with ThreadPoolExecutor(2) as executor:
+        results = collect(executor, slow_square, [(3, 0.2), (2, 0.0), (1, 0.1)], 3)
+    assert results == [4, 1, 9]
+
+
+def test_extra_arguments_are_appended():
+    with ThreadPoolExecutor(2) as executor:
+        assert sorted(collect(executor, slow_square, [1, 2, 3], 2, 0.0)) == [1, 4, 9]
+
+
+def test_producer_is_held_back_by_the_limit():
+    in_progress = []
+    peak = []
+    lock = threading.Lock()
+
+    def tracked(n):
+        with lock:
+            in_progress.append(n)
+            peak.append(len(in_progress))
+        time.sleep(0.01)
+        with lock:
+            in_progress.remove(n)
+        return n
+
+    async def items():
+        for n in range(20):
+            yield n
+
+    with ThreadPoolExecutor(8) as executor:
+        assert sorted(collect(executor, tracked, items(), 3)) == list(range(20))
+    assert max(peak) <= 3
+
+
+def test_hash_pdf_reports_unreadable_files(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    path, content_hash = hash_pdf(str(pdf))
+    assert path == str(pdf) and len(content_hash) == 64
+    assert hash_pdf(str(tmp_path / "missing.pdf"))[1] is None
@@ -0,0 +1,113 @@
+import asyncio
+
+from fake_agent import FakeAgent
+from scheduler import HANDLED, JOB_FAILED, JobScheduler, SubmissionPipeline
+
+
+class Job:
+    def __init__(self, status):
+        self.status = status
+
+
+class BrokenAgent:
+    """Every poll raises a transient-looking error"""
+
+    def __init__(self):
+        self.polls = 0
+
+    def get_extraction_job(self, job_id):
+        self.polls += 1
+        raise ConnectionError("connection reset")
+
+
+class StatusAgent:
+    def __init__(self, status):
+        self.status = status
+
+    def get_extraction_job(self, job_id):
+        return Job(self.status)
+
+
+def scheduler_for(agent, **kwargs):
+    return JobScheduler(agent, initial_delay=0.001, max_delay=0.001, **kwargs)
+
+
+def track(scheduler, job_id, on_complete=lambda *args: None):
+    return asyncio.run(scheduler.track(job_id, None, on_complete))
+
+
+def test_unknown_job_fails_without_polling_forever():
+    agent = FakeAgent(latency=0)
+    assert track(scheduler_for(agent), "stale-123") == JOB_FAILED
+    assert asyncio.run(scheduler_for(agent).lookup("stale-123")) is False
+
+
+def test_poll_errors_use_up_the_budget():
+    agent = BrokenAgent()
+    assert track(scheduler_for(agent, max_poll_errors=3), "job-1") == JOB_FAILED
+    assert agent.polls == 3
+
+
+def test_unexpected_status_is_terminal():
+    assert track(scheduler_for(StatusAgent("exploded")), "job-1") == JOB_FAILED
+
+
+def test_job_timeout():
+    assert track(scheduler_for(StatusAgent("pending"), job_timeout=0.05), "job-1") == JOB_FAILED
+
+
+def test_handler_failure_is_retried_but_never_resubmitted(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    agent = FakeAgent(latency=0)
+    calls = []
+
+    def on_complete(job_id, pdf_file, result):
+        calls.append(job_id)
+        raise OSError("disk full")
+
+    async def run():
+        scheduler = scheduler_for(agent, handler_retries=1)
+        pipeline = SubmissionPipeline(agent, scheduler, retry_delay=0.001, max_retries=3)
+        return await pipeline.run([str(pdf)], on_complete)
+
+    assert asyncio.run(run()) == (0, 1)
+    assert agent.queue_calls == 1
+    assert agent.fetch_calls == 1
+    assert len(calls) == 2
+
+
+def test_completed_job_is_handled():
+    agent = FakeAgent(latency=0)
+    jobs = asyncio.run(agent.queue_extraction(["doc.pdf"]))
+    results = []
+    assert track(scheduler_for(agent), jobs[0].id, lambda *args: results.append(args)) == HANDLED
+    assert results and results[0][2].data["productGeneral"]["productName"] == "doc"
+
+
+class ShortAgent(FakeAgent):
+    """Returns one job fewer than the files it was given"""
+
+    async def queue_extraction(self, files):
+        return (await super().queue_extraction(files))[:-1]
+
+
+def test_files_without_a_job_fail_and_free_their_slots(tmp_path):
+    files = []
+    for i in range(3):
+        pdf = tmp_path / f"doc{i}.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        files.append(str(pdf))
+    agent = ShortAgent(latency=0)
+    completed, failed = [], []
+
+    async def run():
+        pipeline = SubmissionPipeline(agent, scheduler_for(agent), max_in_flight=3, chunk_size=3,
+                                      retry_delay=0.001)
+        outcome = await pipeline.run(files, lambda job_id, pdf_file, result: completed.append(pdf_file),
+                                     lambda job_id, pdf_file: failed.append(pdf_file))
+        return outcome, pipeline._slots._value
+
+    assert asyncio.run(run()) == ((2, 1), 3)
+    assert sorted(completed) == files[:2]
+    assert failed == files[2:]
@@ -0,0 +1,75 @@
+import pytest
+
+from schema import normalize, parse_currency, parse_level, parse_number, parse_percent
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,000.50", 1000.5),
+    ("CHF 5,000,000", 5000000.0),
+    ("CHF 1'000'000", 1000000.0),
+    ("1'000,50", 1000.5),
+    ("EUR 1.000.000,00", 1000000.0),
+    ("1.000.000", 1000000.0),
+    ("8,25% p.a.", 8.25),
+    ("5,50%", 5.5),
+    ("0,125", 0.125),
+    ("60%", 60.0),
+    ("-3.2%", -3.2),
+    ("5 million", 5000000.0),
+    ("EUR 5m", 5000000.0),
+    ("USD 1.5bn", 1500000000.0),
+    ("3 months", 3.0),
+    (42, 42.0),
+])
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1.000", "1,00,000", "1.000,000,00", "n/a", None, True])
+def test_parse_number_rejects_ambiguous_or_missing(value):
+    assert parse_number(value) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("8.00% p.a.", 8.0), ("0.67%", 0.67), (8.25, 8.25), (1.25, 1.25), ("1.25", 1.25), ("1", 1.0),
+    (1.5, 1.5), ("1,25% quarterly", 1.25), ("50 bps", 0.5),
+])
+def test_parse_percent_keeps_rates_as_given(value, expected):
+    assert parse_percent(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("60%", 60.0), (60, 60.0), (0.6, 60.0), ("0.6", 60.0), (1.0, 100.0), ("100.00%", 100.0), ("1%", 1.0),
+])
+def test_parse_level_turns_fractions_into_percent(value, expected):
+    assert parse_level(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("CHF", "CHF"),
+    ("chf 1,000", "CHF"),
+    ("The Swiss Franc", "CHF"),
+    ("Swiss Francs", "CHF"),
+    ("Euro", "EUR"),
+    ("$", "USD"),
+    ("€ 5", "EUR"),
+    ("not applicable", None),
+    ("N/A", None),
+    ("TBD", None),
+    (None, None),
+])
+def test_parse_currency(value, expected):
+    assert parse_currency(value) == expected
+
+
+def test_normalize_applies_parsers():
+    record = normalize({
+        "productGeneral": {"currency": "The Swiss Franc", "denomination": "CHF 1'000"},
+        "coupon": {"couponRate": "8,25% p.a.", "couponPaymentDates": [{"couponRate": 1.25}]},
+        "underlyings": [{"name": "Nestle", "strikeLevel": 0.6}],
+    })
+    assert record.productGeneral.currency == "CHF"
+    assert record.productGeneral.denomination == 1000.0
+    assert record.coupon.couponRate == 8.25
+    assert record.coupon.couponPaymentDates[0].couponRate == 1.25
+    assert record.underlyings[0].strikeLevel == pytest.approx(60.0)
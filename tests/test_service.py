@@ -0,0 +1,133 @@
+import http.client
+import os
+import threading
+import time
+
+import pytest
+
+import extract
+from manifest import COMPLETED, FAILED, QUEUED
+from service import RUNNING, JobQueue, ServiceClient, _leased, make_server, run_worker
+
+PDF = b"%PDF-1.4 termsheet"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path), lease=60, max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_identical_documents_share_one_extraction(queue):
+    first, coalesced = queue.submit(PDF, "a.pdf")
+    assert not coalesced and first["status"] == QUEUED
+    second, coalesced = queue.submit(PDF, "b.pdf")
+    assert coalesced and second["job_id"] != first["job_id"]
+    assert queue.counts() == {QUEUED: 1}
+
+    content_hash, path = queue.claim("worker-1")
+    assert open(path, 'rb').read() == PDF
+    assert queue.claim("worker-2") is None
+    queue.complete(content_hash, {"ok": True})
+    assert queue.result(second["job_id"]) == (COMPLETED, {"ok": True})
+    assert not os.path.exists(path)
+
+    third, coalesced = queue.submit(PDF, "c.pdf")
+    assert not coalesced and third["status"] == COMPLETED
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = JobQueue(str(tmp_path), lease=0.05)
+    queue.submit(PDF)
+    content_hash, _ = queue.claim("worker-1")
+    assert queue.claim("worker-2") is None
+    time.sleep(0.1)
+    assert queue.claim("worker-2")[0] == content_hash
+    assert not queue.renew(content_hash, "worker-1")
+    assert queue.job(queue.submit(PDF)[0]["job_id"])["worker"] == "worker-2"
+    queue.close()
+
+
+def test_heartbeat_keeps_a_long_extraction(tmp_path):
+    queue = JobQueue(str(tmp_path), lease=0.15)
+    queue.submit(PDF)
+    content_hash, _ = queue.claim("worker-1")
+    with _leased(queue, content_hash, "worker-1"):
+        time.sleep(0.4)
+        assert queue.claim("worker-2") is None
+    queue.close()
+
+
+def test_documents_fail_after_max_attempts_and_can_be_resubmitted(queue):
+    queue.submit(PDF)
+    for expected in (QUEUED, FAILED):
+        content_hash, _ = queue.claim("worker-1")
+        assert queue.fail(content_hash, "boom") == expected
+    assert queue.counts() == {FAILED: 1}
+    assert not os.path.exists(queue.upload_path(content_hash))
+
+    job, coalesced = queue.submit(PDF)
+    assert not coalesced and job["status"] == QUEUED and job["attempts"] == 0
+    # The re-queued document has its upload back
+    assert os.path.exists(queue.upload_path(content_hash))
+
+
+def test_lost_workers_use_up_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path), lease=0.01, max_attempts=2)
+    job, _ = queue.submit(PDF)
+    assert queue.claim("worker-1") is not None
+    time.sleep(0.02)
+    assert queue.claim("worker-2") is not None
+    time.sleep(0.02)
+    # A third claim would exceed the attempts, so the document is failed instead
+    assert queue.claim("worker-3") is None
+    assert queue.job(job["job_id"])["status"] == FAILED
+    queue.close()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "extract_termsheet", lambda path, **kwargs: {"path": os.path.basename(path)})
+    queue = JobQueue(str(tmp_path))
+    server = make_server(queue, port=0, max_upload_mb=0.001)
+    stop = threading.Event()
+    threads = [threading.Thread(target=server.serve_forever),
+               threading.Thread(target=run_worker, args=(str(tmp_path),), kwargs={"stop": stop})]
+    for thread in threads:
+        thread.start()
+    yield server, ServiceClient(f"http://127.0.0.1:{server.server_port}", poll_interval=0.05)
+    stop.set()
+    server.shutdown()
+    for thread in threads:
+        thread.join()
+    server.server_close()
+    queue.close()
+
+
+def post(server, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    conn.putrequest("POST", "/jobs")
+    for key, value in (headers or {}).items():
+        conn.putheader(key, value)
+    conn.endheaders(body)
+    return conn.getresponse().status
+
+
+def test_http_api(service):
+    server, client = service
+    job = client.submit(PDF, "doc.pdf")
+    assert job["status"] in (QUEUED, RUNNING, COMPLETED)
+    assert client.wait(job["job_id"], timeout=10) == {"path": f"{job['hash']}.pdf"}
+    assert client.status(job["job_id"])["status"] == COMPLETED
+    assert client.submit(PDF)["status"] == COMPLETED
+
+    with pytest.raises(RuntimeError, match="404"):
+        client.status("no-such-job")
+    with pytest.raises(RuntimeError, match="400"):
+        client.submit(b"not a pdf")
+    with pytest.raises(RuntimeError, match="413"):
+        client.submit(PDF + b"x" * 2000)
+    assert post(server) == 411
+    assert post(server, b"", {"Content-Length": "-1"}) == 400
+    assert client._request("/health") == (200, {"documents": {COMPLETED: 1}})
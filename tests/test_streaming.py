@@ -0,0 +1,54 @@
+import asyncio
+import io
+import json
+
+from batch_process import batch_process_termsheets
+from fake_agent import FakeAgent
+from manifest import COMPLETED, reconcile
+from preprocess import hash_pdf
+from streaming import STREAMED, NDJSONWriter, read_result, result_record
+
+
+def test_segments_rotate_and_results_can_be_read_back(tmp_path):
+    writer = NDJSONWriter(str(tmp_path), segment_lines=2)
+    paths = [writer.write(result_record({"n": i}, f"doc{i}.pdf", f"hash-{i}", "remote")) for i in range(3)]
+    writer.close()
+    assert paths[0] == paths[1] != paths[2]
+    assert read_result(paths[2], "hash-2") == {"n": 2}
+    assert read_result(paths[0], "hash-2") is None
+
+
+def test_stream_writes_report_a_stable_output():
+    stream = io.StringIO()
+    writer = NDJSONWriter("-", stream=stream)
+    assert writer.write(result_record({"n": 1}, "doc.pdf", "hash-1", "remote")) == STREAMED
+    assert json.loads(stream.getvalue())["hash"] == "hash-1"
+
+
+def test_streamed_results_count_as_done_on_resume():
+    entries = {"/data/doc.pdf": {"hash": "hash-1", "status": COMPLETED, "output": STREAMED}}
+    done, in_flight, todo = reconcile(entries, ["/data/doc.pdf"], {"/data/doc.pdf": "hash-1"})
+    assert (done, in_flight, todo) == (["/data/doc.pdf"], [], [])
+
+
+def test_resumed_stdout_batch_does_not_extract_again(tmp_path):
+    for i in range(2):
+        (tmp_path / f"doc{i}.pdf").write_bytes(b"%%PDF-1.4 document %d" % i)
+    stream = io.StringIO()
+    agent = FakeAgent(latency=0)
+
+    def run(resume):
+        return asyncio.run(batch_process_termsheets(str(tmp_path), use_cache=False, agent=agent, resume=resume,
+                                                    workers=1, ndjson=NDJSONWriter("-", stream=stream)))
+
+    run(resume=False)
+    run(resume=True)
+    assert agent.fetch_calls == 2
+    assert len(stream.getvalue().splitlines()) == 2
+
+
+def test_worker_diagnostics_stay_off_stdout(tmp_path, capsys):
+    assert hash_pdf(str(tmp_path / "missing.pdf"))[1] is None
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Could not read" in captured.err
@@ -0,0 +1,55 @@
+import os
+import threading
+
+from uploads import UploadSpool
+
+
+def test_concurrent_users_share_one_file(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    with spool.spooled("hash-1", b"%PDF-1.4") as first:
+        with spool.spooled("hash-1", b"%PDF-1.4") as second:
+            assert first == second
+            assert os.listdir(tmp_path) == ["hash-1.pdf"]
+        assert os.path.exists(first)
+    assert os.listdir(tmp_path) == []
+
+
+def test_file_is_removed_when_the_user_fails(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    try:
+        with spool.spooled("hash-1", b"%PDF-1.4"):
+            raise RuntimeError("extraction failed")
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_threads_never_see_a_missing_file(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(50):
+            with spool.spooled("hash-1", b"%PDF-1.4") as path:
+                try:
+                    with open(path, 'rb') as f:
+                        if f.read() != b"%PDF-1.4":
+                            errors.append(path)
+                except OSError as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_cleanup_removes_the_spool_directory(tmp_path):
+    spool = UploadSpool(str(tmp_path / "spool"))
+    spool.cleanup()
+    assert not (tmp_path / "spool").exists()
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import watch
+from fake_agent import FakeAgent
+from manifest import COMPLETED, JobManifest
+from watch import DropFolderWatcher, FingerprintStore, watch_directory
+
+
+def test_fingerprints_skip_unchanged_and_touched_files(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 one")
+    store = FingerprintStore(str(tmp_path))
+    assert store.is_changed(str(pdf))
+    store.update(str(pdf), watch.hash_file(str(pdf)))
+    assert not store.is_changed(str(pdf))
+
+    os.utime(pdf, (1, 1))
+    assert not store.is_changed(str(pdf))
+    pdf.write_bytes(b"%PDF-1.4 two")
+    assert store.is_changed(str(pdf))
+
+
+def test_watcher_releases_files_once_settled(tmp_path):
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    (tmp_path / "notes.txt").write_text("not a pdf")
+    watcher = DropFolderWatcher(str(tmp_path), settle=0, use_events=False)
+    watcher.start()
+    assert watcher.ready() == []  # first sighting records the stat
+    assert watcher.ready() == [str(tmp_path / "doc.pdf")]
+    assert watcher.ready() == []
+
+
+def test_manifest_is_read_incrementally(tmp_path):
+    manifest = JobManifest(str(tmp_path))
+    manifest.record("a.pdf", "hash-a", COMPLETED)
+    entries, offset = manifest.read()
+    assert list(entries) == [os.path.abspath("a.pdf")]
+
+    manifest.record("b.pdf", "hash-b", COMPLETED)
+    with open(manifest.path, 'a') as f:
+        f.write('{"path": "c.pdf"')  # still being written
+    entries, offset = manifest.read(offset)
+    assert list(entries) == [os.path.abspath("b.pdf")]
+    assert manifest.read(offset)[0] == {}
+
+
+def test_watch_reuses_one_pool_and_skips_vanished_files(tmp_path, monkeypatch):
+    executors = []
+    create_executor = watch.create_executor
+
+    def counting_executor(workers=None):
+        executors.append(workers)
+        return create_executor(workers)
+
+    monkeypatch.setattr(watch, "create_executor", counting_executor)
+    # A file that settled but was removed before it was fingerprinted
+    ready = DropFolderWatcher.ready
+    monkeypatch.setattr(DropFolderWatcher, "ready", lambda self: ready(self) + [str(tmp_path / "gone.pdf")])
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 first")
+    output_dir = tmp_path / "extracted_data"
+    fingerprints_path = output_dir / watch.FINGERPRINTS_NAME
+
+    def fingerprinted():
+        if not fingerprints_path.exists():
+            return set()
+        with open(fingerprints_path) as f:
+            return {os.path.basename(path) for path in json.load(f)}
+
+    async def run():
+        task = asyncio.create_task(watch_directory(str(tmp_path), settle=0.05, poll_interval=0.05,
+                                                   agent=FakeAgent(latency=0), use_cache=False, workers=1))
+        try:
+            for expected in ({"a.pdf"}, {"a.pdf", "b.pdf"}):
+                for _ in range(400):
+                    if fingerprinted() == expected:
+                        break
+                    await asyncio.sleep(0.05)
+                assert fingerprinted() == expected
+                (tmp_path / "b.pdf").write_bytes(b"%PDF-1.4 second")
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(run())
+    assert executors == [1]
+    assert (output_dir / "b.json").exists()
+
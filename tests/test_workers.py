@@ -0,0 +1,51 @@
+import threading
+
+from workers import ExtractionPool
+
+
+class BlockingExtract:
+    """Holds every extraction until released, counting the calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, data, agent=None, content_hash=None):
+        self.calls += 1
+        self.release.wait(5)
+        if data == b"broken":
+            raise ValueError("not a PDF")
+        return {"hash": content_hash}
+
+
+def test_duplicate_submissions_share_one_extraction():
+    extract = BlockingExtract()
+    pool = ExtractionPool(max_workers=2, extract=extract)
+    first = pool.submit("hash-1", b"%PDF-1.4", "a.pdf")
+    second = pool.submit("hash-1", b"%PDF-1.4", "copy of a.pdf")
+    assert first.future is second.future
+    assert first.status in ("queued", "running")
+
+    extract.release.set()
+    assert second.future.result(5) == {"hash": "hash-1"}
+    assert second.status == "completed"
+    assert extract.calls == 1
+    # Once done, the same document is extracted again on request
+    pool.submit("hash-1", b"%PDF-1.4", "a.pdf").future.result(5)
+    assert extract.calls == 2
+    pool.shutdown()
+
+
+def test_failed_and_cancelled_jobs_report_their_error():
+    extract = BlockingExtract()
+    pool = ExtractionPool(max_workers=1, extract=extract)
+    failed = pool.submit("hash-1", b"broken", "broken.pdf")
+    queued = pool.submit("hash-2", b"%PDF-1.4", "b.pdf")
+    pool.shutdown()
+    extract.release.set()
+    failed.future.exception(5)
+
+    assert failed.status == "failed"
+    assert isinstance(failed.error, ValueError)
+    assert queued.status == "failed"
+    assert queued.error == "the extraction was cancelled"
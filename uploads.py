@@ -0,0 +1,57 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class UploadSpool:
+    """Temporary files for uploaded PDFs, at most one per unique content hash
+
+    Files are only written while an extraction actually needs a path on disk and
+    are removed as soon as the last user of that upload is done with it.
+    Anything left over is removed when the process exits.
+    """
+
+    def __init__(self, spool_dir=None):
+        self.spool_dir = spool_dir or tempfile.mkdtemp(prefix="termsheet-uploads-")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._refs = {}
+        self._lock = threading.Lock()
+        atexit.register(self.cleanup)
+
+    @contextmanager
+    def spooled(self, content_hash, data, suffix='.pdf'):
+        """Yield a path holding ``data``, shared by concurrent users of the same upload"""
+        path = os.path.join(self.spool_dir, f"{content_hash}{suffix}")
+        with self._lock:
+            if self._refs.get(path, 0) == 0:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            self._refs[path] = self._refs.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._refs[path] -= 1
+                if self._refs[path] == 0:
+                    del self._refs[path]
+                    if os.path.exists(path):
+                        os.unlink(path)
+
+    def cleanup(self):
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+
+_default_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """Return the process-wide upload spool"""
+    global _default_spool
+    with _spool_lock:
+        if _default_spool is None:
+            _default_spool = UploadSpool(os.getenv("TERMSHEET_SPOOL_DIR"))
+        return _default_spool
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from cache import hash_file
+from manifest import JobManifest, COMPLETED, DUPLICATE
+from preprocess import create_executor
+
+# watchdog is optional; without it the drop folder is polled
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+FINGERPRINTS_NAME = "fingerprints.json"
+
+
+class FingerprintStore:
+    """Remembers (mtime, size, hash) per file so unchanged files are never re-sent
+
+    The cheap mtime/size check runs first; the file is only hashed when those
+    differ, and a touched-but-identical file just has its stat refreshed.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, FINGERPRINTS_NAME)
+        self.fingerprints = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.fingerprints = json.load(f)
+
+    def is_changed(self, file_path):
+        """Return True if the file differs from the last completed extraction"""
+        stat = os.stat(file_path)
+        known = self.fingerprints.get(os.path.abspath(file_path))
+        if known is None:
+            return True
+        if known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+            return False
+        if known["hash"] == hash_file(file_path):
+            known["mtime"], known["size"] = stat.st_mtime, stat.st_size
+            return False
+        return True
+
+    def update(self, file_path, content_hash):
+        stat = os.stat(file_path)
+        self.fingerprints[os.path.abspath(file_path)] = {
+            "mtime": stat.st_mtime, "size": stat.st_size, "hash": content_hash,
+        }
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.fingerprints, f)
+        os.replace(tmp_path, self.path)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+
+class DropFolderWatcher:
+    """Collects new or modified PDFs and releases them once they stop changing
+
+    Filesystem events are used when watchdog is installed; a periodic stat scan
+    always runs as well, as the only source without watchdog and as a safety net
+    for missed events with it. A file is ready once its size and mtime have been
+    stable for ``settle`` seconds, so half-copied files are not submitted.
+    """
+
+    def __init__(self, directory, settle=2.0, poll_interval=5.0, use_events=True):
+        self.directory = directory
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_events = use_events and Observer is not None
+        self._seen = {}
+        self._candidates = {}
+        self._lock = threading.Lock()
+        self._observer = None
+        self._last_scan = 0
+
+    def start(self):
+        if self.use_events:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.directory, recursive=False)
+            self._observer.start()
+            print(f"Watching {self.directory} for filesystem events")
+        else:
+            print(f"Polling {self.directory} every {self.poll_interval}s")
+        self.scan()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def notify(self, file_path):
+        if file_path.lower().endswith('.pdf'):
+            with self._lock:
+                self._candidates.setdefault(file_path, (None, time.monotonic()))
+
+    def scan(self):
+        """Stat every PDF in the folder and queue the ones whose stat changed"""
+        self._last_scan = time.monotonic()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not entry.name.lower().endswith('.pdf'):
+                continue
+            stat = entry.stat()
+            key = (stat.st_size, stat.st_mtime)
+            if self._seen.get(entry.path) != key:
+                self._seen[entry.path] = key
+                self.notify(entry.path)
+
+    def ready(self):
+        """Return candidates whose size and mtime have settled"""
+        # With events, rescan less often; the scan is only a safety net then
+        scan_interval = self.poll_interval * (10 if self.use_events else 1)
+        if time.monotonic() - self._last_scan >= scan_interval:
+            self.scan()
+
+        now = time.monotonic()
+        settled = []
+        with self._lock:
+            for file_path, (last_key, changed_at) in list(self._candidates.items()):
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    del self._candidates[file_path]
+                    continue
+                key = (stat.st_size, stat.st_mtime)
+                if key != last_key:
+                    self._candidates[file_path] = (key, now)
+                elif now - changed_at >= self.settle:
+                    del self._candidates[file_path]
+                    self._seen[file_path] = key
+                    settled.append(file_path)
+        return settled
+
+
+async def watch_directory(directory, output_dir=None, settle=2.0, poll_interval=5.0, **batch_kwargs):
+    """Process new or modified PDFs in ``directory`` until interrupted
+
+    One worker pool serves every batch, and the manifest is read from where
+    the previous batch left off rather than from the start.
+    """
+    from batch_process import batch_process_termsheets
+
+    if output_dir is None:
+        output_dir = os.path.join(directory, 'extracted_data')
+    os.makedirs(output_dir, exist_ok=True)
+
+    fingerprints = FingerprintStore(output_dir)
+    manifest = JobManifest(output_dir)
+    offset = os.path.getsize(manifest.path) if os.path.exists(manifest.path) else 0
+    watcher = DropFolderWatcher(directory, settle=settle, poll_interval=poll_interval)
+    watcher.start()
+    try:
+        with create_executor(batch_kwargs.get("workers")) as executor:
+            while True:
+                changed = []
+                for file_path in watcher.ready():
+                    try:
+                        if fingerprints.is_changed(file_path):
+                            changed.append(file_path)
+                    except FileNotFoundError:
+                        continue  # removed after it settled
+                if changed:
+                    print(f"Detected {len(changed)} new or modified PDF files")
+                    await batch_process_termsheets(directory, output_dir, files=changed, executor=executor,
+                                                   **batch_kwargs)
+
+                    # Only fingerprint finished files, so failures are retried on restart
+                    entries, offset = manifest.read(offset)
+                    for file_path in changed:
+                        entry = entries.get(os.path.abspath(file_path))
+                        if entry and entry["status"] in (COMPLETED, DUPLICATE):
+                            try:
+                                fingerprints.update(file_path, entry["hash"])
+                            except FileNotFoundError:
+                                continue
+                    fingerprints.save()
+                await asyncio.sleep(min(settle, poll_interval) / 2)
+    finally:
+        watcher.stop()
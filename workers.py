@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from extract import extract_termsheet_bytes
+
+DEFAULT_WORKERS = int(os.getenv("TERMSHEET_WORKERS", 4))
+
+
+class ExtractionJob:
+    """Handle for one background extraction, safe to keep in Streamlit session state"""
+
+    def __init__(self, upload_hash, name, future):
+        self.upload_hash = upload_hash
+        self.name = name
+        self.future = future
+        self.submitted_at = time.time()
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return "running" if self.future.running() else "queued"
+        # exception() raises on a cancelled future, e.g. after the pool was shut down
+        if self.future.cancelled() or self.future.exception() is not None:
+            return "failed"
+        return "completed"
+
+    @property
+    def error(self):
+        """The exception a failed job raised, or a note that it was cancelled"""
+        if self.future.cancelled():
+            return "the extraction was cancelled"
+        return self.future.exception() if self.future.done() else None
+
+    @property
+    def elapsed(self):
+        return time.time() - self.submitted_at
+
+
+class ExtractionPool:
+    """Thread pool that runs extractions off the Streamlit script thread
+
+    One pool is shared by every session on the server. Submitting a document
+    that is already being extracted returns the existing future instead of
+    starting a second remote call. ``extract`` defaults to extracting in this
+    process; a ServiceClient's ``extract_bytes`` hands documents to the
+    extraction service instead, and the threads only wait for it.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, extract=extract_termsheet_bytes):
+        self.max_workers = max_workers
+        self.extract = extract
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extract")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, upload_hash, data, name, agent=None):
+        with self._lock:
+            future = self._in_flight.get(upload_hash)
+            started = future is None
+            if started:
+                future = self._executor.submit(self.extract, data, agent=agent,
+                                               content_hash=upload_hash)
+                self._in_flight[upload_hash] = future
+        # Outside the lock: a future that is already done runs the callback right here
+        if started:
+            future.add_done_callback(lambda _: self._forget(upload_hash))
+        return ExtractionJob(upload_hash, name, future)
+
+    def _forget(self, upload_hash):
+        with self._lock:
+            self._in_flight.pop(upload_hash, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)